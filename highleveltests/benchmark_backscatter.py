@@ -0,0 +1,41 @@
+import logging
+import time
+
+from safe_s1 import Sentinel1Reader, getconfig
+
+logging.basicConfig(level=logging.INFO)
+conf = getconfig.get_config()
+product = conf["product_paths"][0]
+if "GRD" not in product:
+    product = "SENTINEL1_DS:" + product + ":IW1"
+
+chunks = {"line": 2000, "sample": 4000}
+
+
+def fused(reader, resolution):
+    return reader.load_backscatter(resolution=resolution, chunks=chunks).sigma0
+
+
+def composed(reader, resolution):
+    # digital number, look up tables and noise loaded separately, and combined by xarray
+    _, dn = reader.load_digital_number(
+        resolution=resolution, chunks=chunks, output="intensity"
+    )
+    lut = reader.load_calibration_luts(like=dn).sigma0_lut
+    noise = reader.load_noise(like=dn).noise_lut
+    return (dn.digital_number - noise) / lut**2
+
+
+reader = Sentinel1Reader(product)
+for resolution in [None, "100m"]:
+    for label, load in [("fused", fused), ("composed", composed)]:
+        sigma0 = load(reader, resolution)
+        t0 = time.time()
+        sigma0.mean().compute()
+        elapse_t = time.time() - t0
+        pixels = sigma0.size
+        print(
+            "resolution=%s, %s: %1.2f sec (%1.1f Mpixels/sec)"
+            % (resolution, label, elapse_t, pixels / elapse_t / 1e6)
+        )
+reader.close()
@@ -0,0 +1,45 @@
+import logging
+import time
+
+import rioxarray
+
+from safe_s1 import Sentinel1Reader, getconfig
+
+logging.basicConfig(level=logging.INFO)
+conf = getconfig.get_config()
+product = conf["product_paths"][0]
+if "GRD" not in product:
+    product = "SENTINEL1_DS:" + product + ":IW1"
+
+reductions = {
+    "sum": lambda dn: dn.sum(),
+    "mean intensity": lambda dn: (dn.astype("float32") ** 2).mean(),
+}
+
+
+def rioxarray_dn(reader):
+    # full resolution path used before the handle pool and memory maps
+    return [
+        rioxarray.open_rasterio(f, chunks={}, parse_coordinates=False)
+        for f in reader._measurement_files()
+    ]
+
+
+def reader_dn(reader):
+    return [reader.load_digital_number()[1].digital_number]
+
+
+for label, backend_kwargs, load in [
+    ("rioxarray.open_rasterio", {}, rioxarray_dn),
+    ("gdal reads (memmap=False)", {"memmap": False}, reader_dn),
+    ("memory maps (memmap=True)", {"memmap": True}, reader_dn),
+]:
+    with Sentinel1Reader(product, backend_kwargs=backend_kwargs) as reader:
+        for name, reduction in reductions.items():
+            # first run warms the file system cache
+            for run in range(2):
+                t0 = time.time()
+                for dn in load(reader):
+                    reduction(dn).compute()
+                elapse_t = time.time() - t0
+            print("%s, %s: %1.2f sec" % (label, name, elapse_t))
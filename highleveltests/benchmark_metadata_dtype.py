@@ -0,0 +1,26 @@
+import logging
+import time
+
+from safe_s1 import Sentinel1Reader, getconfig
+
+logging.basicConfig(level=logging.INFO)
+conf = getconfig.get_config()
+product = conf["product_paths"][0]
+if "GRD" not in product:
+    product = "SENTINEL1_DS:" + product + ":IW1"
+
+
+def datatree_nbytes(dt):
+    return sum(node.to_dataset().nbytes for node in dt.subtree)
+
+
+for metadata_dtype in [None, "float32"]:
+    t0 = time.time()
+    reader = Sentinel1Reader(product, metadata_dtype=metadata_dtype)
+    elapse_t = time.time() - t0
+    print(
+        "metadata_dtype=%s: %d bytes in datatree (opened in %1.2f sec)"
+        % (metadata_dtype, datatree_nbytes(reader.datatree), elapse_t)
+    )
+    for group in reader.datatree.children:
+        print("    %s: %d bytes" % (group, reader.datatree[group].to_dataset().nbytes))
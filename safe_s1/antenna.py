@@ -0,0 +1,113 @@
+"""
+antenna elevation pattern (gain and elevation angle), evaluated block by block
+"""
+import numpy as np
+
+
+def antenna_vectors(xml_parser, xml_file):
+    """
+    raw antenna pattern records of the annotation file `xml_file`, by swath.
+
+    Unlike `safe_s1.Sentinel1Reader.antenna_pattern`, records are not padded to a common size.
+
+    Returns
+    -------
+    dict
+        swath number (int) as key, and dict as values, with keys
+
+        * azimuth_time: 1D int64 (nanoseconds) increasing records azimuth times
+        * roll: 1D roll angles (0 if not annotated)
+        * slant_range_time, elevation_angle, gain: lists of 1D arrays, one by record. gain is the
+          magnitude of the elevation pattern (like `safe_s1.Sentinel1Reader.antenna_pattern`)
+    """
+    swaths = xml_parser.get_var(xml_file, "annotation.ap_swath")
+    if len(swaths) == 0:
+        return {}
+    numbers = np.array([int(str(swath)[-1]) for swath in swaths])
+    times = np.asarray(
+        xml_parser.get_var(xml_file, "annotation.ap_azimuthTime"),
+        dtype="datetime64[ns]",
+    ).view(np.int64)
+    roll = np.asarray(xml_parser.get_var(xml_file, "annotation.ap_roll"))
+    if roll.size == 0:
+        roll = np.zeros(times.size)
+    angles = xml_parser.get_var(xml_file, "annotation.ap_elevationAngle")
+    patterns = xml_parser.get_var(xml_file, "annotation.ap_elevationPattern")
+    slant_range_times = xml_parser.get_var(xml_file, "annotation.ap_slantRangeTime")
+    # complex patterns are given as (real, imaginary) pairs, real patterns for old products
+    gains = [
+        np.hypot(pattern[::2], pattern[1::2]) if pattern.size != angle.size else pattern
+        for pattern, angle in zip(patterns, angles)
+    ]
+    vectors = {}
+    for number in np.unique(numbers):
+        records = np.flatnonzero(numbers == number)
+        records = records[np.argsort(times[records])]
+        vectors[int(number)] = dict(
+            azimuth_time=times[records],
+            roll=roll[records],
+            slant_range_time=[np.asarray(slant_range_times[i]) for i in records],
+            elevation_angle=[np.asarray(angles[i]) for i in records],
+            gain=[gains[i] for i in records],
+        )
+    return vectors
+
+
+def antenna_block(
+    lines, samples, swath, azimuth_time, slant_range_time, vectors, out_dtype
+):
+    """
+    antenna gain and roll corrected elevation angle at `lines` and `samples`.
+
+    Each pixel uses the pattern record of its swath nearest in azimuth time, interpolated at the
+    pixel slant range time.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D output lines
+    samples: numpy.ndarray
+        1D output samples
+    swath: callable
+        `swath(lines, samples)` is the 2D swath number (see `safe_s1.masks.swath_block`)
+    azimuth_time: callable
+        `azimuth_time(lines, samples)` is the 2D datetime64[ns] azimuth time (see
+        `safe_s1.grid.GridInterpolator`)
+    slant_range_time: callable
+        `slant_range_time(lines, samples)` is the 2D slant range time
+    vectors: dict
+        from `antenna_vectors`
+    out_dtype: numpy.dtype
+
+    Returns
+    -------
+    numpy.ndarray
+        3D array of shape (2, lines.size, samples.size): gain, and elevation angle minus roll.
+        nan outside swaths.
+    """
+    out = np.full((2, lines.size, samples.size), np.nan, dtype=out_dtype)
+    numbers = swath(lines, samples)
+    times = azimuth_time(lines, samples).view(np.int64)
+    srt = slant_range_time(lines, samples)
+    for number, pattern in vectors.items():
+        in_swath = numbers == number
+        if not in_swath.any():
+            continue
+        # nearest record in azimuth time
+        record_times = pattern["azimuth_time"]
+        middles = record_times[:-1] + np.diff(record_times) // 2
+        records = np.searchsorted(middles, times)
+        for record in range(records[in_swath].min(), records[in_swath].max() + 1):
+            mask = in_swath & (records == record)
+            xp = pattern["slant_range_time"][record]
+            gain = pattern["gain"][record]
+            angle = pattern["elevation_angle"][record] - pattern["roll"][record]
+            if mask.all():
+                # usual case of a block inside one swath and one record
+                out[0] = np.interp(srt, xp, gain)
+                out[1] = np.interp(srt, xp, angle)
+            elif mask.any():
+                x = srt[mask]
+                out[0][mask] = np.interp(x, xp, gain)
+                out[1][mask] = np.interp(x, xp, angle)
+    return out
@@ -0,0 +1,357 @@
+"""
+helpers for on disk caches
+"""
+import collections
+import collections.abc
+import io
+import logging
+import os
+import posixpath
+import struct
+import tempfile
+import threading
+import time
+
+import fsspec.utils
+
+logger = logging.getLogger("xsar.cache")
+logger.addHandler(logging.NullHandler())
+
+tmp_prefix = ".tmp"
+"""name prefix of files being written in cache directories (not counted, nor removed by `evict_lru`)"""
+tmp_ttl = 3600
+"""age (in seconds) of temporary files left by dead processes, that can be removed"""
+# bytes written in cache directories by this process since their last eviction, by cache_dir
+_written = collections.Counter()
+_written_lock = threading.Lock()
+
+
+def touch(path):
+    """mark `path` as recently used (mtime is used for LRU, because atime is often disabled)"""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def cache_files(cache_dir):
+    """
+    list files in cache_dir (recursively). Temporary files (named with `tmp_prefix`) being written
+    by concurrent processes are skipped, unless they are older than `tmp_ttl`.
+
+    Returns
+    -------
+    list of tuple
+        (path, size, mtime), oldest first
+    """
+    files = []
+    now = time.time()
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # removed by a concurrent process
+                continue
+            if name.startswith(tmp_prefix) and now - stat.st_mtime < tmp_ttl:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+    return sorted(files, key=lambda f: f[2])
+
+
+def evict_lru(cache_dir, max_size, keep=()):
+    """
+    Remove least recently used files from cache_dir, until its total size is lower than max_size.
+
+    Parameters
+    ----------
+    cache_dir: str
+    max_size: None or int
+        maximum size in bytes. if None, nothing is removed.
+    keep: iterable of str
+        paths that must not be removed (in use)
+
+    Returns
+    -------
+    list of str
+        removed paths
+    """
+    if max_size is None or not os.path.isdir(cache_dir):
+        return []
+    files = cache_files(cache_dir)
+    total = sum(f[1] for f in files)
+    keep = {os.path.abspath(k) for k in keep}
+    removed = []
+    for path, size, _ in files:
+        if total <= max_size:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        logger.debug("evicted %s from cache", path)
+        total -= size
+        removed.append(path)
+    return removed
+
+
+class DiskCache:
+    """
+    entries (bytes) cached in files of cache_dir, and shared between processes.
+
+    Entries are written atomically, with their fetch time, so they can be read by concurrent
+    processes. Least recently used entries are removed when the total size is above max_size,
+    and entries older than ttl are fetched again.
+
+    The size is checked every max_size / 16 bytes written by the process in cache_dir (by all its
+    `DiskCache` instances), so with n processes writing concurrently, the cache may exceed max_size
+    by up to n * max_size / 16 between evictions.
+
+    Parameters
+    ----------
+    cache_dir: str
+    max_size: None or int
+        maximum size of cache_dir in bytes
+    ttl: None or float
+        time to live of entries, in seconds. Default to None: entries don't expire.
+    """
+
+    header = struct.Struct("<d")
+    """entry header: fetch time"""
+
+    def __init__(self, cache_dir, max_size=None, ttl=None):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_size = max_size
+        self.ttl = ttl
+
+    def __repr__(self):
+        return "<DiskCache %s>" % self.cache_dir
+
+    def get(self, key, fetch, start=0, stop=None):
+        """
+        bytes `start:stop` of entry `key`, fetched by `fetch()` (and cached) if it's not cached.
+
+        Parameters
+        ----------
+        key: str
+            relative path of the entry in cache_dir
+        fetch: callable
+            returns the entry bytes
+        start: int
+        stop: None or int
+
+        Returns
+        -------
+        bytes
+        """
+        path = os.path.join(self.cache_dir, key)
+        data = self._read(path, start, stop)
+        if data is None:
+            data = fetch()
+            self._write(path, data)
+            data = data[start:stop]
+        return data
+
+    def __contains__(self, key):
+        return self._read(os.path.join(self.cache_dir, key), 0, 0) is not None
+
+    def _read(self, path, start, stop):
+        """bytes start:stop of the entry in path, or None if it's not cached (or expired)"""
+        try:
+            with open(path, "rb") as f:
+                (fetched,) = self.header.unpack(f.read(self.header.size))
+                if self.ttl is not None and time.time() - fetched > self.ttl:
+                    return None
+                f.seek(self.header.size + start)
+                data = f.read() if stop is None else f.read(stop - start)
+        except (FileNotFoundError, struct.error):
+            # not cached, removed by a concurrent process, or partially written by an old version
+            return None
+        touch(path)
+        return data
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), prefix=tmp_prefix, delete=False
+        ) as f:
+            f.write(self.header.pack(time.time()))
+            f.write(data)
+        os.replace(f.name, path)
+        with _written_lock:
+            _written[self.cache_dir] += len(data)
+            if self.max_size is None or _written[self.cache_dir] < self.max_size / 16:
+                return
+            del _written[self.cache_dir]
+        evict_lru(self.cache_dir, self.max_size, keep=[path])
+
+
+def cache_key(url):
+    """relative cache path for `url`: its basename, and a token of the full url"""
+    return "%s-%s" % (posixpath.basename(url.rstrip("/")), fsspec.utils.tokenize(url))
+
+
+class CachedMapper(collections.abc.Mapping):
+    """
+    read only mapper of whole files (like xml files), read from `mapper` and kept in `cache`.
+    The list of keys is cached too, so cached files are read without requests to `mapper`.
+
+    Parameters
+    ----------
+    mapper: fsspec.mapping.FSMap
+    cache: DiskCache
+    url: str
+        url of the mapped files (like the SAFE url), that identifies them in the cache
+    """
+
+    def __init__(self, mapper, cache, url):
+        self.mapper = mapper
+        self.cache = cache
+        self._prefix = cache_key(url)
+
+    def __getitem__(self, key):
+        return self.cache.get(
+            posixpath.join(self._prefix, key), lambda: self.mapper[key]
+        )
+
+    def _keys(self):
+        keys = self.cache.get(
+            posixpath.join(self._prefix, ".keys"),
+            lambda: "\n".join(self.mapper).encode(),
+        )
+        return keys.decode().split("\n") if keys else []
+
+    def __contains__(self, key):
+        return posixpath.join(self._prefix, key) in self.cache or key in self._keys()
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+
+class CachedFile(io.RawIOBase):
+    """
+    read only file object of `path` in the fsspec filesystem `fs`, read by blocks of block_size
+    bytes, that are kept in `cache`: only the blocks actually read are fetched and cached.
+
+    Parameters
+    ----------
+    fs: fsspec.AbstractFileSystem
+    path: str
+    cache: DiskCache
+    block_size: int
+    """
+
+    def __init__(self, fs, path, cache, block_size=2**22):
+        super().__init__()
+        self.fs = fs
+        self.path = path
+        self.cache = cache
+        self.block_size = block_size
+        self._prefix = cache_key(fs.unstrip_protocol(path))
+        self._size = None
+        self._pos = 0
+
+    @property
+    def size(self):
+        if self._size is None:
+            # the size is cached too, so cached files are opened without requests
+            self._size = int(
+                self.cache.get(
+                    posixpath.join(self._prefix, "size"),
+                    lambda: str(self.fs.size(self.path)).encode(),
+                )
+            )
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos}.get(whence)
+        if start is None:
+            start = self.size
+        self._pos = max(start + pos, 0)
+        return self._pos
+
+    def read(self, size=-1):
+        stop = self.size if size is None or size < 0 else self._pos + size
+        stop = min(stop, self.size)
+        parts = []
+        while self._pos < stop:
+            block = self._pos // self.block_size
+            block_start = block * self.block_size
+            block_stop = min(block_start + self.block_size, self.size)
+            parts.append(
+                self.cache.get(
+                    posixpath.join(self._prefix, "%d" % block),
+                    lambda: self._fetch(block_start, block_stop),
+                    start=self._pos - block_start,
+                    stop=min(stop, block_stop) - block_start,
+                )
+            )
+            self._pos = min(stop, block_stop)
+        return b"".join(parts)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def _fetch(self, start, stop):
+        data = self.fs.cat_file(self.path, start, stop)
+        if len(data) != stop - start:
+            # like servers ignoring range requests: don't cache wrong blocks
+            raise OSError(
+                "read %d bytes instead of %d from %s"
+                % (len(data), stop - start, self.path)
+            )
+        # the size entry is read once by file object: keep it as recent as the new block
+        touch(os.path.join(self.cache.cache_dir, self._prefix, "size"))
+        return data
+
+
+def open_cached(fs, cache, path, mode="rb", block_size=2**22):
+    """
+    open `path` of the fsspec filesystem `fs` as a `CachedFile` (usable as opener, with
+    `functools.partial`).
+    """
+    if mode != "rb":
+        raise ValueError("cached files are read only: mode %s" % mode)
+    return CachedFile(fs, path, cache, block_size=block_size)
+
+
+def remote_caches(cache_dir, xml_max_size=None, tiff_max_size=None, ttl=None):
+    """
+    two tier cache of remote SAFE: whole xml files, and measurement files blocks.
+
+    Parameters
+    ----------
+    cache_dir: str
+    xml_max_size: None or int
+        maximum size of cached xml files (in cache_dir/xml), in bytes
+    tiff_max_size: None or int
+        maximum size of cached measurement blocks (in cache_dir/tiff), in bytes
+    ttl: None or float
+        time to live of both tiers, in seconds
+
+    Returns
+    -------
+    tuple of DiskCache
+        (xml, tiff)
+    """
+    return (
+        DiskCache(os.path.join(cache_dir, "xml"), max_size=xml_max_size, ttl=ttl),
+        DiskCache(os.path.join(cache_dir, "tiff"), max_size=tiff_max_size, ttl=ttl),
+    )
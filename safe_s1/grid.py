@@ -0,0 +1,228 @@
+"""
+lazy evaluation of annotation grids on the digital number grid, block by block
+"""
+import dask.array
+import numpy as np
+import xarray as xr
+
+
+def interp_weights(x, xp):
+    """
+    linear interpolation weights of `x` in the increasing grid `xp` (values outside xp are clipped,
+    like `numpy.interp`).
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        index `i` and weight `w`, such that interpolated values are `(1 - w) * fp[i] + w * fp[i + 1]`
+    """
+    xp = np.asarray(xp, dtype=np.float64)
+    if xp.size == 1:
+        return np.zeros(np.shape(x), dtype=int), np.zeros(np.shape(x))
+    index = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, xp.size - 2)
+    weight = (np.asarray(x, dtype=np.float64) - xp[index]) / (xp[index + 1] - xp[index])
+    return index, np.clip(weight, 0, 1)
+
+
+def lerp_rows(rows, index, weight, dtype=None):
+    """
+    interpolate between consecutive rows: output row k is
+    `(1 - weight[k]) * rows[index[k]] + weight[k] * rows[index[k] + 1]`.
+
+    Output rows with the same index are computed together, by broadcasting (without gathering rows),
+    so it's fast when `index` is sorted (increasing lines).
+
+    Parameters
+    ----------
+    rows: numpy.ndarray
+        array with (row, sample) as last dimensions
+    index: numpy.ndarray
+        1D rows index
+    weight: numpy.ndarray
+        1D weights
+    dtype: numpy.dtype, optional
+        output dtype. Default to rows dtype.
+
+    Returns
+    -------
+    numpy.ndarray
+        array of shape rows.shape[:-2] + (index.size, rows.shape[-1])
+    """
+    dtype = rows.dtype if dtype is None else np.dtype(dtype)
+    out = np.empty(rows.shape[:-2] + (index.size, rows.shape[-1]), dtype=dtype)
+    if rows.shape[-2] == 1:
+        out[...] = rows
+        return out
+    rows = rows.astype(dtype, copy=False)
+    diff = np.diff(rows, axis=-2)
+    weight = weight.astype(dtype)[:, np.newaxis]
+    bounds = np.flatnonzero(np.diff(index)) + 1
+    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, index.size]):
+        row = index[start]
+        segment = out[..., start:stop, :]
+        np.multiply(weight[start:stop], diff[..., row : row + 1, :], out=segment)
+        segment += rows[..., row : row + 1, :]
+    return out
+
+
+def bilinear(lines, samples, grid_lines, grid_samples, values):
+    """
+    separable bilinear interpolation of `values`, given on the (grid_lines, grid_samples) grid,
+    at `lines` and `samples`.
+
+    Only the grid rows around `lines` are interpolated along samples, so memory is proportional to
+    the output size.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D output lines
+    samples: numpy.ndarray
+        1D output samples
+    grid_lines: numpy.ndarray
+        1D increasing grid lines
+    grid_samples: numpy.ndarray
+        1D increasing grid samples
+    values: numpy.ndarray
+        2D (or more, with (line, sample) as last dimensions) grid values
+
+    Returns
+    -------
+    numpy.ndarray
+        array of shape values.shape[:-2] + (lines.size, samples.size), with values dtype
+    """
+    line_index, line_weight = interp_weights(lines, grid_lines)
+    sample_index, sample_weight = interp_weights(samples, grid_samples)
+    rows = np.arange(line_index.min(), min(line_index.max() + 2, len(grid_lines)))
+    sub = values[..., rows, :]
+    if sub.shape[-1] > 1:
+        sub = (
+            sub[..., sample_index] * (1 - sample_weight)
+            + sub[..., sample_index + 1] * sample_weight
+        )
+    else:
+        sub = np.repeat(sub, samples.size, axis=-1)
+    return lerp_rows(sub, line_index - rows[0], line_weight, dtype=values.dtype)
+
+
+class GridInterpolator:
+    """
+    bilinear interpolator of a variable given on a (line, sample) grid, built once and evaluated
+    on any number of blocks (see `on_grid`).
+
+    Times (datetime64) are interpolated as int64 nanoseconds offsets, so they stay exact.
+    Periodic values (like longitudes crossing the antimeridian) are interpolated continuously, and
+    wrapped back to [-period / 2, period / 2[.
+
+    Parameters
+    ----------
+    grid_lines: numpy.ndarray
+        1D increasing grid lines
+    grid_samples: numpy.ndarray
+        1D increasing grid samples
+    values: numpy.ndarray
+        2D (line, sample) grid values
+    dtype: numpy.dtype, optional
+        output dtype, for non time values. Default to values dtype.
+    period: float, optional
+        period of values (360 for longitudes)
+    """
+
+    def __init__(self, grid_lines, grid_samples, values, dtype=None, period=None):
+        self.grid_lines = np.asarray(grid_lines, dtype=np.float64)
+        self.grid_samples = np.asarray(grid_samples, dtype=np.float64)
+        values = np.asarray(values)
+        self.epoch = None
+        self.period = None
+        if values.dtype.kind == "M":
+            self.dtype = np.dtype("datetime64[ns]")
+            values = values.astype(self.dtype).view(np.int64)
+            self.epoch = values.min()
+            values = (values - self.epoch).astype(np.float64)
+        else:
+            self.dtype = np.dtype(values.dtype if dtype is None else dtype)
+            values = values.astype(np.float64)
+            if period is not None and np.ptp(values) > period / 2:
+                self.period = period
+                values = values % period
+        self.values = values
+
+    def __call__(self, lines, samples):
+        """
+        Parameters
+        ----------
+        lines: numpy.ndarray
+            1D output lines
+        samples: numpy.ndarray
+            1D output samples
+
+        Returns
+        -------
+        numpy.ndarray
+            2D array of shape (lines.size, samples.size)
+        """
+        values = bilinear(
+            lines, samples, self.grid_lines, self.grid_samples, self.values
+        )
+        if self.epoch is not None:
+            values = np.rint(values).astype(np.int64)
+            values += self.epoch
+            return values.view(self.dtype)
+        if self.period is not None:
+            values = (values + self.period / 2) % self.period - self.period / 2
+        return values.astype(self.dtype)
+
+
+def on_grid(func, like, dtype, new_axes=None, **kwargs):
+    """
+    lazy 2D array on the (line, sample) grid of `like`, with the same chunks.
+
+    Each block is computed by `func(lines, samples, **kwargs)`, with `lines` and `samples` the 1D
+    coordinates of the block (in full resolution pixels).
+
+    Parameters
+    ----------
+    func: callable
+    like: xarray.DataArray or xarray.Dataset
+        with 'line' and 'sample' coordinates (like the output of
+        `safe_s1.Sentinel1Reader.load_digital_number`)
+    dtype: numpy.dtype
+        output dtype
+    new_axes: dict, optional
+        leading dims names and sizes, if func returns more than 2 dims (not chunked)
+    kwargs: dict
+        passed to func
+
+    Returns
+    -------
+    xarray.DataArray
+        with ('line', 'sample') dims and coordinates (after new_axes dims)
+    """
+    chunks = like.chunksizes if isinstance(like, xr.Dataset) else None
+    if chunks is None:
+        chunks = dict(zip(like.dims, like.chunks)) if like.chunks else {}
+    coords = [
+        dask.array.from_array(
+            like[dim].values, chunks=chunks.get(dim, (like.sizes[dim],))
+        )
+        for dim in ["line", "sample"]
+    ]
+    new_axes = new_axes or {}
+    leading = "abcdefgh"[: len(new_axes)]
+    data = dask.array.blockwise(
+        func,
+        leading + "ij",
+        coords[0],
+        "i",
+        coords[1],
+        "j",
+        dtype=dtype,
+        new_axes=dict(zip(leading, new_axes.values())),
+        align_arrays=False,
+        **kwargs,
+    )
+    return xr.DataArray(
+        data,
+        dims=tuple(new_axes) + ("line", "sample"),
+        coords={"line": like["line"], "sample": like["sample"]},
+    )
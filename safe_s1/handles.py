@@ -0,0 +1,233 @@
+"""
+rasterio datasets for measurement files
+"""
+import atexit
+import collections
+import contextlib
+import itertools
+import logging
+import os
+import threading
+import weakref
+
+import rasterio
+
+logger = logging.getLogger("xsar.handles")
+logger.addHandler(logging.NullHandler())
+
+# pools of the process, by token (so pools unpickled in the same process are shared)
+_pools = weakref.WeakValueDictionary()
+_pools_lock = threading.RLock()
+_tokens = itertools.count()
+
+
+def _get_pool(token, size, max_handles, opener_size=None):
+    """pool with `token` in this process, created if needed (used to unpickle `HandlePool`)"""
+    with _pools_lock:
+        pool = _pools.get(token)
+        if pool is None:
+            pool = HandlePool(
+                size=size, max_handles=max_handles, opener_size=opener_size, token=token
+            )
+        return pool
+
+
+@atexit.register
+def _close_pools():
+    """close datasets of all pools at exit, while python openers can still be called by gdal"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+class HandlePool:
+    """
+    Bounded, thread-safe pool of rasterio datasets, shared by all chunk reads of measurement files.
+
+    Datasets are opened on first use, and kept open for the next reads, so gdal open and tiff
+    directory parsing are paid once per file and thread, instead of once per chunk.
+    A dataset is used by one thread at a time: up to `size` datasets are opened for the same file
+    (`opener_size` for files read through a python opener).
+
+    Python openers must return independent file objects at each call (like s3fs, gcsfs or http
+    filesystems), as datasets of the same file are read concurrently. Openers returning the same
+    file object at each call (like `fsspec.implementations.memory.MemoryFileSystem.open`) need
+    `opener_size=1`, so chunk reads of the same file are serialized.
+
+    `HandlePool.close` closes all datasets. The pool stays usable: datasets are reopened by the next
+    reads. All pools are closed at interpreter exit.
+
+    Pools are picklable: an unpickled pool is the pool with the same token in the current process
+    (a new one in other processes, like dask distributed workers).
+
+    Parameters
+    ----------
+    size: int, optional
+        maximum number of datasets opened for the same file. Default to the number of cpus.
+    max_handles: int, optional
+        maximum number of datasets opened by the pool. Unused datasets of other files are closed
+        to open a new one, and reads wait for a dataset to be released if all are in use.
+        Default to 64.
+    opener_size: int, optional
+        maximum number of datasets opened for the same file read through a python opener.
+        Default to `size`.
+    """
+
+    def __init__(self, size=None, max_handles=64, opener_size=None, token=None):
+        self.size = size or os.cpu_count() or 1
+        self.opener_size = opener_size or self.size
+        self.max_handles = max_handles
+        if self.max_handles < 1:
+            raise ValueError(f"max_handles must be >= 1, not {max_handles}")
+        self._condition = threading.Condition()
+        # {(filename, opener): [rasterio.DatasetReader, ...]}, least recently used first
+        self._idle = collections.OrderedDict()
+        # {(filename, opener): number of opened datasets (idle and in use)}
+        self._opened = collections.Counter()
+        # ids of datasets in use, to close when released
+        self._in_use = set()
+        self._expired = set()
+        with _pools_lock:
+            if token is None:
+                token = "%d-%d" % (os.getpid(), next(_tokens))
+            self._token = token
+            _pools[token] = self
+
+    def __reduce__(self):
+        return _get_pool, (self._token, self.size, self.max_handles, self.opener_size)
+
+    def __dask_tokenize__(self):
+        return self._token
+
+    def __repr__(self):
+        return "<HandlePool %s: %d opened>" % (
+            self._token,
+            sum(self._opened.values()),
+        )
+
+    def _acquire(self, key):
+        opener = key[1]
+        size = self.opener_size if opener is not None else self.size
+        with self._condition:
+            while True:
+                if self._idle.get(key):
+                    rio = self._idle[key].pop()
+                    self._in_use.add(id(rio))
+                    return rio
+                if self._opened[key] < size:
+                    if sum(self._opened.values()) < self.max_handles:
+                        self._opened[key] += 1
+                        break
+                    if self._close_idle(keep=key):
+                        continue
+                self._condition.wait()
+        try:
+            logger.debug("opening %s", key[0])
+            kwargs = {} if opener is None else dict(opener=opener)
+            rio = rasterio.open(key[0], **kwargs)
+        except BaseException:
+            with self._condition:
+                self._opened[key] -= 1
+                self._condition.notify_all()
+            raise
+        with self._condition:
+            self._in_use.add(id(rio))
+        return rio
+
+    def _release(self, key, rio):
+        with self._condition:
+            self._in_use.discard(id(rio))
+            if id(rio) in self._expired:
+                # `close` was called while in use
+                self._expired.discard(id(rio))
+                rio.close()
+                self._opened[key] -= 1
+            else:
+                self._idle.setdefault(key, []).append(rio)
+                self._idle.move_to_end(key)
+            self._condition.notify_all()
+
+    def _close_idle(self, keep=None):
+        """close the least recently used idle dataset not for `keep`. Returns False if none."""
+        for key, idle in self._idle.items():
+            if key != keep and idle:
+                idle.pop(0).close()
+                self._opened[key] -= 1
+                return True
+        return False
+
+    @contextlib.contextmanager
+    def open(self, filename, opener=None):
+        """
+        get a dataset for `filename` from the pool, as a context manager.
+        The dataset is used only by the calling thread until exit.
+
+        Parameters
+        ----------
+        filename: str
+        opener: None or callable
+            see `open_dataset`
+
+        Yields
+        ------
+        rasterio.DatasetReader
+        """
+        key = (os.fspath(filename), opener)
+        rio = self._acquire(key)
+        try:
+            yield rio
+        finally:
+            self._release(key, rio)
+
+    def close(self):
+        """close all datasets of the pool (datasets in use are closed when released)"""
+        with self._condition:
+            for key, idle in self._idle.items():
+                for rio in idle:
+                    rio.close()
+                self._opened[key] -= len(idle)
+            self._idle.clear()
+            self._opened = +self._opened
+            self._expired |= self._in_use
+            self._condition.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# pool for files read through a python opener, when no pool is given
+_shared = HandlePool(size=1)
+
+
+@contextlib.contextmanager
+def open_dataset(filename, opener=None, pool=None):
+    """
+    open measurement `filename` with rasterio, as a context manager.
+
+    Without `pool`, local files are opened with gdal native drivers, and closed on exit, and files
+    read through a python opener (remote files) are opened once, in a pool shared by the process.
+
+    Parameters
+    ----------
+    filename: str
+    opener: None or callable
+        python opener (like `fsspec.AbstractFileSystem.open`), to read filename with.
+    pool: None or HandlePool
+        pool to get the dataset from.
+
+    Yields
+    ------
+    rasterio.DatasetReader
+    """
+    if pool is None:
+        if opener is None:
+            with rasterio.open(filename) as rio:
+                yield rio
+            return
+        pool = _shared
+    with pool.open(filename, opener=opener) as rio:
+        yield rio
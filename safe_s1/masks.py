@@ -0,0 +1,92 @@
+"""
+swath id and valid data masks, evaluated block by block from the annotated bounds
+"""
+import numpy as np
+
+
+def swath_bounds(swath_merging):
+    """
+    swath bounds of a GRD `safe_s1.Sentinel1Reader.swath_merging` dataset, as a list of dicts with
+    `swath`, `line_start`, `line_stop`, `sample_start` and `sample_stop` (inclusive, int).
+    """
+    if "swaths" not in swath_merging:
+        return []
+    keys = {
+        "swath": "swaths",
+        "line_start": "firstAzimuthLine",
+        "line_stop": "lastAzimuthLine",
+        "sample_start": "firstRangeSample",
+        "sample_stop": "lastRangeSample",
+    }
+    values = {key: swath_merging[var].values for key, var in keys.items()}
+    return [
+        {key: int(values[key][i]) for key in keys}
+        for i in range(swath_merging.sizes["dim_azimuthTime"])
+    ]
+
+
+def swath_block(lines, samples, bounds, out_dtype=np.int8):
+    """
+    swath id at `lines` and `samples`: 0 outside all swath bounds.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D increasing output lines
+    samples: numpy.ndarray
+        1D increasing output samples
+    bounds: list of dict
+        from `swath_bounds`
+    out_dtype: numpy.dtype
+
+    Returns
+    -------
+    numpy.ndarray
+        2D array of shape (lines.size, samples.size)
+    """
+    swath = np.zeros((lines.size, samples.size), dtype=out_dtype)
+    for bound in bounds:
+        # bounds are inclusive pixel indexes: pixel centres of resampled grids are inside
+        # [start - 0.5, stop + 0.5[ (like `safe_s1.noise.apply_azimuth_noise`)
+        l0, l1 = np.searchsorted(
+            lines, [bound["line_start"] - 0.5, bound["line_stop"] + 0.5]
+        )
+        s0, s1 = np.searchsorted(
+            samples, [bound["sample_start"] - 0.5, bound["sample_stop"] + 0.5]
+        )
+        swath[l0:l1, s0:s1] = bound["swath"]
+    return swath
+
+
+def burst_valid_block(
+    lines, samples, lines_per_burst, first_valid, last_valid, out_dtype=bool
+):
+    """
+    valid data mask of a TOPS SLC at `lines` and `samples`, from the bursts valid samples.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D output lines
+    samples: numpy.ndarray
+        1D output samples
+    lines_per_burst: int
+    first_valid: numpy.ndarray
+        (burst, line) first valid sample (nan if the whole line is invalid)
+    last_valid: numpy.ndarray
+        (burst, line) last valid sample (nan if the whole line is invalid)
+    out_dtype: numpy.dtype
+
+    Returns
+    -------
+    numpy.ndarray
+        2D array of shape (lines.size, samples.size)
+    """
+    # nearest full resolution line
+    line = np.clip(np.floor(np.asarray(lines) + 0.5), 0, first_valid.size - 1)
+    burst, line = np.divmod(line.astype(np.int64), lines_per_burst)
+    # comparisons with nan are False, so fully invalid lines are masked
+    valid = (samples >= first_valid[burst, line][:, np.newaxis] - 0.5) & (
+        samples < last_valid[burst, line][:, np.newaxis] + 0.5
+    )
+    return valid.astype(out_dtype, copy=False)
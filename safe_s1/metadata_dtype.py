@@ -0,0 +1,114 @@
+"""
+compact dtypes for decoded metadata (grids and look up tables)
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("xsar.metadata_dtype")
+logger.addHandler(logging.NullHandler())
+
+# datatree groups holding large grids or look up tables.
+# other groups (orbit, bursts, doppler, ...) are small and need full precision.
+compact_groups = [
+    "geolocationGrid",
+    "calibration_luts",
+    "noise_azimuth_raw",
+    "noise_range_raw",
+    "antenna_pattern",
+]
+
+# time offsets are stored in this unit, so they fit in int32 for a whole product
+time_offset_unit = "us"
+time_offset_dtype = np.int32
+
+
+def check_metadata_dtype(metadata_dtype):
+    """
+    Parameters
+    ----------
+    metadata_dtype: None, str or numpy.dtype
+        floating point dtype to use for decoded grids and look up tables
+
+    Returns
+    -------
+    None or numpy.dtype
+    """
+    if metadata_dtype is None:
+        return None
+    dtype = np.dtype(metadata_dtype)
+    if not np.issubdtype(dtype, np.floating):
+        raise ValueError(f"metadata_dtype must be a floating dtype, not {dtype}")
+    return dtype
+
+
+def time_offsets(values, epoch):
+    """
+    convert datetime64 values to int32 offsets (in microseconds) from epoch, if it is lossless.
+
+    Parameters
+    ----------
+    values: numpy.ndarray
+        datetime64 array
+    epoch: numpy.datetime64
+        reference epoch
+
+    Returns
+    -------
+    None or numpy.ndarray
+        None if the conversion would lose information (NaT, sub microsecond precision or overflow)
+    """
+    if np.isnat(values).any():
+        return None
+    offsets = (values - epoch).astype("timedelta64[ns]").astype(np.int64)
+    unit_ns = np.timedelta64(1, time_offset_unit) // np.timedelta64(1, "ns")
+    if np.any(offsets % unit_ns):
+        return None
+    offsets = offsets // unit_ns
+    info = np.iinfo(time_offset_dtype)
+    if offsets.size and (offsets.min() < info.min or offsets.max() > info.max):
+        return None
+    return offsets.astype(time_offset_dtype)
+
+
+def compact_dataset(ds, dtype, epoch):
+    """
+    Cast float64 data variables of ds to `dtype`, and datetime64 variables to int32 offsets from
+    `epoch`.
+
+    Values are cast after the xml decoding (the `safe_s1.sentinel1_xml_mappings` decoders are
+    shared by all readers, and always return float64), so float64 arrays are only transient.
+    Float coordinates are kept as float64: they index the grids, and are used by interpolations.
+
+    Time offsets are CF encoded (`units` attribute), so `xarray.decode_cf` will restore datetime64 values.
+    Time variables that can't be converted without loss are kept as datetime64.
+
+    Parameters
+    ----------
+    ds: xarray.Dataset
+    dtype: numpy.dtype
+        floating point dtype
+    epoch: numpy.datetime64
+        reference epoch for time offsets
+
+    Returns
+    -------
+    xarray.Dataset
+    """
+    epoch = np.datetime64(epoch, time_offset_unit)
+    units = {"us": "microseconds"}[time_offset_unit]
+    compacted = {}
+    for name, var in ds.variables.items():
+        if var.dtype == np.float64 and name not in ds.coords:
+            compacted[name] = var.astype(dtype)
+        elif np.issubdtype(var.dtype, np.datetime64):
+            offsets = time_offsets(var.values, epoch)
+            if offsets is None:
+                logger.debug("%s kept as datetime64 (offsets would not be exact)", name)
+                continue
+            compacted[name] = var.copy(data=offsets)
+            compacted[name].attrs["units"] = "%s since %s" % (units, epoch)
+            compacted[name].attrs["calendar"] = "proleptic_gregorian"
+    coords = {k: v for k, v in compacted.items() if k in ds.coords}
+    data_vars = {k: v for k, v in compacted.items() if k not in ds.coords}
+    return ds.assign_coords(coords).assign(data_vars)
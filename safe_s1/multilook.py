@@ -0,0 +1,191 @@
+"""
+block averaging of digital numbers in intensity domain (multilooking)
+"""
+import functools
+import numbers
+
+import dask.array
+import numpy as np
+import xarray as xr
+
+
+def box_sum(values, start, scale, size, axis):
+    """
+    sum `values` along `axis` over (possibly fractional) boxes.
+
+    Box i covers [start + i * scale, start + (i + 1) * scale[, and value k covers [k, k + 1[:
+    values are weighted by their overlap with the box. Sums are differences of the cumulative
+    integral, so memory and time don't depend on the box size.
+
+    Returns
+    -------
+    numpy.ndarray
+        float64 array, with `size` elements along axis
+    """
+    values = np.moveaxis(values, axis, -1)
+    n = values.shape[-1]
+    cumsum = np.zeros(values.shape[:-1] + (n + 1,))
+    np.cumsum(values, axis=-1, out=cumsum[..., 1:])
+    edges = np.clip(start + np.arange(size + 1) * scale, 0, n)
+    index = np.minimum(np.floor(edges).astype(int), n - 1)
+    # cumulative integral at edges (piecewise linear between integer positions)
+    integral = cumsum[..., index] + (edges - index) * values[..., index]
+    return np.moveaxis(integral[..., 1:] - integral[..., :-1], -1, axis)
+
+
+def box_average(intensity, start, scale, shape):
+    """
+    average the last two dimensions of `intensity` over (possibly fractional) boxes.
+    nan values are ignored (boxes without valid values are nan).
+
+    Parameters
+    ----------
+    intensity: numpy.ndarray
+        array with (line, sample) as last dimensions
+    start: tuple of float
+        (line, sample) position of the first box in intensity
+    scale: tuple of float
+        (line, sample) box size
+    shape: tuple of int
+        (line, sample) number of boxes
+
+    Returns
+    -------
+    numpy.ndarray
+        float64 array with last dimensions of size `shape`
+    """
+
+    def _sum(values):
+        # lines first: the intermediate array is reduced by scale[0]
+        values = box_sum(values, start[0], scale[0], shape[0], values.ndim - 2)
+        return box_sum(values, start[1], scale[1], shape[1], values.ndim - 1)
+
+    valid = np.isfinite(intensity)
+    if valid.all():
+        return _sum(intensity) / _sum(np.ones(intensity.shape[-2:], dtype=np.float32))
+    total = _sum(np.where(valid, intensity, 0))
+    count = _sum(valid.astype(np.float32))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def to_intensity(dn):
+    """intensity (float32) of digital numbers (complex, or real amplitude)"""
+    if np.iscomplexobj(dn):
+        return dn.real.astype(np.float32) ** 2 + dn.imag.astype(np.float32) ** 2
+    return dn.astype(np.float32) ** 2
+
+
+def _multilook_block(dn, start, scale, shape, output):
+    mean = box_average(to_intensity(dn), start, scale, shape)
+    if output == "amplitude":
+        mean = np.sqrt(mean)
+    return mean.astype(np.float32)
+
+
+def _boxes_chunks(in_chunks, scale, size):
+    """
+    split `size` boxes into chunks, at the input chunks boundaries (so each output chunk reads about
+    one input chunk): an output chunk starts at the box nearest to each input chunk start.
+
+    Returns
+    -------
+    list of tuple
+        (first box, number of boxes, first input index, last input index + 1) for each chunk
+    """
+    starts = np.cumsum((0,) + tuple(in_chunks[:-1]))
+    edges = np.unique(np.append(np.clip(np.round(starts / scale), 0, size), size))
+    edges = edges.astype(int).tolist()
+    chunks = []
+    for first, stop in zip(edges[:-1], edges[1:]):
+        chunks.append(
+            (
+                first,
+                stop - first,
+                int(np.floor(first * scale)),
+                min(int(np.ceil(stop * scale)), sum(in_chunks)),
+            )
+        )
+    return chunks
+
+
+def multilook(dn, factor, output="intensity"):
+    """
+    Multilook digital numbers, by averaging (line, sample) boxes in intensity domain.
+
+    Output pixel i covers full resolution pixels [i * factor, (i + 1) * factor[. Factors can be
+    fractional: pixels at box boundaries are weighted by their overlap with the box.
+    nan values (invalid samples) are ignored.
+
+    Each output chunk only depends on the input chunks overlapping its boxes, so large products
+    are processed chunk by chunk. Output chunks start at the boxes nearest to the input chunks
+    starts: input chunks of `n * factor` pixels give output chunks of `n` boxes.
+
+    Parameters
+    ----------
+    dn: xarray.DataArray
+        digital numbers (complex, or real amplitude), with 'line' and 'sample' as last dimensions,
+        and regularly spaced 'line' and 'sample' coordinates.
+    factor: number or dict
+        box size, in pixels. If dict, with 'line' and 'sample' keys.
+    output: str
+        'intensity' (mean of `|dn|^2`) or 'amplitude' (square root of the mean intensity)
+
+    Returns
+    -------
+    xarray.DataArray
+        float32 array, with 'line' and 'sample' coordinates at box centres.
+    """
+    if output not in ["intensity", "amplitude"]:
+        raise ValueError(f"output must be 'intensity' or 'amplitude', not {output!r}")
+    if isinstance(factor, numbers.Number):
+        factor = dict(line=factor, sample=factor)
+    dims = ("line", "sample")
+    if dn.dims[-2:] != dims:
+        raise ValueError(f"last dimensions must be {dims}, not {dn.dims[-2:]}")
+    scale = tuple(float(factor[d]) for d in dims)
+    if min(scale) < 1:
+        raise ValueError(f"multilook factor must be >= 1, not {factor}")
+    shape = tuple(int(dn.sizes[d] / s) for d, s in zip(dims, scale))
+
+    data = dn.data
+    if not isinstance(data, dask.array.Array):
+        data = dask.array.from_array(data, chunks=-1)
+    boxes = [
+        _boxes_chunks(data.chunks[axis], s, n)
+        for axis, s, n in zip([-2, -1], scale, shape)
+    ]
+    rows = []
+    for first_line, lines, line0, line1 in boxes[0]:
+        row = []
+        for first_sample, samples, sample0, sample1 in boxes[1]:
+            piece = data[..., line0:line1, sample0:sample1]
+            # boxes may straddle input chunks: one chunk per piece
+            piece = piece.rechunk({data.ndim - 2: -1, data.ndim - 1: -1})
+            start = (first_line * scale[0] - line0, first_sample * scale[1] - sample0)
+            row.append(
+                piece.map_blocks(
+                    functools.partial(
+                        _multilook_block,
+                        start=start,
+                        scale=scale,
+                        shape=(lines, samples),
+                        output=output,
+                    ),
+                    chunks=piece.chunks[:-2] + ((lines,), (samples,)),
+                    dtype=np.float32,
+                )
+            )
+        rows.append(row)
+    # leading dimensions are not concatenated
+    data = dask.array.block(rows)
+
+    coords = {}
+    for d, s, n in zip(dims, scale, shape):
+        step = float(dn[d][1] - dn[d][0]) if dn.sizes[d] > 1 else 1.0
+        # box centres
+        coords[d] = float(dn[d][0]) + (np.arange(n) * s + (s - 1) / 2) * step
+    for name, coord in dn.coords.items():
+        if not set(coord.dims) & set(dims):
+            coords[name] = coord
+    return xr.DataArray(data, dims=dn.dims, coords=coords, attrs=dn.attrs)
@@ -0,0 +1,142 @@
+"""
+thermal noise field (range x azimuth noise vectors), evaluated block by block
+"""
+import numpy as np
+
+from safe_s1.grid import interp_weights, lerp_rows
+
+
+def noise_vectors(xml_parser, xml_file):
+    """
+    raw range and azimuth noise vectors of the noise file `xml_file`.
+
+    Unlike `safe_s1.Sentinel1Reader.get_noise_range_raw`, vectors are not truncated to a common
+    size, and all azimuth blocks are kept (a swath may have several blocks).
+
+    Returns
+    -------
+    dict
+        with keys
+
+        * range: dict with `line` (1D array), and `sample` and `noise_lut` (lists of 1D arrays, one by line)
+        * azimuth: list of dicts with `line_start`, `line_stop`, `sample_start`, `sample_stop` (int),
+          and `line` and `noise_lut` (1D arrays). Empty if the product has no azimuth noise
+          (IPF < 2.9, or WV).
+    """
+    vectors = dict(
+        range=dict(
+            line=np.asarray(xml_parser.get_var(xml_file, "noise.range.line")),
+            sample=xml_parser.get_var(xml_file, "noise.range.sample"),
+            noise_lut=xml_parser.get_var(xml_file, "noise.range.noiseLut"),
+        ),
+        azimuth=[],
+    )
+    keys = ["line", "line_start", "line_stop", "sample_start", "sample_stop"]
+    azi = {key: xml_parser.get_var(xml_file, "noise.azi.%s" % key) for key in keys}
+    azi["noise_lut"] = xml_parser.get_var(xml_file, "noise.azi.noiseLut")
+    for i in range(len(azi["noise_lut"])):
+        vectors["azimuth"].append(
+            dict(
+                line=np.atleast_1d(azi["line"][i]),
+                noise_lut=np.atleast_1d(azi["noise_lut"][i]),
+                **{key: int(azi[key][i]) for key in keys[1:]},
+            )
+        )
+    return vectors
+
+
+def range_noise(lines, samples, vectors, dtype=np.float64):
+    """
+    range noise at `lines` and `samples`: each vector is interpolated along its own samples,
+    then vectors are linearly interpolated along lines.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D output lines
+    samples: numpy.ndarray
+        1D output samples
+    vectors: dict
+        range vectors, from `noise_vectors`
+    dtype: numpy.dtype
+        output dtype
+
+    Returns
+    -------
+    numpy.ndarray
+        2D array of shape (lines.size, samples.size)
+    """
+    index, weight = interp_weights(lines, vectors["line"])
+    # only vectors around lines are interpolated along samples
+    rows = np.arange(index.min(), min(index.max() + 2, len(vectors["line"])))
+    along = np.stack(
+        [
+            np.interp(samples, vectors["sample"][row], vectors["noise_lut"][row])
+            for row in rows
+        ]
+    )
+    return lerp_rows(along, index - rows[0], weight, dtype=dtype)
+
+
+def apply_azimuth_noise(noise, lines, samples, blocks):
+    """
+    multiply `noise` by the azimuth noise at `lines` and `samples`, in place. Each azimuth block is
+    interpolated along lines, and is constant along samples. Pixels outside all blocks (image
+    borders without valid data) are unchanged, like products without azimuth noise, so the
+    backscatter stays finite there. Without blocks (no azimuth noise), `noise` is unchanged.
+
+    Parameters
+    ----------
+    noise: numpy.ndarray
+        2D array of shape (lines.size, samples.size)
+    lines: numpy.ndarray
+        1D increasing output lines
+    samples: numpy.ndarray
+        1D increasing output samples
+    blocks: list of dict
+        azimuth blocks, from `noise_vectors`
+
+    Returns
+    -------
+    numpy.ndarray
+        noise
+    """
+    for block in blocks:
+        # block bounds are inclusive pixel indexes: pixel centres of resampled grids are inside
+        # [start - 0.5, stop + 0.5[
+        l0, l1 = np.searchsorted(
+            lines, [block["line_start"] - 0.5, block["line_stop"] + 0.5]
+        )
+        s0, s1 = np.searchsorted(
+            samples, [block["sample_start"] - 0.5, block["sample_stop"] + 0.5]
+        )
+        if l0 == l1 or s0 == s1:
+            continue
+        noise[l0:l1, s0:s1] *= np.interp(
+            lines[l0:l1], block["line"], block["noise_lut"]
+        )[:, np.newaxis]
+    return noise
+
+
+def noise_block(lines, samples, vectors, out_dtype):
+    """
+    noise field (range noise x azimuth noise) at `lines` and `samples`.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D increasing output lines
+    samples: numpy.ndarray
+        1D increasing output samples
+    vectors: dict
+        from `noise_vectors`
+    out_dtype: numpy.dtype
+
+    Returns
+    -------
+    numpy.ndarray
+        2D array of shape (lines.size, samples.size)
+    """
+    noise = range_noise(lines, samples, vectors["range"], dtype=out_dtype)
+    noise = apply_azimuth_noise(noise, lines, samples, vectors["azimuth"])
+    return noise.astype(out_dtype, copy=False)
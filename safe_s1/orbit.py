@@ -0,0 +1,114 @@
+"""
+orbit state vectors interpolation at image azimuth times
+"""
+import dask.array
+import numpy as np
+
+
+class OrbitInterpolator:
+    """
+    piecewise cubic Hermite interpolation of orbit state vectors: between two consecutive state
+    vectors, positions are the cubic polynomial matching both positions and velocities, and
+    velocities are its derivative.
+
+    Polynomial coefficients are computed once, so evaluation at millions of times is a few
+    vectorized operations.
+
+    Parameters
+    ----------
+    times: numpy.ndarray
+        1D increasing datetime64 state vectors times
+    positions: numpy.ndarray
+        (time, 3) positions
+    velocities: numpy.ndarray
+        (time, 3) velocities
+    """
+
+    def __init__(self, times, positions, velocities):
+        times = np.asarray(times).astype("datetime64[ns]").view(np.int64)
+        if times.size < 2:
+            raise ValueError("at least 2 state vectors are needed")
+        self.epoch = times[0]
+        # seconds since epoch
+        self.times = (times - self.epoch) / 1e9
+        self.steps = np.diff(self.times)
+        p0, p1 = positions[:-1], positions[1:]
+        v0, v1 = (
+            velocities[:-1] * self.steps[:, np.newaxis],
+            velocities[1:] * self.steps[:, np.newaxis],
+        )
+        # p(u) = c0 + c1 * u + c2 * u ** 2 + c3 * u ** 3, for u in [0, 1] between state vectors
+        # (component, coefficient, interval)
+        self.coefficients = np.stack(
+            [p0, v0, 3 * (p1 - p0) - 2 * v0 - v1, 2 * (p0 - p1) + v0 + v1]
+        ).transpose(2, 0, 1)
+
+    @classmethod
+    def from_dataset(cls, orbit):
+        """interpolator of `safe_s1.Sentinel1Reader.orbit` dataset"""
+        return cls(
+            orbit["time"].values,
+            np.stack([orbit["position_%s" % c].values for c in "xyz"], axis=-1),
+            np.stack([orbit["velocity_%s" % c].values for c in "xyz"], axis=-1),
+        )
+
+    def _evaluate(self, times):
+        """(positions, velocities) stacked in a (2, 3, ...) array"""
+        t = (
+            np.asarray(times).astype("datetime64[ns]").view(np.int64) - self.epoch
+        ) / 1e9
+        index = np.clip(
+            np.searchsorted(self.times, t, side="right") - 1, 0, self.steps.size - 1
+        )
+        if index.size and index.min() == index.max():
+            # usual case of a block between two state vectors: coefficients are scalars
+            index = index.flat[0]
+        step = self.steps[index]
+        u = (t - self.times[index]) / step
+        outside = (t < self.times[0]) | (t > self.times[-1])
+        out = np.empty((2, 3) + t.shape)
+        for component in range(3):
+            c0, c1, c2, c3 = (c[index] for c in self.coefficients[component])
+            position, velocity = out[0, component], out[1, component]
+            # Horner evaluation, in place
+            np.multiply(c3, u, out=position)
+            position += c2
+            position *= u
+            position += c1
+            np.multiply(3 * c3, u, out=velocity)
+            velocity += 2 * c2
+            velocity *= u
+            velocity += c1
+            velocity /= step
+            position *= u
+            position += c0
+            # no extrapolation (NaT are large negative offsets)
+            position[outside] = np.nan
+            velocity[outside] = np.nan
+        return out
+
+    def __call__(self, times):
+        """
+        positions and velocities at `times`.
+
+        Parameters
+        ----------
+        times: numpy.ndarray or dask.array.Array
+            datetime64 times, of any shape
+
+        Returns
+        -------
+        (array, array)
+            positions and velocities, with shape `(3,) + times.shape` (x, y, z first), as dask arrays
+            if times is a dask array. Times outside the state vectors are nan.
+        """
+        if isinstance(times, dask.array.Array):
+            stacked = times.map_blocks(
+                self._evaluate,
+                new_axis=[0, 1],
+                chunks=((2,), (3,)) + times.chunks,
+                dtype=np.float64,
+            )
+        else:
+            stacked = self._evaluate(times)
+        return stacked[0], stacked[1]
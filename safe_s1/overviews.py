@@ -0,0 +1,236 @@
+"""
+reduced resolution levels (overviews) of measurement files, cached on disk
+"""
+import logging
+import os
+import tempfile
+import threading
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+
+from safe_s1.cache import evict_lru, tmp_prefix, touch
+from safe_s1.handles import open_dataset
+
+logger = logging.getLogger("xsar.overviews")
+logger.addHandler(logging.NullHandler())
+
+level_resamplings = [Resampling.rms, Resampling.average]
+"""resamplings that can be served from a level built by block averaging"""
+
+level_block = 512
+"""size of the square tiff blocks of levels"""
+
+# one build lock by level path
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def level_size(shape, factor):
+    """size in bytes of the level of a (line, sample) `shape` image (see `OverviewCache.build`)"""
+    tiles = [-(-s // factor // level_block) for s in shape]
+    return tiles[0] * tiles[1] * level_block**2 * np.dtype("float32").itemsize
+
+
+def block_reduce(arr, factor, resampling):
+    """
+    reduce 2D array `arr` by `factor`, by averaging (or rms) factor x factor blocks.
+    Blocks at the image border may be smaller than factor x factor.
+
+    Returns
+    -------
+    numpy.ndarray
+        float32 array of shape ceil(arr.shape / factor)
+    """
+    out_shape = tuple(-(-size // factor) for size in arr.shape)
+    # zero padded, so border blocks sums are not changed
+    padded = np.zeros((out_shape[0] * factor, out_shape[1] * factor))
+    padded[: arr.shape[0], : arr.shape[1]] = arr
+    if resampling == Resampling.rms:
+        padded **= 2
+    reduced = padded.reshape(out_shape[0], factor, out_shape[1], factor).sum(
+        axis=(1, 3)
+    )
+    counts = [
+        np.minimum(size - np.arange(0, size, factor), factor) for size in arr.shape
+    ]
+    reduced /= np.outer(*counts)
+    if resampling == Resampling.rms:
+        reduced = np.sqrt(reduced)
+    return reduced.astype(np.float32)
+
+
+class OverviewCache:
+    """
+    Build and cache power of two reduced resolution levels of measurement files, so coarse
+    resolution requests don't have to read the full resolution raster each time.
+
+    A level is only used when output pixels are made of whole level pixels (the scale is a
+    multiple of the level factor, like for integer resolutions), so reading a level gives the same
+    averages as reading the full resolution raster (up to float32 rounding). Levels are built on
+    first read (at compute time), and only if they fit in `max_size`.
+
+    Files with internal overviews are not cached, because gdal already use them when resampling.
+
+    Parameters
+    ----------
+    cache_dir: str
+        directory where levels are stored
+    max_size: None or int
+        maximum size of cache_dir in bytes. Least recently used levels are removed above this size.
+    min_factor: int
+        smallest level factor to build.
+    """
+
+    def __init__(self, cache_dir, max_size=None, min_factor=2):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_size = max_size
+        self.min_factor = min_factor
+
+    def __repr__(self):
+        return "<OverviewCache %s>" % self.cache_dir
+
+    def level_path(self, filename, factor, resampling):
+        """path of the cached level for filename"""
+        root = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(
+            self.cache_dir, "%s.%s.x%d.tif" % (root, resampling.name, factor)
+        )
+
+    def level(self, filename, scale, resampling, opener=None, pool=None, keep=()):
+        """
+        get the coarsest level that can be used to read `filename` at `scale` (the level is not
+        built, see `OverviewCache.get`).
+
+        Parameters
+        ----------
+        filename: str
+            full resolution measurement file
+        scale: tuple of float
+            (line, sample) size of an output pixel, in full resolution pixels
+        resampling: rasterio.enums.Resampling
+        opener: None or callable
+            python opener for filename, if not local (see `safe_s1.handles.open_dataset`)
+        pool: None or safe_s1.handles.HandlePool
+            pool to open filename from (see `safe_s1.handles.open_dataset`)
+        keep: iterable of tuple
+            levels (from previous calls) used with this one, like those of other polarizations,
+            that must fit in `max_size` with it.
+
+        Returns
+        -------
+        None or (str, int, int)
+            level path, its factor relative to `filename`, and its size in bytes. None if filename
+            must be read.
+        """
+        if resampling not in level_resamplings:
+            return None
+        # largest power of two dividing both scales
+        factor = 1
+        while all(s % (factor * 2) == 0 for s in scale):
+            factor *= 2
+        if factor < self.min_factor:
+            return None
+        with open_dataset(filename, opener=opener, pool=pool) as src:
+            if src.overviews(1) or "complex" in src.dtypes[0]:
+                # internal overviews are used by gdal, and complex data can't be averaged
+                return None
+            shape = (src.height, src.width)
+
+        path = self.level_path(filename, factor, resampling)
+        size = level_size(shape, factor)
+        if self.max_size is not None and size + sum(k[2] for k in keep) > self.max_size:
+            # it would evict levels in use, and be evicted by them
+            logger.debug("%s doesn't fit in %s", path, self)
+            return None
+        return path, factor, size
+
+    def get(self, filename, factor, resampling, opener=None, pool=None):
+        """
+        path of the level `factor` of `filename`, built if it's not cached (see
+        `OverviewCache.level`). Concurrent calls in the process wait for the same build.
+        """
+        path = self.level_path(filename, factor, resampling)
+        with _build_locks_lock:
+            lock = _build_locks.setdefault(path, threading.Lock())
+        with lock:
+            if not os.path.exists(path):
+                # build from the coarsest existing level
+                src_factor = factor // 2
+                while src_factor > 1 and not os.path.exists(
+                    self.level_path(filename, src_factor, resampling)
+                ):
+                    src_factor //= 2
+                src_path = (
+                    filename
+                    if src_factor == 1
+                    else self.level_path(filename, src_factor, resampling)
+                )
+                self.build(
+                    src_path,
+                    path,
+                    factor // src_factor,
+                    resampling,
+                    opener=opener if src_factor == 1 else None,
+                    pool=pool if src_factor == 1 else None,
+                )
+                evict_lru(self.cache_dir, self.max_size, keep=[path])
+        touch(path)
+        return path
+
+    def build(
+        self,
+        src_path,
+        dst_path,
+        factor,
+        resampling,
+        src_lines=256,
+        opener=None,
+        pool=None,
+    ):
+        """
+        build the level `dst_path`, reducing `src_path` by `factor`.
+        src_path is read by strips of about `src_lines` lines, to keep memory bounded.
+        """
+        strip_lines = max(1, src_lines // factor)
+        logger.info("building overview %s", dst_path)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open_dataset(src_path, opener=opener, pool=pool) as src:
+            height, width = (-(-src.height // factor), -(-src.width // factor))
+            profile = dict(
+                driver="GTiff",
+                dtype="float32",
+                count=1,
+                height=height,
+                width=width,
+                tiled=True,
+                blockxsize=level_block,
+                blockysize=level_block,
+            )
+            # write in a temporary file, so concurrent readers never see a partial level
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=tmp_prefix, suffix=".tif", dir=self.cache_dir
+            )
+            os.close(fd)
+            try:
+                with rasterio.open(tmp_path, "w", **profile) as dst:
+                    for line in range(0, height, strip_lines):
+                        lines = min(strip_lines, height - line)
+                        window = rasterio.windows.Window(
+                            0,
+                            line * factor,
+                            src.width,
+                            min(lines * factor, src.height - line * factor),
+                        )
+                        dst.write(
+                            block_reduce(
+                                src.read(1, window=window), factor, resampling
+                            ),
+                            1,
+                            window=rasterio.windows.Window(0, line, width, lines),
+                        )
+                os.replace(tmp_path, dst_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
@@ -1,67 +1,523 @@
+import functools
+import json
 import logging
 import os
 import pdb
+import posixpath
 import re
+import types
 
 import dask
 import fsspec
+import fsspec.implementations.local
 import numpy as np
 import pandas as pd
 import rasterio
 import xarray as xr
 import yaml
 from affine import Affine
-from rioxarray import rioxarray
 
-from safe_s1 import sentinel1_xml_mappings
+from safe_s1 import cache
+from safe_s1 import metadata_dtype as md
+from safe_s1 import safezip, sentinel1_xml_mappings, sidecar
+from safe_s1 import window as sw
+from safe_s1.antenna import antenna_block, antenna_vectors
+from safe_s1.grid import GridInterpolator, bilinear, on_grid
+from safe_s1.handles import HandlePool, open_dataset
+from safe_s1.masks import burst_valid_block, swath_block, swath_bounds
+from safe_s1.multilook import box_average, multilook, to_intensity
+from safe_s1.noise import noise_block, noise_vectors
+from safe_s1.orbit import OrbitInterpolator
+from safe_s1.overviews import OverviewCache
+from safe_s1.references import tiff_references
+from safe_s1.tiff_layout import memmap as tiff_memmap
+from safe_s1.tiff_layout import read_layout, read_native
 from safe_s1.xml_parser import XmlParser
 
 
-class Sentinel1Reader:
-    def __init__(self, name, backend_kwargs=None):
-        logging.debug("input name: %s", name)
-        if not isinstance(name, (str, os.PathLike)):
-            raise ValueError(f"cannot deal with object of type {type(name)}: {name}")
-        # gdal dataset name
-        if not name.startswith("SENTINEL1_DS:"):
-            name = "SENTINEL1_DS:%s:" % name
-        self.name = name
-        """Gdal dataset name"""
-        name_parts = self.name.split(":")
-        if len(name_parts) > 3:
-            logging.debug("windows case")
-            # windows might have semicolon in path ('c:\...')
-            name_parts[1] = ":".join(name_parts[1:-1])
-            del name_parts[2:-1]
-        name_parts[1] = os.path.basename(name_parts[1])
-        self.short_name = ":".join(name_parts)
-        logging.debug("short_name : %s", self.short_name)
-        """Like name, but without path"""
-        if len(name_parts) == 2:
-            self.path = self.name.split(":")[1]
+def _rio_dtype(rio):
+    """numpy dtype of data read from rasterio dataset `rio` (complex_int16 is read as complex64)"""
+    if rio.dtypes[0] == "complex_int16":
+        return np.dtype("complex64")
+    return np.dtype(rio.dtypes[0])
+
+
+def _rio_shape(rio):
+    """snapshot of `rio` shape, dtype and tiff blocks, usable after rio is closed"""
+    return types.SimpleNamespace(
+        height=rio.height,
+        width=rio.width,
+        dtypes=rio.dtypes,
+        block_shapes=rio.block_shapes,
+    )
+
+
+def _auto_chunks(rio, scale=(1, 1), chunk_size=None, out_dtype=None):
+    """
+    Chunks sizes that are multiples of the native tiff blocks of `rio`, and that fit in chunk_size.
+
+    Parameters
+    ----------
+    rio: rasterio.DatasetReader
+    scale: tuple of float
+        (line, sample) size of an output pixel, in full resolution pixels.
+        Chunks are aligned at full resolution (where data is read), and then scaled.
+    chunk_size: None, str or int
+        target chunk size, in bytes. Default to dask config `array.chunk-size`.
+    out_dtype: None or numpy.dtype
+        dtype of output chunks, if data are resampled while they are read (gdal resampled reads
+        only hold the output chunk in memory): output chunks are sized to fit chunk_size.
+        If None, the full resolution window of a chunk (in the file dtype) fits chunk_size.
+
+    Returns
+    -------
+    dict
+        with 'line' and 'sample' keys
+    """
+    if chunk_size is None:
+        chunk_size = dask.config.get("array.chunk-size")
+    target = dask.utils.parse_bytes(chunk_size)
+    # number of full resolution pixels by chunk
+    if out_dtype is None:
+        pixels = target / _rio_dtype(rio).itemsize
+    else:
+        pixels = target / np.dtype(out_dtype).itemsize * scale[0] * scale[1]
+    block_lines, block_samples = rio.block_shapes[0]
+    # square output chunks, unless blocks are full width strips
+    side = np.sqrt(pixels / (scale[0] * scale[1]))
+    samples = int(side * scale[1]) // block_samples * block_samples
+    samples = min(max(samples, block_samples), rio.width)
+    lines = int(pixels // samples) // block_lines * block_lines
+    lines = min(max(lines, block_lines), rio.height)
+    chunks = {}
+    for dim, size, full, dim_scale in [
+        ("line", lines, rio.height, scale[0]),
+        ("sample", samples, rio.width, scale[1]),
+    ]:
+        # whole dimensions keep their partial last output pixel in the chunk
+        size = np.ceil(size / dim_scale) if size == full else size / dim_scale
+        chunks[dim] = max(1, int(size))
+    return chunks
+
+
+def _fill_auto_chunks(chunks, auto_chunks):
+    """replace 'auto' values in chunks by those from auto_chunks"""
+    return {
+        dim: auto_chunks[dim] if size == "auto" else size
+        for dim, size in chunks.items()
+    }
+
+
+def _full_resolution_chunks(chunks, scale, size):
+    """
+    full resolution chunks of a dimension of `size` pixels, holding output chunks of `chunks` boxes
+    of `scale` pixels (see `safe_s1.multilook.multilook`). Other values ('auto', -1) are kept.
+    """
+    if not isinstance(chunks, int) or chunks < 1:
+        return chunks
+    starts = np.unique(np.round(np.arange(0, size / scale, chunks) * scale).astype(int))
+    return tuple(np.diff(np.append(starts[starts < size], size)).tolist())
+
+
+# load_digital_number outputs, and their dtype (None for the raw digital number dtype)
+dn_outputs = {
+    None: None,
+    "complex": None,
+    "native": None,
+    "intensity": "f4",
+    "amplitude": "f4",
+}
+
+
+def _convert_dn(dn, output):
+    """
+    convert digital numbers to `output` (see `dn_outputs`).
+
+    Parameters
+    ----------
+    dn: numpy.ndarray
+        raw digital numbers (complex for SLC)
+    output: None or str
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    if dn_outputs[output] is None:
+        return dn
+    if output == "intensity":
+        return to_intensity(dn)
+    if np.iscomplexobj(dn):
+        return np.abs(dn).astype(np.float32)
+    return dn.astype(np.float32)
+
+
+def _read_intensity_block(
+    lines, samples, filename, scale, output, out_dtype, opener=None, pool=None
+):
+    """
+    read the block of the resampled image at output indexes `lines` and `samples`,
+    averaging digital numbers in intensity domain (boxes can be fractional).
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D contiguous output line indexes
+    samples: numpy.ndarray
+        1D contiguous output sample indexes
+    filename: str
+        measurement file
+    scale: tuple of float
+        (line, sample) size of an output pixel, in full resolution pixels
+    output: str
+        'intensity' or 'amplitude'
+    out_dtype: numpy.dtype
+        output dtype
+    opener: None or callable
+        see `safe_s1.handles.open_dataset`
+    pool: None or safe_s1.handles.HandlePool
+        see `safe_s1.handles.open_dataset`
+
+    Returns
+    -------
+    numpy.ndarray
+        2D array of shape (lines.size, samples.size)
+    """
+    with open_dataset(filename, opener=opener, pool=pool) as rio:
+        # full resolution window covering the output boxes
+        start = (lines[0] * scale[0], samples[0] * scale[1])
+        stop = (
+            min((lines[-1] + 1) * scale[0], rio.height),
+            min((samples[-1] + 1) * scale[1], rio.width),
+        )
+        first = (int(np.floor(start[0])), int(np.floor(start[1])))
+        window = rasterio.windows.Window.from_slices(
+            (first[0], int(np.ceil(stop[0]))), (first[1], int(np.ceil(stop[1])))
+        )
+        intensity = to_intensity(rio.read(1, window=window))
+    intensity = box_average(
+        intensity,
+        (start[0] - first[0], start[1] - first[1]),
+        scale,
+        (lines.size, samples.size),
+    )
+    if output == "amplitude":
+        intensity = np.sqrt(intensity)
+    return intensity.astype(out_dtype)
+
+
+def _read_native_block(lines, samples, filename, layout, opener=None, pool=None):
+    """
+    read complex samples at full resolution indexes `lines` and `samples`, as int16 (real, imag) pairs.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D contiguous line indexes
+    samples: numpy.ndarray
+        1D contiguous sample indexes
+    filename: str
+        measurement file
+    layout: None or dict
+        from `safe_s1.tiff_layout.read_layout`. If None (compressed file), samples are decoded by gdal
+        and converted back to int16.
+    opener: None or callable
+        see `safe_s1.handles.open_dataset`
+    pool: None or safe_s1.handles.HandlePool
+        see `safe_s1.handles.open_dataset`
+
+    Returns
+    -------
+    numpy.ndarray
+        3D array of shape (lines.size, samples.size, 2)
+    """
+    if layout is not None:
+        return read_native(filename, lines, samples, layout, opener=opener)
+    window = rasterio.windows.Window(samples[0], lines[0], samples.size, lines.size)
+    with open_dataset(filename, opener=opener, pool=pool) as rio:
+        dn = rio.read(1, window=window)
+    return np.stack([dn.real, dn.imag], axis=-1).astype(np.int16)
+
+
+def _backscatter_block(intensity, lines, samples, lut, vectors, noise_sign):
+    """
+    calibrated backscatter of one block: `(intensity + noise_sign * noise) / lut ** 2`.
+
+    Parameters
+    ----------
+    intensity: numpy.ndarray
+        3D (1, line, sample) block of digital number intensity
+    lines: numpy.ndarray
+        1D block lines
+    samples: numpy.ndarray
+        1D block samples
+    lut: dict
+        calibration look up table, with `line`, `sample` and `values` keys (see `safe_s1.grid.bilinear`)
+    vectors: None or dict
+        noise vectors, from `safe_s1.noise.noise_vectors`. None if noise is not used.
+    noise_sign: int
+        -1 to remove noise, 1 to add it back (for denoised products)
+
+    Returns
+    -------
+    numpy.ndarray
+        float32 array with the shape of intensity
+    """
+    backscatter = intensity[0].astype(np.float32)
+    if vectors is not None:
+        noise = noise_block(lines, samples, vectors, np.float32)
+        if noise_sign < 0:
+            backscatter -= noise
         else:
-            self.path = ":".join(self.name.split(":")[1:-1])
-        logging.debug("path: %s", self.path)
-        # remove trailing slash in the safe path
-        if self.path[-1] == "/":
-            self.path = self.path.rstrip("/")
-        """Dataset path"""
-        self.safe = os.path.basename(self.path)
-
-        self.path = os.fspath(self.path)
-
-        if backend_kwargs is None:
-            backend_kwargs = {}
+            backscatter += noise
+        del noise
+    lut = bilinear(lines, samples, lut["line"], lut["sample"], lut["values"])
+    lut **= 2
+    backscatter /= lut
+    return backscatter[np.newaxis]
+
+
+def _read_memmap_block(lines, samples, filename, layout, out_dtype):
+    """
+    read samples at full resolution indexes `lines` and `samples` from the memory mapped file.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D contiguous line indexes
+    samples: numpy.ndarray
+        1D contiguous sample indexes
+    filename: str
+        local measurement file
+    layout: dict
+        from `safe_s1.tiff_layout.read_layout`, for a file accepted by `safe_s1.tiff_layout.memmap`.
+    out_dtype: numpy.dtype
+        output dtype (like gdal reads)
+
+    Returns
+    -------
+    numpy.ndarray
+        2D array of shape (lines.size, samples.size). For real data in native byte order, it's a
+        view of the file (no copy).
+    """
+    mm = tiff_memmap(filename, layout)[
+        lines[0] : lines[-1] + 1, samples[0] : samples[-1] + 1
+    ]
+    if layout["components"] == 2:
+        dn = np.empty(mm.shape[:2], dtype=out_dtype)
+        dn.real = mm[..., 0]
+        dn.imag = mm[..., 1]
+        return dn
+    return mm[..., 0].astype(out_dtype, copy=False)
+
+
+def _read_burst_block(
+    bursts,
+    samples,
+    filename,
+    lines_per_burst,
+    first_valid,
+    last_valid,
+    line_window=None,
+    opener=None,
+    pool=None,
+):
+    """
+    read the lines of one burst, at `samples`, and mask invalid samples with nan.
+
+    Parameters
+    ----------
+    bursts: numpy.ndarray
+        1 element array with the burst index
+    samples: numpy.ndarray
+        1D contiguous sample indexes
+    filename: str
+        measurement file
+    lines_per_burst: int
+    first_valid: numpy.ndarray
+        (burst, line) first valid sample (nan if the whole line is invalid)
+    last_valid: numpy.ndarray
+        (burst, line) last valid sample (nan if the whole line is invalid)
+    line_window: None or slice
+        full image lines of the reader window. Burst lines outside are masked with nan.
+    opener: None or callable
+        see `safe_s1.handles.open_dataset`
+    pool: None or safe_s1.handles.HandlePool
+        see `safe_s1.handles.open_dataset`
+
+    Returns
+    -------
+    numpy.ndarray
+        3D array of shape (1, lines_per_burst, samples.size)
+    """
+    burst = bursts[0]
+    window = rasterio.windows.Window(
+        samples[0], burst * lines_per_burst, samples.size, lines_per_burst
+    )
+    with open_dataset(filename, opener=opener, pool=pool) as rio:
+        dn = rio.read(1, window=window)
+    # comparisons with nan are False, so fully invalid lines are masked
+    valid = (samples >= first_valid[burst][:, np.newaxis]) & (
+        samples <= last_valid[burst][:, np.newaxis]
+    )
+    if line_window is not None:
+        lines = burst * lines_per_burst + np.arange(lines_per_burst)
+        valid &= ((lines >= line_window.start) & (lines < line_window.stop))[
+            :, np.newaxis
+        ]
+    return np.where(valid, dn, np.nan).astype(dn.dtype)[np.newaxis]
+
+
+def _read_resampled_block(
+    lines,
+    samples,
+    filename,
+    scale,
+    resampling,
+    out_dtype,
+    level=None,
+    opener=None,
+    pool=None,
+):
+    """
+    read the block of the resampled image at output indexes `lines` and `samples`.
+
+    Parameters
+    ----------
+    lines: numpy.ndarray
+        1D contiguous output line indexes
+    samples: numpy.ndarray
+        1D contiguous output sample indexes
+    filename: str
+        measurement file
+    scale: tuple of float
+        (line, sample) size of an output pixel, in full resolution pixels
+    resampling: rasterio.enums.Resampling
+    out_dtype: numpy.dtype
+        output dtype
+    level: None or tuple
+        (get, factor) of a reduced resolution level of filename, to read instead of filename.
+        `get()` returns the level path, building it on first use (see
+        `safe_s1.overviews.OverviewCache.get`). filename is read if the level is not available
+        anymore (evicted from the cache).
+    opener: None or callable
+        see `safe_s1.handles.open_dataset` (levels are always local files)
+    pool: None or safe_s1.handles.HandlePool
+        see `safe_s1.handles.open_dataset`
+
+    Returns
+    -------
+    numpy.ndarray
+        2D array of shape (lines.size, samples.size)
+    """
+    if level is not None:
+        try:
+            return _read_resampled_window(
+                level[0](),
+                lines,
+                samples,
+                (scale[0] / level[1], scale[1] / level[1]),
+                resampling,
+                out_dtype,
+                pool=pool,
+            )
+        except rasterio.errors.RasterioIOError:
+            logging.debug("level of %s not available, reading it", filename)
+    return _read_resampled_window(
+        filename, lines, samples, scale, resampling, out_dtype, opener=opener, pool=pool
+    )
+
+
+def _read_resampled_window(
+    filename, lines, samples, scale, resampling, out_dtype, opener=None, pool=None
+):
+    """read output `lines` and `samples` from filename (see `_read_resampled_block`)"""
+    window = rasterio.windows.Window(
+        samples[0] * scale[1],
+        lines[0] * scale[0],
+        samples.size * scale[1],
+        lines.size * scale[0],
+    )
+    with open_dataset(filename, opener=opener, pool=pool) as rio:
+        kwargs = {}
+        if _rio_dtype(rio) != out_dtype:
+            # reduced resolution level, stored as float
+            kwargs["out_dtype"] = out_dtype
+        return rio.read(
+            1,
+            window=window,
+            out_shape=(lines.size, samples.size),
+            resampling=resampling,
+            **kwargs,
+        )
 
-        storage_options = backend_kwargs.get("storage_options", {})
 
-        mapper = fsspec.get_mapper(self.path, **storage_options)
-        self.xml_parser = XmlParser(
-            xpath_mappings=sentinel1_xml_mappings.xpath_mappings,
-            compounds_vars=sentinel1_xml_mappings.compounds_vars,
-            namespaces=sentinel1_xml_mappings.namespaces,
-            mapper=mapper,
-        )
+class Sentinel1Reader:
+    """
+    Sentinel-1 SAFE reader.
+
+    Parameters
+    ----------
+    name: str or os.PathLike
+        path to the SAFE, or gdal dataset name like 'SENTINEL1_DS:/path/file.SAFE:IW1'.
+        Zipped SAFE ('.zip' paths or urls) are read without extraction: xml files through the zip
+        index, and measurement files through gdal '/vsizip/' (or the zip filesystem if remote).
+    backend_kwargs: dict, optional
+        * storage_options: dict passed to `fsspec.get_mapper`. Used for xml and measurement files.
+        * open_kwargs: dict passed to `fsspec.AbstractFileSystem.open` when measurement files (or
+          the zipped SAFE) are not local (block cache and readahead configuration). Default to
+          `{"block_size": 4 MiB, "cache_type": "blockcache"}`.
+        * overview_cache: dict of `safe_s1.overviews.OverviewCache` kwargs (`cache_dir`, `max_size`).
+          If set, integer resolution requests of `Sentinel1Reader.load_digital_number` are read
+          from cached reduced resolution levels (built by the first read), instead of the full
+          resolution raster.
+        * remote_cache: dict of `safe_s1.cache.remote_caches` kwargs (`cache_dir`, `xml_max_size`,
+          `tiff_max_size`, `ttl`). If set, xml files of remote SAFE are cached whole on local
+          disk, and measurement files by blocks of `open_kwargs` block_size, only where they are
+          read. Both tiers are shared between processes, and bounded (least recently used files are
+          removed first).
+        * memmap: bool. If True (default), full resolution digital numbers of local uncompressed
+          measurement files stored in contiguous strips (usual for GRD) are read through numpy
+          memory maps, without gdal copies.
+        * handles: dict of `safe_s1.handles.HandlePool` kwargs (`size`, `max_handles`,
+          `opener_size`), to bound the number of measurement files datasets kept open by the reader.
+          Set `opener_size` to 1 if the fsspec filesystem returns the same file object at each
+          open, like the memory filesystem (see `safe_s1.handles.HandlePool`).
+    metadata_dtype: None, str or numpy.dtype, optional
+        If set (for example "float32"), grids and look up tables (groups listed in
+        `safe_s1.metadata_dtype.compact_groups`) are stored with this floating dtype, and their
+        time variables as int32 microsecond offsets from the product start date (when it is exact).
+        Float coordinates are kept as float64. Default to None: float64 and datetime64[ns] are kept.
+    window: dict, optional
+        pixel window, with 'line' and 'sample' keys, and slices (or (start, stop) tuples) as values.
+        If set, `Sentinel1Reader.load_digital_number` returns only the window, and (line, sample)
+        grids and look up tables (groups listed in `safe_s1.window.cropped_groups`) are cropped to
+        the window, with one grid point margin.
+    bbox: tuple of float, optional
+        (lon_min, lat_min, lon_max, lat_max). Like `window`, with the pixel window of the
+        geolocation grid cells intersecting bbox. lon_min > lon_max selects a box crossing the
+        antimeridian (see `safe_s1.window.bbox_to_window`).
+    pols: str or list of str, optional
+        polarizations to use (like 'VV' or ['VV', 'VH']). Measurement, calibration and noise files
+        of other polarizations are never opened. Default to None: all polarizations.
+
+    Measurement files are kept open between reads, and closed by `Sentinel1Reader.close`
+    (or on exit, when the reader is used as a context manager).
+    """
+
+    def __init__(
+        self,
+        name,
+        backend_kwargs=None,
+        metadata_dtype=None,
+        window=None,
+        bbox=None,
+        pols=None,
+    ):
+        self._parse_name(name)
+        self.metadata_dtype = md.check_metadata_dtype(metadata_dtype)
+        """floating dtype used for grids and look up tables (None for float64)"""
+        self._open_source(backend_kwargs)
 
         self.manifest = "manifest.safe"
         if "SLC" in self.path or "GRD" in self.path:
@@ -75,7 +531,19 @@ class Sentinel1Reader:
         else:
             raise Exception("case not handled")
 
+        if isinstance(pols, str):
+            pols = [pols]
+        if pols is not None:
+            unknown = set(pols) - set(self.manifest_attrs["polarizations"])
+            if unknown or not pols:
+                raise ValueError(
+                    f"pols must be in {list(self.manifest_attrs['polarizations'])}, not {pols}"
+                )
+            pols = list(pols)
+        self._pols = pols
+        """selected polarizations (None for all)"""
         self._safe_files = None
+        self._denoised = None
         self._multidataset = False
         """True if multi dataset"""
         self._datasets_names = list(self.safe_files["dsid"].sort_index().unique())
@@ -104,6 +572,12 @@ class Sentinel1Reader:
         self._dict = {
             "geolocationGrid": None,
         }
+        self.window = None
+        """pixel window (dict of 'line' and 'sample' slices), or None for the whole image"""
+        if (window is not None or bbox is not None) and self.multidataset:
+            raise ValueError("window and bbox are not available for multidataset")
+        if window is not None and bbox is not None:
+            raise ValueError("window and bbox can't be both set")
         if not self.multidataset:
             self._dict = {
                 "geolocationGrid": self.geoloc,
@@ -118,14 +592,256 @@ class Sentinel1Reader:
                 "antenna_pattern": self.antenna_pattern,
                 "swath_merging": self.swath_merging,
             }
+            shape = (
+                int(self.image["numberOfLines"]),
+                int(self.image["numberOfSamples"]),
+            )
+            if bbox is not None:
+                self.window = sw.bbox_to_window(
+                    self._dict["geolocationGrid"], bbox, shape
+                )
+            elif window is not None:
+                self.window = sw.check_window(window, shape)
+            if self.window is not None:
+                for group in sw.cropped_groups:
+                    self._dict[group] = sw.crop_dataset(self._dict[group], self.window)
+            if self.metadata_dtype is not None:
+                for group in md.compact_groups:
+                    self._dict[group] = md.compact_dataset(
+                        self._dict[group],
+                        self.metadata_dtype,
+                        self.manifest_attrs["start_date"],
+                    )
             self.dt = xr.DataTree.from_dict(self._dict)
             assert self.dt == self.datatree
         else:
             print("multidataset")
             # there is no error raised here, because we want to let the user access the metadata for multidatasets
 
+    def to_sidecar(self, path, **kwargs):
+        """
+        write the metadata of the reader (`Sentinel1Reader.datatree`, with xsd definitions and
+        history attributes, `Sentinel1Reader.manifest_attrs` and SAFE files) to a consolidated
+        sidecar, to reopen it with `Sentinel1Reader.from_sidecar`.
+
+        Parameters
+        ----------
+        path: str or os.PathLike
+            zarr store, or netCDF file if the suffix is in `safe_s1.sidecar.netcdf_suffixes`
+        kwargs:
+            passed to `xarray.DataTree.to_zarr` or `xarray.DataTree.to_netcdf`
+
+        Raises
+        ------
+        ValueError
+            for multidataset
+        """
+        if self.multidataset:
+            raise ValueError("sidecar is not available for multidataset")
+        files = self.safe_files
+        state = {
+            "name": self.name,
+            "dsid": self.dsid,
+            "product": self.product,
+            "pols": self._pols,
+            "metadata_dtype": (
+                None if self.metadata_dtype is None else self.metadata_dtype.str
+            ),
+            "window": (
+                None
+                if self.window is None
+                else {dim: [s.start, s.stop] for dim, s in self.window.items()}
+            ),
+            "denoised": self.denoised,
+            "manifest_attrs": sidecar.encode_value(self.manifest_attrs),
+            "xsd_definitions": sidecar.encode_value(self.xsd_definitions),
+            # dsid is stored without the SAFE path, that can change
+            "safe_files": {
+                "index": files.index.tolist(),
+                "columns": {
+                    col: (
+                        [dsid.split(":")[-1] for dsid in files[col]]
+                        if col == "dsid"
+                        else files[col].astype(str).tolist()
+                    )
+                    for col in files.columns
+                },
+            },
+        }
+        sidecar.write(self.datatree, state, os.fspath(path), **kwargs)
+
+    @classmethod
+    def from_sidecar(cls, path, name=None, backend_kwargs=None, **kwargs):
+        """
+        reopen a reader from a sidecar written by `Sentinel1Reader.to_sidecar`, without reading
+        the SAFE xml files: only `Sentinel1Reader.load_*` methods needing raw annotation vectors
+        (like noise or antenna pattern) read them.
+
+        xsd definitions (`Sentinel1Reader.xsd_definitions`, and `definition` attributes of the
+        datatree), that are lxml elements when read from the SAFE, are restored as their text.
+
+        Parameters
+        ----------
+        path: str or os.PathLike
+            sidecar
+        name: str or os.PathLike, optional
+            path (or url) of the SAFE, if it's not the one of the exported reader
+        backend_kwargs: dict, optional
+            see `Sentinel1Reader`
+        kwargs:
+            passed to `xarray.open_datatree`
+
+        Returns
+        -------
+        Sentinel1Reader
+        """
+        dt, state = sidecar.read(os.fspath(path), **kwargs)
+        self = cls.__new__(cls)
+        if name is None:
+            name = state["name"]
+        else:
+            name = "SENTINEL1_DS:%s:%s" % (os.fspath(name), state["dsid"])
+        self._parse_name(name)
+        self.metadata_dtype = md.check_metadata_dtype(state["metadata_dtype"])
+        self._open_source(backend_kwargs)
+        self.manifest = "manifest.safe"
+        self.manifest_attrs = sidecar.decode_value(state["manifest_attrs"])
+        self.xsd_definitions = sidecar.decode_value(state["xsd_definitions"])
+        self._pols = state["pols"]
+        self._denoised = state["denoised"]
+        files = pd.DataFrame(
+            state["safe_files"]["columns"], index=state["safe_files"]["index"]
+        )
+        files["polarization"] = files.polarization.astype(
+            "category"
+        ).cat.reorder_categories(self.manifest_attrs["polarizations"], ordered=True)
+        files["dsid"] = files["dsid"].map(
+            lambda dsid: "SENTINEL1_DS:%s:%s" % (self.path, dsid)
+        )
+        self._safe_files = files
+        self._multidataset = False
+        self._datasets_names = list(files["dsid"].sort_index().unique())
+        self.dsid = state["dsid"]
+        self.product = state["product"]
+        self.window = (
+            None
+            if state["window"] is None
+            else {dim: slice(*bounds) for dim, bounds in state["window"].items()}
+        )
+        self._dict = {group: dt[group].to_dataset() for group in dt.children}
+        self.dt = dt
+        return self
+
+    def _parse_name(self, name):
+        """set `name`, `short_name`, `path` and `safe` from the gdal dataset name or path"""
+        logging.debug("input name: %s", name)
+        if not isinstance(name, (str, os.PathLike)):
+            raise ValueError(f"cannot deal with object of type {type(name)}: {name}")
+        # gdal dataset name
+        if not name.startswith("SENTINEL1_DS:"):
+            name = "SENTINEL1_DS:%s:" % name
+        self.name = name
+        """Gdal dataset name"""
+        name_parts = self.name.split(":")
+        if len(name_parts) > 3:
+            logging.debug("windows case")
+            # windows might have semicolon in path ('c:\...')
+            name_parts[1] = ":".join(name_parts[1:-1])
+            del name_parts[2:-1]
+        name_parts[1] = os.path.basename(name_parts[1])
+        self.short_name = ":".join(name_parts)
+        logging.debug("short_name : %s", self.short_name)
+        """Like name, but without path"""
+        if len(name_parts) == 2:
+            self.path = self.name.split(":")[1]
+        else:
+            self.path = ":".join(self.name.split(":")[1:-1])
+        logging.debug("path: %s", self.path)
+        # remove trailing slash in the safe path
+        if self.path[-1] == "/":
+            self.path = self.path.rstrip("/")
+        """Dataset path"""
+        self.safe = os.path.basename(self.path)
+
+        self.path = os.fspath(self.path)
+
+    def _open_source(self, backend_kwargs):
+        """set up xml and measurement files access, from `backend_kwargs` (xml files are not read)"""
+        if backend_kwargs is None:
+            backend_kwargs = {}
+
+        storage_options = backend_kwargs.get("storage_options", {})
+        overview_cache = backend_kwargs.get("overview_cache")
+        self._memmap = backend_kwargs.get("memmap", True)
+        self._overview_cache = (
+            None if overview_cache is None else OverviewCache(**overview_cache)
+        )
+
+        self._opener = None
+        """python opener for measurement files (None if gdal can read them natively)"""
+        self._zip = None
+        """`safe_s1.safezip.zip_filesystem` of zipped SAFE (None if not zipped)"""
+        fs, fs_path = fsspec.core.url_to_fs(self.path, **storage_options)
+        local = isinstance(fs, fsspec.implementations.local.LocalFileSystem)
+        open_kwargs = {"block_size": 2**22, "cache_type": "blockcache"}
+        open_kwargs.update(backend_kwargs.get("open_kwargs", {}))
+        remote_cache = backend_kwargs.get("remote_cache")
+        xml_cache = tiff_cache = None
+        if remote_cache is not None and not local:
+            xml_cache, tiff_cache = cache.remote_caches(**remote_cache)
+        # opener of remote files (measurement files, or the zipped SAFE)
+        if tiff_cache is None:
+            open_remote = functools.partial(fs.open, **open_kwargs)
+        else:
+            open_remote = functools.partial(
+                cache.open_cached,
+                fs,
+                tiff_cache,
+                block_size=open_kwargs["block_size"],
+            )
+        if safezip.is_zip(self.path):
+            zip_path = os.path.abspath(self.path) if local else self.path
+            self._zip = safezip.zip_filesystem(
+                zip_path, storage_options, open_kwargs=None if local else open_kwargs
+            )
+            root = safezip.safe_root(self._zip)
+            self.safe = posixpath.basename(root)
+            mapper = self._zip.get_mapper(root)
+            if local:
+                # gdal reads members directly, and stored members are not decompressed
+                self._files_root = "/vsizip/%s/%s" % (zip_path, root)
+            else:
+                self._files_root = root
+                self._opener = safezip.MemberOpener(
+                    self._zip, functools.partial(open_remote, fs_path)
+                )
+        else:
+            mapper = fsspec.get_mapper(self.path, **storage_options)
+            self._files_root = self.path
+            if not local:
+                self._opener = open_remote
+        if xml_cache is not None:
+            mapper = cache.CachedMapper(mapper, xml_cache, self.path)
+        self._handles = HandlePool(**backend_kwargs.get("handles", {}))
+        """rasterio datasets of measurement files, closed by `Sentinel1Reader.close`"""
+        self._interpolators = {}
+        """`safe_s1.grid.GridInterpolator` of geolocation grid variables, by (name, dtype),
+        (`safe_s1.orbit.OrbitInterpolator`, frame) by 'orbit', and antenna pattern records by
+        'antenna'"""
+        self.xml_parser = XmlParser(
+            xpath_mappings=sentinel1_xml_mappings.xpath_mappings,
+            compounds_vars=sentinel1_xml_mappings.compounds_vars,
+            namespaces=sentinel1_xml_mappings.namespaces,
+            mapper=mapper,
+        )
+
     def load_digital_number(
-        self, resolution=None, chunks=None, resampling=rasterio.enums.Resampling.rms
+        self,
+        resolution=None,
+        chunks="auto",
+        resampling=rasterio.enums.Resampling.rms,
+        output=None,
+        pols=None,
     ):
         """
         load digital_number from self.sar_meta.files['measurement'], as an `xarray.Dataset`.
@@ -133,13 +849,38 @@ class Sentinel1Reader:
         Parameters
         ----------
         resolution: None, numbers.Number, str or dict
-        resampling: rasterio.enums.Resampling
+        chunks: 'auto', None or dict
+            chunks sizes, with 'line' and 'sample' keys ('pol' chunk is always 1).
+            'auto' (or None, or missing keys) selects multiples of the tiff blocks that fit in dask
+            `array.chunk-size` (resampled chunks fit in `array.chunk-size` in the output dtype, or
+            at full resolution for intensity and amplitude outputs).
+        resampling: rasterio.enums.Resampling or 'multilook'
+            'multilook' averages (line, sample) boxes in intensity domain with dask
+            (see `safe_s1.multilook.multilook`), instead of gdal resampling. Output is float32
+            amplitude (or intensity).
+        output: None, 'complex', 'native', 'intensity' or 'amplitude'
+            None or 'complex' returns raw digital numbers (complex for SLC).
+            'intensity' (`|DN|^2`) and 'amplitude' (`|DN|`) are converted to float32 in each chunk,
+            right after the read. If `resolution` is set, digital numbers are averaged in
+            intensity domain (`resampling` is not used), like `safe_s1.multilook.multilook`.
+            'native' returns complex data in their native tiff representation, as int16 with a
+            trailing 'ri' dimension (real, imag), without complex promotion. Chunks are read only
+            views of the tiff strips when the file is uncompressed. Use
+            `dn.sel(ri='real') + 1j * dn.sel(ri='imag')` to get complex values.
+            Real data are returned unchanged. Not available with `resolution`.
+        pols: None, str or list of str
+            polarizations to load, among the reader ones (see `Sentinel1Reader` `pols`).
+            Files of other polarizations are not opened. Default to None: all.
 
         Returns
         -------
         (float, xarray.Dataset)
             tuple that contains resolution and dataset (possibly dual-pol), with basic coords/dims naming convention
         """
+        if output not in dn_outputs:
+            raise ValueError(
+                f"output must be one of {list(dn_outputs)}, not {output!r}"
+            )
 
         def get_glob(strlist):
             # from list of str, replace diff by '?'
@@ -181,7 +922,15 @@ class Sentinel1Reader:
             "slant_range_time": None,
         }
 
-        if resolution is not None:
+        if resolution is not None and resampling == "multilook":
+            if output in [None, "complex", "native"]:
+                if output is not None:
+                    raise ValueError(
+                        f"output={output!r} can't be multilooked (use 'intensity' or 'amplitude')"
+                    )
+                output = "amplitude"
+            comment = 'resampled at "%s" with safe_s1.multilook.multilook' % resolution
+        elif resolution is not None:
             comment = 'resampled at "%s" with %s.%s.%s' % (
                 resolution,
                 resampling.__module__,
@@ -190,45 +939,107 @@ class Sentinel1Reader:
             )
         else:
             comment = "read at full resolution"
+        if output not in [None, "complex"]:
+            comment = "%s, as %s" % (comment, output)
 
         # Add root to path
-        files_measurement = self.files["measurement"].copy()
-        files_measurement = [os.path.join(self.path, f) for f in files_measurement]
+        files_measurement = self._measurement_files(pols)
+        pol_names = [str(pol) for pol in self._pol_files(pols)["polarization"]]
 
         # arbitrary rio object, to get shape, etc ... (will not be used to read data)
-        rio = rasterio.open(files_measurement[0])
+        with open_dataset(
+            files_measurement[0], opener=self._opener, pool=self._handles
+        ) as rio:
+            rio = _rio_shape(rio)
+        native = output == "native" and _rio_dtype(rio).kind == "c"
+        if native and resolution is not None:
+            raise ValueError(
+                "output='native' can't be resampled (resolution must be None)"
+            )
 
-        chunks["pol"] = 1
-        # sort chunks keys like map_dims
-        chunks = dict(
-            sorted(
-                chunks.items(), key=lambda pair: list(map_dims.keys()).index(pair[0])
+        def convert(data):
+            # convert each chunk to output, in the same task as the read
+            if dn_outputs[output] is None:
+                return data
+            # (output is passed with partial, because it's a reserved dask keyword)
+            return data.map_blocks(
+                functools.partial(_convert_dn, output=output),
+                dtype=np.dtype(dn_outputs[output]),
             )
-        )
-        chunks_rio = {map_dims[d]: chunks[d] for d in map_dims.keys()}
+
+        if chunks is None or chunks == "auto":
+            chunks = {}
+        elif not isinstance(chunks, dict):
+            raise ValueError(f"chunks must be a dict, 'auto' or None, not {chunks}")
+        # sort chunks keys like map_dims
+        chunks = {d: chunks.get(d, "auto") for d in map_dims.keys()}
+        chunks["pol"] = 1
         res = None
         if resolution is None:
-            # using tiff driver: need to read individual tiff and concat them
-            # riofiles['rio'] is ordered like self.sar_meta.manifest_attrs['polarizations']
-
-            dn = xr.concat(
-                [
-                    rioxarray.open_rasterio(
-                        f, chunks=chunks_rio, parse_coordinates=False
+            chunks = _fill_auto_chunks(chunks, _auto_chunks(rio))
+            if native:
+                lines = dask.array.arange(rio.height, chunks=chunks["line"])
+                samples = dask.array.arange(rio.width, chunks=chunks["sample"])
+                dn = []
+                for f in files_measurement:
+                    layout = read_layout(f, opener=self._opener, pool=self._handles)
+                    dtype = np.dtype("i2") if layout is None else layout["dtype"]
+                    dn.append(
+                        xr.DataArray(
+                            dask.array.blockwise(
+                                _read_native_block,
+                                "ijk",
+                                lines,
+                                "i",
+                                samples,
+                                "j",
+                                new_axes={"k": 2},
+                                dtype=dtype,
+                                filename=f,
+                                layout=layout,
+                                opener=self._opener,
+                                pool=self._handles,
+                                align_arrays=False,
+                            )[np.newaxis],
+                            dims=tuple(map_dims.keys()) + ("ri",),
+                        )
                     )
-                    for f in files_measurement
-                ],
-                "band",
-            ).assign_coords(
-                band=np.arange(len(self.manifest_attrs["polarizations"])) + 1
-            )
-
-            # set dimensions names
-            dn = dn.rename(dict(zip(map_dims.values(), map_dims.keys())))
-
-            # create coordinates from dimension index (because of parse_coordinates=False)
-            dn = dn.assign_coords({"line": dn.line, "sample": dn.sample})
-            dn = dn.drop_vars("spatial_ref", errors="ignore")
+                dn = xr.concat(dn, "pol").assign_coords(
+                    {
+                        "line": np.arange(rio.height),
+                        "sample": np.arange(rio.width),
+                        "ri": ["real", "imag"],
+                    }
+                )
+            else:
+                lines = dask.array.arange(rio.height, chunks=chunks["line"])
+                samples = dask.array.arange(rio.width, chunks=chunks["sample"])
+                dtype = _rio_dtype(rio)
+                dn = []
+                for f in files_measurement:
+                    read = self._full_resolution_read(f, dtype)
+                    dn.append(
+                        xr.DataArray(
+                            convert(
+                                dask.array.blockwise(
+                                    read.pop("func"),
+                                    "ij",
+                                    lines,
+                                    "i",
+                                    samples,
+                                    "j",
+                                    dtype=dtype,
+                                    align_arrays=False,
+                                    **read,
+                                )
+                            )[np.newaxis],
+                            dims=tuple(map_dims.keys()),
+                        )
+                    )
+                dn = xr.concat(dn, "pol")
+                dn = dn.assign_coords(
+                    {"line": np.arange(rio.height), "sample": np.arange(rio.width)}
+                )
         else:
             if not isinstance(resolution, dict):
                 if isinstance(resolution, str) and resolution.endswith("m"):
@@ -241,64 +1052,156 @@ class Sentinel1Reader:
                 # resolution = dict(line=resolution / self.dataset['sampleSpacing'].values,
                 #                   sample=resolution / self.dataset['lineSpacing'].values)
 
-            # resample the DN at gdal level, before feeding it to the dataset
-            out_shape = (
-                int(rio.height / resolution["line"]),
-                int(rio.width / resolution["sample"]),
-            )
-            out_shape_pol = (1,) + out_shape
-            # read resampled array in one chunk, and rechunk
-            # this doesn't optimize memory, but total size remain quite small
-
-            if isinstance(resolution["line"], int):
-                # legacy behaviour: winsize is the maximum full image size that can be divided  by resolution (int)
-                winsize = (
-                    0,
-                    0,
-                    rio.width // resolution["sample"] * resolution["sample"],
-                    rio.height // resolution["line"] * resolution["line"],
-                )
-                window = rasterio.windows.Window(*winsize)
+            if resampling == "multilook":
+                # full resolution chunks are multilooked by dask, chunk by chunk
+                full_chunks = {
+                    d: _full_resolution_chunks(chunks[d], resolution[d], size)
+                    for d, size in [("line", rio.height), ("sample", rio.width)]
+                }
+                _, full = self.load_digital_number(chunks=full_chunks, pols=pols)
+                dn = multilook(full.digital_number, resolution, output=output)
             else:
-                window = None
+                # resample the DN at gdal level, before feeding it to the dataset
+                out_shape = (
+                    int(rio.height / resolution["line"]),
+                    int(rio.width / resolution["sample"]),
+                )
 
-            dn = xr.concat(
-                [
-                    xr.DataArray(
-                        dask.array.from_array(
-                            rasterio.open(f).read(
-                                out_shape=out_shape_pol,
-                                resampling=resampling,
-                                window=window,
-                            ),
-                            chunks=chunks_rio,
-                        ),
-                        dims=tuple(map_dims.keys()),
-                        coords={"pol": [pol]},
+                if isinstance(resolution["line"], int):
+                    # legacy behaviour: winsize is the maximum full image size that can be divided  by resolution (int)
+                    winsize = (
+                        rio.height // resolution["line"] * resolution["line"],
+                        rio.width // resolution["sample"] * resolution["sample"],
                     )
-                    for f, pol in zip(
-                        files_measurement, self.manifest_attrs["polarizations"]
+                else:
+                    winsize = (rio.height, rio.width)
+                # size of an output pixel, in full resolution pixels
+                scale = (winsize[0] / out_shape[0], winsize[1] / out_shape[1])
+                dtype = _rio_dtype(rio)
+                # intensity blocks are read at full resolution in memory
+                in_memory = dn_outputs[output] is not None
+                chunks = _fill_auto_chunks(
+                    chunks,
+                    _auto_chunks(
+                        rio, scale=scale, out_dtype=None if in_memory else dtype
+                    ),
+                )
+
+                # each output chunk reads and resamples only its own input window, at compute time
+                lines = dask.array.arange(out_shape[0], chunks=chunks["line"])
+                samples = dask.array.arange(out_shape[1], chunks=chunks["sample"])
+                dn = []
+                levels = []
+                for f, pol in zip(files_measurement, pol_names):
+                    if in_memory:
+                        # gdal resamples digital numbers, not intensities
+                        out_dtype = np.dtype(dn_outputs[output])
+                        dn.append(
+                            xr.DataArray(
+                                dask.array.blockwise(
+                                    functools.partial(
+                                        _read_intensity_block, output=output
+                                    ),
+                                    "ij",
+                                    lines,
+                                    "i",
+                                    samples,
+                                    "j",
+                                    dtype=out_dtype,
+                                    filename=f,
+                                    scale=scale,
+                                    out_dtype=out_dtype,
+                                    opener=self._opener,
+                                    pool=self._handles,
+                                    align_arrays=False,
+                                )[np.newaxis],
+                                dims=tuple(map_dims.keys()),
+                                coords={"pol": [pol]},
+                            )
+                        )
+                        continue
+                    level = None
+                    if self._overview_cache is not None:
+                        level = self._overview_cache.level(
+                            f,
+                            scale,
+                            resampling,
+                            opener=self._opener,
+                            pool=self._handles,
+                            keep=levels,
+                        )
+                    if level is not None:
+                        # built by the first chunk reading it
+                        levels.append(level)
+                        level = (
+                            functools.partial(
+                                self._overview_cache.get,
+                                f,
+                                level[1],
+                                resampling,
+                                opener=self._opener,
+                                pool=self._handles,
+                            ),
+                            level[1],
+                        )
+                    dn.append(
+                        xr.DataArray(
+                            dask.array.blockwise(
+                                _read_resampled_block,
+                                "ij",
+                                lines,
+                                "i",
+                                samples,
+                                "j",
+                                dtype=dtype,
+                                filename=f,
+                                scale=scale,
+                                resampling=resampling,
+                                out_dtype=dtype,
+                                level=level,
+                                opener=self._opener,
+                                pool=self._handles,
+                                # no meta computation: it would build the level
+                                meta=np.array((), dtype=dtype),
+                                # lines and samples are independent: no chunks alignment needed
+                                align_arrays=False,
+                            )[np.newaxis],
+                            dims=tuple(map_dims.keys()),
+                            coords={"pol": [pol]},
+                        )
                     )
-                ],
-                "pol",
-            ).chunk(chunks)
+                dn = xr.concat(dn, "pol")
 
-            # create coordinates at box center
-            translate = Affine.translation(
-                (resolution["sample"] - 1) / 2, (resolution["line"] - 1) / 2
-            )
-            scale = Affine.scale(
-                rio.width // resolution["sample"] * resolution["sample"] / out_shape[1],
-                rio.height // resolution["line"] * resolution["line"] / out_shape[0],
+                # create coordinates at box center
+                translate = Affine.translation(
+                    (resolution["sample"] - 1) / 2, (resolution["line"] - 1) / 2
+                )
+                scale = Affine.scale(
+                    rio.width
+                    // resolution["sample"]
+                    * resolution["sample"]
+                    / out_shape[1],
+                    rio.height
+                    // resolution["line"]
+                    * resolution["line"]
+                    / out_shape[0],
+                )
+                sample, _ = translate * scale * (dn.sample, 0)
+                _, line = translate * scale * (0, dn.line)
+                dn = dn.assign_coords({"line": line, "sample": sample})
+
+        if self.window is not None:
+            # pixels centres inside the window (lazy: only intersecting chunks are read)
+            dn = dn.sel(
+                line=slice(self.window["line"].start, self.window["line"].stop - 1),
+                sample=slice(
+                    self.window["sample"].start, self.window["sample"].stop - 1
+                ),
             )
-            sample, _ = translate * scale * (dn.sample, 0)
-            _, line = translate * scale * (0, dn.line)
-            dn = dn.assign_coords({"line": line, "sample": sample})
 
         # for GTiff driver, pols are already ordered. just rename them
         # fix 2 June 2025: https://github.com/umr-lops/xsar/issues/254
-        polas = [str(uu) for uu in self.manifest_attrs["polarizations"]]
-        dn = dn.assign_coords(pol=polas)
+        dn = dn.assign_coords(pol=pol_names)
 
         if not all(self.denoised.values()):
             descr = "denoised"
@@ -311,7 +1214,10 @@ class Sentinel1Reader:
             "history": yaml.safe_dump(
                 {
                     var_name: get_glob(
-                        [p.replace(self.path + "/", "") for p in files_measurement]
+                        [
+                            p.replace(self._files_root + "/", "")
+                            for p in files_measurement
+                        ]
                     )
                 }
             ),
@@ -323,6 +1229,714 @@ class Sentinel1Reader:
 
         return res, ds
 
+    def load_bursts(self, chunks="auto", pols=None):
+        """
+        load TOPS SLC digital_number by burst, as an `xarray.Dataset`.
+        Each chunk reads exactly one burst line range, and samples outside
+        `firstValidSample`/`lastValidSample` are set to nan.
+
+        Parameters
+        ----------
+        chunks: 'auto', None or dict
+            only the 'sample' key is used ('pol' and 'burst' chunks are 1, and 'line' chunk is the burst size).
+        pols: None, str or list of str
+            polarizations to load, among the reader ones. Default to None: all.
+
+        Returns
+        -------
+        xarray.Dataset
+            with `digital_number` variable, and ('pol', 'burst', 'line', 'sample') dims.
+            line is relative to the burst start: full image line is `burst * linesPerBurst + line`.
+            If the reader has a window, only bursts intersecting the window are returned, with
+            samples cropped to the window, and burst lines outside the window set to nan.
+        """
+        bursts = self.bursts
+        if bursts.sizes.get("burst", 0) == 0:
+            raise ValueError("no bursts in %s" % self.name)
+        lines_per_burst = int(bursts["linesPerBurst"])
+        first_valid = bursts["firstValidSample"].values
+        last_valid = bursts["lastValidSample"].values
+
+        files_measurement = self._measurement_files(pols)
+        with open_dataset(
+            files_measurement[0], opener=self._opener, pool=self._handles
+        ) as rio:
+            window = self.window or {
+                "line": slice(0, rio.height),
+                "sample": slice(0, rio.width),
+            }
+            sample_chunks = _auto_chunks(rio)["sample"]
+        if isinstance(chunks, dict) and chunks.get("sample", "auto") != "auto":
+            sample_chunks = chunks["sample"]
+
+        # bursts intersecting the window lines
+        burst_range = np.arange(
+            window["line"].start // lines_per_burst,
+            min(-(-window["line"].stop // lines_per_burst), bursts.sizes["burst"]),
+        )
+        burst_index = dask.array.from_array(burst_range, chunks=1)
+        samples = dask.array.arange(
+            window["sample"].start, window["sample"].stop, chunks=sample_chunks
+        )
+        dn = xr.concat(
+            [
+                xr.DataArray(
+                    dask.array.blockwise(
+                        _read_burst_block,
+                        "ilj",
+                        burst_index,
+                        "i",
+                        samples,
+                        "j",
+                        new_axes={"l": lines_per_burst},
+                        dtype=np.complex64,
+                        filename=f,
+                        lines_per_burst=lines_per_burst,
+                        first_valid=first_valid,
+                        last_valid=last_valid,
+                        line_window=None if self.window is None else window["line"],
+                        opener=self._opener,
+                        pool=self._handles,
+                        align_arrays=False,
+                    )[np.newaxis],
+                    dims=("pol", "burst", "line", "sample"),
+                    coords={"pol": [str(pol)]},
+                )
+                for f, pol in zip(
+                    files_measurement, self._pol_files(pols)["polarization"]
+                )
+            ],
+            "pol",
+        )
+        dn = dn.assign_coords(
+            burst=burst_range,
+            line=np.arange(dn.sizes["line"]),
+            sample=np.arange(window["sample"].start, window["sample"].stop),
+            azimuthTime=bursts["azimuthTime"].isel(burst=burst_range),
+        )
+        dn.attrs = {
+            "comment": "digital number by burst, nan outside valid samples",
+            "history": yaml.safe_dump(
+                {
+                    "digital_number": [
+                        p.replace(self._files_root + "/", "") for p in files_measurement
+                    ]
+                }
+            ),
+        }
+        return dn.to_dataset(name="digital_number")
+
+    def load_backscatter(
+        self,
+        kind="sigma0",
+        denoise=True,
+        resolution=None,
+        chunks="auto",
+        resampling=rasterio.enums.Resampling.rms,
+        pols=None,
+    ):
+        """
+        load calibrated backscatter (`(|DN|^2 - noise) / lut^2`), as an `xarray.Dataset`.
+
+        Digital number squaring, noise subtraction and look up table division are done in the same
+        dask task, for each chunk: calibration look up tables and noise are interpolated on the
+        chunk grid (see `Sentinel1Reader.load_calibration_luts` and `Sentinel1Reader.load_noise`),
+        so no intermediate is larger than one chunk.
+
+        `Sentinel1Reader.denoised` flags are respected: noise is not removed twice from denoised
+        products, and it's added back if `denoise` is False.
+
+        Parameters
+        ----------
+        kind: str
+            'sigma0' or 'gamma0'
+        denoise: bool
+            if True, thermal noise is removed.
+        resolution: None, number, str or dict
+            see `Sentinel1Reader.load_digital_number`. Digital numbers are resampled in intensity.
+        chunks: 'auto', None or dict
+            see `Sentinel1Reader.load_digital_number`
+        resampling: rasterio.enums.Resampling or str
+            see `Sentinel1Reader.load_digital_number`
+        pols: None, str or list of str
+            polarizations to load, among the reader ones. Default to None: all.
+
+        Returns
+        -------
+        xarray.Dataset
+            with `kind` variable (or `<kind>_raw` if not denoised) as float32, and
+            ('pol', 'line', 'sample') dims.
+        """
+        if kind not in ["sigma0", "gamma0"]:
+            raise ValueError(f"kind must be 'sigma0' or 'gamma0', not {kind!r}")
+        _, dn = self.load_digital_number(
+            resolution=resolution,
+            chunks=chunks,
+            resampling=resampling,
+            output="intensity",
+            pols=pols,
+        )
+        intensity = dn.digital_number
+        pol_names = [str(pol) for pol in intensity["pol"].values]
+        var_name = kind if denoise else "%s_raw" % kind
+        lines = dask.array.from_array(
+            intensity["line"].values, chunks=intensity.chunks[1]
+        )
+        samples = dask.array.from_array(
+            intensity["sample"].values, chunks=intensity.chunks[2]
+        )
+        backscatter = []
+        for i, block_kwargs in enumerate(
+            self._backscatter_kwargs(kind, pol_names, denoise)
+        ):
+            backscatter.append(
+                dask.array.blockwise(
+                    _backscatter_block,
+                    "pij",
+                    intensity.data[i : i + 1],
+                    "pij",
+                    lines,
+                    "i",
+                    samples,
+                    "j",
+                    dtype=np.float32,
+                    **block_kwargs,
+                )
+            )
+        ds = xr.Dataset(
+            {
+                var_name: xr.DataArray(
+                    dask.array.concatenate(backscatter),
+                    dims=intensity.dims,
+                    coords=intensity.coords,
+                )
+            }
+        )
+        ds[var_name].attrs = {
+            "comment": "%s%s, from digital number %s"
+            % (
+                kind,
+                "" if denoise else " (not denoised)",
+                re.sub(r"^.*digital number, ", "", intensity.attrs["comment"]),
+            ),
+            "history": intensity.attrs["history"],
+        }
+        return ds
+
+    def _backscatter_kwargs(self, kind, pols, denoise):
+        """
+        `_backscatter_block` kwargs (`lut`, `vectors` and `noise_sign`) of each polarization in pols
+
+        Returns
+        -------
+        list of dict
+        """
+        luts = self.datatree["calibration_luts"].to_dataset()
+        denoised = self.denoised
+        block_kwargs = []
+        for pol, xml_file in zip(pols, self._pol_files(pols)["noise"]):
+            vectors = None
+            if denoise != denoised[pol]:
+                vectors = noise_vectors(self.xml_parser, xml_file)
+            block_kwargs.append(
+                dict(
+                    lut=dict(
+                        line=luts["line"].values,
+                        sample=luts["sample"].values,
+                        values=luts["%s_lut" % kind]
+                        .sel(pol=pol)
+                        .values.astype(np.float32),
+                    ),
+                    vectors=vectors,
+                    noise_sign=-1 if denoise else 1,
+                )
+            )
+        return block_kwargs
+
+    def load_geolocation(
+        self, varnames=None, like=None, chunks="auto", dtype="float32"
+    ):
+        """
+        load geolocation grid variables (`Sentinel1Reader.geoloc`), lazily interpolated on the
+        digital number grid (bilinear interpolation).
+
+        The interpolator of each variable is built once by reader, and shared by all chunks (and by
+        all calls, for any grid). `azimuthTime` is interpolated as int64 nanoseconds, and
+        `longitude` is continuous across the antimeridian.
+
+        Parameters
+        ----------
+        varnames: None, str or list of str
+            variables of `Sentinel1Reader.geoloc` to load. Default to all.
+        like: xarray.Dataset or xarray.DataArray, optional
+            see `Sentinel1Reader.load_calibration_luts`
+        chunks: 'auto', None or dict
+            see `Sentinel1Reader.load_calibration_luts`
+        dtype: str or numpy.dtype
+            floating dtype of outputs (`azimuthTime` is datetime64[ns]).
+
+        Returns
+        -------
+        xarray.Dataset
+            with ('line', 'sample') dims.
+        """
+        geoloc = self.geoloc
+        if varnames is None:
+            varnames = list(geoloc.data_vars)
+        elif isinstance(varnames, str):
+            varnames = [varnames]
+        unknown = set(varnames) - set(geoloc.data_vars)
+        if unknown:
+            raise ValueError(
+                f"varnames must be in {list(geoloc.data_vars)}, not {sorted(unknown)}"
+            )
+        if like is None:
+            # the grid is the same for all polarizations
+            like, _ = self._like_grid(
+                like, chunks, [str(self.files["polarization"].iloc[0])]
+            )
+        dtype = np.dtype(dtype)
+        ds = xr.Dataset()
+        for name in varnames:
+            interpolator = self._geolocation_interpolator(name, dtype)
+            ds[name] = on_grid(interpolator, like, interpolator.dtype)
+            ds[name].attrs = {
+                k: v
+                for k, v in geoloc[name].attrs.items()
+                if k not in ["units", "calendar"]
+            }
+        return ds
+
+    def load_masks(self, like=None, chunks="auto"):
+        """
+        load swath id and valid data masks, lazily evaluated on the digital number grid.
+
+        For GRD, swaths are given by the swath merging bounds (`Sentinel1Reader.swath_merging`), and
+        valid pixels are inside a swath. For SLC, the swath id is the subswath number, and valid
+        pixels are inside the bursts valid samples (`Sentinel1Reader.bursts`). Masks are the same
+        for all polarizations.
+
+        Parameters
+        ----------
+        like: xarray.Dataset or xarray.DataArray, optional
+            see `Sentinel1Reader.load_calibration_luts`
+        chunks: 'auto', None or dict
+            see `Sentinel1Reader.load_calibration_luts`
+
+        Returns
+        -------
+        xarray.Dataset
+            with `swath` (int8, 0 outside swaths) and `valid` (bool) variables, and
+            ('line', 'sample') dims.
+        """
+        if self.multidataset:
+            raise ValueError("masks are not defined for multidataset")
+        if like is None:
+            like, _ = self._like_grid(
+                like, chunks, [str(self.files["polarization"].iloc[0])]
+            )
+        ds = xr.Dataset()
+        ds["swath"] = on_grid(swath_block, like, np.int8, bounds=self._swath_bounds())
+        ds["swath"].attrs["comment"] = "swath number, 0 outside swaths"
+        bursts = self.bursts
+        if bursts.sizes.get("burst", 0) > 0:
+            ds["valid"] = on_grid(
+                burst_valid_block,
+                like,
+                bool,
+                lines_per_burst=int(bursts["linesPerBurst"]),
+                first_valid=bursts["firstValidSample"].values,
+                last_valid=bursts["lastValidSample"].values,
+            )
+            ds["valid"].attrs["comment"] = "inside bursts valid samples"
+        else:
+            ds["valid"] = ds["swath"] > 0
+            ds["valid"].attrs["comment"] = "inside swaths"
+        return ds
+
+    def _swath_bounds(self):
+        """
+        swath bounds (see `safe_s1.masks.swath_bounds`), with the whole image as the only swath
+        for SLC (and products without swath merging)
+        """
+        bounds = swath_bounds(self.swath_merging)
+        if not bounds:
+            image = self.image
+            subswath = str(image["swath_subswath"].values)
+            bounds = [
+                {
+                    "swath": int(subswath[-1]) if subswath[-1].isdigit() else 1,
+                    "line_start": 0,
+                    "line_stop": int(image["numberOfLines"]) - 1,
+                    "sample_start": 0,
+                    "sample_stop": int(image["numberOfSamples"]) - 1,
+                }
+            ]
+        return bounds
+
+    def load_antenna_pattern(self, like=None, chunks="auto"):
+        """
+        load the antenna elevation pattern, lazily evaluated on the digital number grid.
+
+        Each pixel uses the pattern record (`Sentinel1Reader.antenna_pattern`) of its swath nearest
+        in azimuth time, linearly interpolated at the pixel slant range time (from the geolocation
+        grid). Records and geolocation interpolators are prepared once by reader.
+
+        Parameters
+        ----------
+        like: xarray.Dataset or xarray.DataArray, optional
+            see `Sentinel1Reader.load_calibration_luts`
+        chunks: 'auto', None or dict
+            see `Sentinel1Reader.load_calibration_luts`
+
+        Returns
+        -------
+        xarray.Dataset
+            with `antenna_gain` and `elevation_angle` (roll corrected) variables, and
+            ('line', 'sample') dims. nan outside swaths.
+        """
+        if self.multidataset:
+            raise ValueError("antenna pattern is not defined for multidataset")
+        if like is None:
+            like, _ = self._like_grid(
+                like, chunks, [str(self.files["polarization"].iloc[0])]
+            )
+        if "antenna" not in self._interpolators:
+            self._interpolators["antenna"] = antenna_vectors(
+                self.xml_parser, self.files["annotation"].iloc[0]
+            )
+        dtype = np.dtype(self.metadata_dtype or np.float64)
+        pattern = on_grid(
+            antenna_block,
+            like,
+            dtype,
+            new_axes={"variable": 2},
+            swath=functools.partial(swath_block, bounds=self._swath_bounds()),
+            azimuth_time=self._geolocation_interpolator("azimuthTime"),
+            slant_range_time=self._geolocation_interpolator("slantRangeTime"),
+            vectors=self._interpolators["antenna"],
+            out_dtype=dtype,
+        )
+        ds = xr.Dataset()
+        ds["antenna_gain"] = pattern[0]
+        ds["antenna_gain"].attrs["comment"] = "antenna elevation pattern magnitude"
+        ds["elevation_angle"] = pattern[1]
+        ds["elevation_angle"].attrs = {
+            "units": "degrees",
+            "comment": "antenna pattern elevation angle, minus roll angle",
+        }
+        return ds.drop_vars("variable", errors="ignore")
+
+    def interpolate_orbit(self, times):
+        """
+        orbit positions and velocities at `times`, by cubic Hermite interpolation of the orbit
+        state vectors (`Sentinel1Reader.orbit`), using both positions and velocities.
+
+        Interpolation coefficients are computed once by reader, and all times are interpolated in
+        one vectorized call (by block, if times are lazy).
+
+        Parameters
+        ----------
+        times: numpy.ndarray, dask.array.Array or xarray.DataArray
+            datetime64 times, of any shape (for example `azimuthTime` from
+            `Sentinel1Reader.load_geolocation`)
+
+        Returns
+        -------
+        xarray.Dataset
+            with `position_x`, `position_y`, `position_z`, `velocity_x`, `velocity_y` and
+            `velocity_z` variables, with the dims and coordinates of times (lazy if times are).
+            Times outside the orbit state vectors are nan.
+        """
+        if self.multidataset:
+            raise ValueError("orbit is not defined for multidataset")
+        interpolator, frame = self._orbit_interpolator()
+        if not isinstance(times, xr.DataArray):
+            times = xr.DataArray(times)
+        positions, velocities = interpolator(times.data)
+        ds = xr.Dataset(coords=times.coords)
+        for name, values in [("position", positions), ("velocity", velocities)]:
+            for i, xyz in enumerate("xyz"):
+                ds["%s_%s" % (name, xyz)] = times.copy(data=values[i])
+        ds.attrs["frame"] = frame
+        return ds
+
+    def _orbit_interpolator(self):
+        """(`safe_s1.orbit.OrbitInterpolator`, frame) of the orbit, built once"""
+        if "orbit" not in self._interpolators:
+            orbit = self.orbit
+            self._interpolators["orbit"] = (
+                OrbitInterpolator.from_dataset(orbit),
+                orbit.attrs["frame"],
+            )
+        return self._interpolators["orbit"]
+
+    def _geolocation_interpolator(self, name, dtype="float64"):
+        """`safe_s1.grid.GridInterpolator` of geolocation grid variable `name`, built once"""
+        key = (name, np.dtype(dtype))
+        if key not in self._interpolators:
+            geoloc = self.geoloc
+            # decode compacted times (see `metadata_dtype`)
+            values = xr.decode_cf(geoloc[[name]])[name].values
+            self._interpolators[key] = GridInterpolator(
+                geoloc["line"].values,
+                geoloc["sample"].values,
+                values,
+                dtype=dtype,
+                period=360 if name == "longitude" else None,
+            )
+        return self._interpolators[key]
+
+    def load_calibration_luts(self, like=None, chunks="auto", pols=None):
+        """
+        load sigma0 and gamma0 calibration Look Up Tables, lazily interpolated on the digital
+        number grid (bilinear interpolation of the calibration vectors).
+
+        Blocks are interpolated independently, with the chunks of the digital number, so no full
+        scene array is allocated.
+
+        Parameters
+        ----------
+        like: xarray.Dataset or xarray.DataArray, optional
+            digital numbers from `Sentinel1Reader.load_digital_number` (possibly resampled), whose
+            grid and chunks are used. Default to the full resolution digital number grid.
+        chunks: 'auto', None or dict
+            passed to `Sentinel1Reader.load_digital_number`, if `like` is None.
+        pols: None, str or list of str
+            polarizations to load, among the reader ones. Default to `like` polarizations, or all.
+
+        Returns
+        -------
+        xarray.Dataset
+            with `sigma0_lut` and `gamma0_lut` variables, and ('pol', 'line', 'sample') dims.
+        """
+        like, pol_names = self._like_grid(like, chunks, pols)
+        luts = self.datatree["calibration_luts"].to_dataset()
+        ds = xr.Dataset()
+        for var in ["sigma0_lut", "gamma0_lut"]:
+            ds[var] = xr.concat(
+                [
+                    on_grid(
+                        bilinear,
+                        like,
+                        luts[var].dtype,
+                        grid_lines=luts["line"].values,
+                        grid_samples=luts["sample"].values,
+                        values=luts[var].sel(pol=pol).values,
+                    )
+                    for pol in pol_names
+                ],
+                pd.Index(pol_names, name="pol"),
+            )
+            ds[var].attrs = luts[var].attrs
+        return ds
+
+    def load_noise(self, like=None, chunks="auto", pols=None):
+        """
+        load the thermal noise field (range noise x azimuth noise), lazily evaluated on the digital
+        number grid.
+
+        For each block, range noise vectors around the block are interpolated along samples then
+        lines, and multiplied by the azimuth noise blocks overlapping the block (interpolated along
+        lines). Products without azimuth noise (IPF < 2.9, or WV) have only range noise.
+
+        Parameters
+        ----------
+        like: xarray.Dataset or xarray.DataArray, optional
+            see `Sentinel1Reader.load_calibration_luts`
+        chunks: 'auto', None or dict
+            see `Sentinel1Reader.load_calibration_luts`
+        pols: None, str or list of str
+            see `Sentinel1Reader.load_calibration_luts`
+
+        Returns
+        -------
+        xarray.Dataset
+            with `noise_lut` variable, and ('pol', 'line', 'sample') dims. Pixels outside all
+            azimuth noise blocks have only range noise (see `safe_s1.noise.apply_azimuth_noise`).
+        """
+        like, pol_names = self._like_grid(like, chunks, pols)
+        dtype = np.dtype(self.metadata_dtype or np.float64)
+        files = self._pol_files(pol_names)
+        noise = xr.concat(
+            [
+                on_grid(
+                    noise_block,
+                    like,
+                    dtype,
+                    vectors=noise_vectors(self.xml_parser, xml_file),
+                    out_dtype=dtype,
+                )
+                for xml_file in files["noise"]
+            ],
+            pd.Index(pol_names, name="pol"),
+        )
+        noise.attrs = {
+            "description": "thermal noise (range noise x azimuth noise)",
+            "history": yaml.safe_dump(
+                {"noise_lut": [re.sub(".*SAFE/", "", f) for f in files["noise"]]}
+            ),
+        }
+        return noise.to_dataset(name="noise_lut")
+
+    def _like_grid(self, like, chunks, pols):
+        """
+        grid for `load_*` methods: `like`, or the digital number grid, and its polarizations.
+
+        Returns
+        -------
+        (xarray.Dataset or xarray.DataArray, list of str)
+        """
+        if like is None:
+            _, like = self.load_digital_number(chunks=chunks, pols=pols)
+        if pols is None and "pol" in like.coords:
+            pols = [str(pol) for pol in np.atleast_1d(like["pol"].values)]
+        return like, [str(pol) for pol in self._pol_files(pols)["polarization"]]
+
+    def measurement_references(self, pols=None, chunk_size=2**22):
+        """
+        reference index of the measurement files (blocks byte ranges and compression), as a zarr v2
+        group with one array by polarization.
+
+        The index can be saved as json alongside the product, and opened without gdal, with
+        concurrent ranged reads, through `fsspec.implementations.reference.ReferenceFileSystem`::
+
+            refs = reader.measurement_references()
+            ds = xr.open_zarr(
+                "reference://",
+                storage_options={"fo": refs},
+                zarr_format=2,
+                consolidated=False,
+            )
+
+        (with `remote_protocol` and `remote_options` in storage_options for remote products).
+
+        Parameters
+        ----------
+        pols: None, str or list of str
+            polarizations to index, among the reader ones. Default to None: all.
+        chunk_size: int
+            approximate size of chunks, in bytes, when uncompressed strips can be merged.
+            See `safe_s1.references.tiff_references`.
+
+        Returns
+        -------
+        dict
+            references, in `ReferenceFileSystem` version 1 format.
+
+        Raises
+        ------
+        ValueError
+            if measurement files can't be referenced (unsupported compression, or zipped SAFE)
+        """
+        if self._zip is not None:
+            raise ValueError(
+                "references are not available for zipped SAFE %s" % self.path
+            )
+        refs = {
+            ".zgroup": json.dumps({"zarr_format": 2}),
+            ".zattrs": json.dumps({"name": self.short_name}),
+        }
+        for f, pol in zip(
+            self._measurement_files(pols), self._pol_files(pols)["polarization"]
+        ):
+            refs.update(
+                tiff_references(
+                    f,
+                    str(pol),
+                    opener=self._opener,
+                    pool=self._handles,
+                    chunk_size=chunk_size,
+                )
+            )
+        return {"version": 1, "refs": refs}
+
+    def _full_resolution_read(self, filename, dtype):
+        """
+        block reader of the measurement file `filename` at full resolution, as a dict with `func`
+        (called as `func(lines, samples, **kwargs)`, with 1D contiguous indexes) and its kwargs.
+        """
+        mapped = self._memmap_file(filename) if self._memmap else None
+        if mapped is not None:
+            # uncompressed contiguous strips: blocks are views of the file
+            return dict(
+                func=_read_memmap_block,
+                filename=mapped[0],
+                layout=mapped[1],
+                out_dtype=dtype,
+            )
+        # each block is read from the reader handle pool
+        return dict(
+            func=_read_resampled_block,
+            filename=filename,
+            scale=(1, 1),
+            resampling=rasterio.enums.Resampling.nearest,
+            out_dtype=dtype,
+            opener=self._opener,
+            pool=self._handles,
+        )
+
+    def _memmap_file(self, filename):
+        """
+        local file and blocks layout to memory map the measurement file `filename`, or None if it
+        can't be memory mapped (remote, compressed, or not stored in contiguous strips).
+
+        Members of local zipped SAFE stored without compression are mapped in the zip file.
+
+        Returns
+        -------
+        None or (str, dict)
+            filename and layout for `safe_s1.tiff_layout.memmap`
+        """
+        if self._opener is not None:
+            return None
+        layout = read_layout(filename, pool=self._handles)
+        if layout is None:
+            return None
+        if self._zip is not None:
+            zip_path = os.path.abspath(self.path)
+            member = filename[len("/vsizip/%s/" % zip_path) :]
+            offset = safezip.stored_offset(
+                self._zip, member, functools.partial(open, zip_path)
+            )
+            if offset is None:
+                return None
+            filename = zip_path
+            layout = dict(layout, offsets=layout["offsets"] + offset)
+        if tiff_memmap(filename, layout) is None:
+            return None
+        return filename, layout
+
+    def _pol_files(self, pols=None):
+        """
+        files for `pols` (a subset of the reader polarizations), in SAFE order.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        if pols is None:
+            return self.files
+        if isinstance(pols, str):
+            pols = [pols]
+        available = [str(pol) for pol in self.files["polarization"]]
+        if not pols or set(pols) - set(available):
+            raise ValueError(f"pols must be in {available}, not {pols}")
+        return self.files[self.files["polarization"].isin(pols)]
+
+    def _measurement_files(self, pols=None):
+        """
+        full paths of measurement files for `pols` (urls if not local)
+
+        Returns
+        -------
+        list of str
+        """
+        files = self._pol_files(pols)["measurement"]
+        if self._opener is None and self._zip is None:
+            return [os.path.join(self.path, f) for f in files]
+        return ["%s/%s" % (self._files_root, f.replace(os.sep, "/")) for f in files]
+
     @property
     def pixel_line_m(self):
         """
@@ -415,6 +2029,7 @@ class Sentinel1Reader:
                 da_var_list.append(da_var)
 
             return xr.merge(da_var_list)
+        return self._dict["geolocationGrid"]
 
     @property
     def orbit(self):
@@ -435,6 +2050,8 @@ class Sentinel1Reader:
         """
         if self.multidataset:
             return None  # not defined for multidataset
+        if self._dict.get("orbit") is not None:
+            return self._dict["orbit"]
         gdf_orbit = self.xml_parser.get_compound_var(
             self.files["annotation"].iloc[0], "orbit"
         )
@@ -458,13 +2075,14 @@ class Sentinel1Reader:
         """
         if self.multidataset:
             return None  # not defined for multidataset
-        else:
-            return dict(
+        if self._denoised is None:
+            self._denoised = dict(
                 [
                     self.xml_parser.get_compound_var(f, "denoised")
                     for f in self.files["annotation"]
                 ]
             )
+        return self._denoised
 
     @property
     def time_range(self):
@@ -492,6 +2110,8 @@ class Sentinel1Reader:
         """
         if self.multidataset:
             return None
+        if self._dict.get("image") is not None:
+            return self._dict["image"]
         img_dict = self.xml_parser.get_compound_var(
             self.files["annotation"].iloc[0], "image"
         )
@@ -553,6 +2173,8 @@ class Sentinel1Reader:
         xarray.Dataset
             Bursts information dataArrays
         """
+        if self._dict.get("bursts") is not None:
+            return self._dict["bursts"]
         if (
             self.xml_parser.get_var(
                 self.files["annotation"].iloc[0], "annotation.number_of_bursts"
@@ -624,8 +2246,7 @@ class Sentinel1Reader:
         final_dict = {}
         ds_path_xsd = self.xml_parser.get_compound_var(self.manifest, "xsd_files")
         path_xsd = ds_path_xsd["xsd_product"].values[0]
-        full_path_xsd = os.path.join(self.path, path_xsd)
-        if os.path.exists(full_path_xsd):
+        if path_xsd in self.xml_parser._mapper:
             rootxsd = self.xml_parser.getroot(path_xsd)
             mypath = "/xsd:schema/xsd:complexType/xsd:sequence/xsd:element"
 
@@ -848,13 +2469,30 @@ class Sentinel1Reader:
     @property
     def files(self):
         """
-        Files for current dataset. (Empty for multi datasets)
+        Files for current dataset, and selected polarizations. (Empty for multi datasets)
 
         See Also
         --------
         Sentinel1Reader.safe_files
         """
-        return self.safe_files[self.safe_files["dsid"] == self.name]
+        files = self.safe_files[self.safe_files["dsid"] == self.name]
+        if self._pols is not None:
+            files = files[files["polarization"].isin(self._pols)]
+        return files
+
+    def close(self):
+        """
+        close the measurement files datasets opened by the reader.
+
+        Arrays already loaded stay usable: files are reopened by the next reads.
+        """
+        self._handles.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def __repr__(self):
         if self.multidataset:
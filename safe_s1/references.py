@@ -0,0 +1,116 @@
+"""
+reference index of measurement tiffs, for zarr through `fsspec.implementations.reference.ReferenceFileSystem`
+"""
+import json
+
+import numpy as np
+
+from safe_s1.tiff_layout import read_layout
+
+# numcodecs compressor config for gdal compression names (without predictor)
+compressors = {
+    None: None,
+    "DEFLATE": {"id": "zlib"},
+    "ZSTD": {"id": "zstd"},
+}
+
+
+def _chunk_lines(height, line_bytes, chunk_size):
+    """largest divisor of height with chunks smaller than chunk_size (so all chunks are full)"""
+    lines = max(1, min(height, chunk_size // line_bytes))
+    while height % lines:
+        lines -= 1
+    return lines
+
+
+def tiff_references(
+    filename, name, url=None, opener=None, pool=None, chunk_size=2**22
+):
+    """
+    zarr v2 references of the array `name` stored in the measurement tiff `filename`.
+
+    Each tiff block is a zarr chunk. Uncompressed strips contiguous in the file are merged in
+    chunks of about `chunk_size` bytes (chunks lines divide the image height, so no chunk is
+    truncated).
+
+    Parameters
+    ----------
+    filename: str
+    name: str
+        array name, in the zarr group
+    url: str, optional
+        url written in the references. Default to filename.
+    opener: None or callable
+        see `safe_s1.handles.open_dataset`
+    pool: None or safe_s1.handles.HandlePool
+        see `safe_s1.handles.open_dataset`
+    chunk_size: int
+        approximate size of merged chunks, in bytes
+
+    Returns
+    -------
+    dict
+        references, with keys like 'name/.zarray' and 'name/0.0'.
+        Complex samples are stored as a trailing dimension of size 2 ('ri').
+    """
+    layout = read_layout(filename, opener=opener, pool=pool, compressed=True)
+    if layout is None:
+        raise ValueError(f"blocks layout of {filename} is not available")
+    if layout["compression"] not in compressors or layout["predictor"] != 1:
+        raise ValueError(
+            "unsupported compression %s (predictor %d) in %s"
+            % (layout["compression"], layout["predictor"], filename)
+        )
+    url = filename if url is None else url
+    height, width = layout["shape"]
+    block_lines, block_samples = layout["block_shape"]
+    offsets = layout["offsets"]
+    sizes = layout["sizes"]
+    sample_bytes = layout["dtype"].itemsize * layout["components"]
+    strips = block_samples >= width
+    if strips and height % block_lines:
+        # the last strip is truncated: it can't be a zarr chunk
+        raise ValueError(f"{filename} height is not a multiple of strip height")
+
+    refs = {}
+    merge = 1
+    if (
+        strips
+        and layout["compression"] is None
+        and np.all(np.diff(offsets[:, 0]) == block_lines * width * sample_bytes)
+    ):
+        merge = _chunk_lines(
+            offsets.shape[0], block_lines * width * sample_bytes, chunk_size
+        )
+    chunks = [block_lines * merge, block_samples]
+    for row in range(0, offsets.shape[0], merge):
+        for col in range(offsets.shape[1]):
+            key = "%s/%d.%d" % (name, row // merge, col)
+            if layout["components"] == 2:
+                key += ".0"
+            refs[key] = [
+                url,
+                int(offsets[row, col]),
+                int(sizes[row : row + merge, col].sum()),
+            ]
+
+    shape = [height, width]
+    dims = ["line", "sample"]
+    if layout["components"] == 2:
+        shape.append(2)
+        chunks.append(2)
+        dims.append("ri")
+    refs["%s/.zarray" % name] = json.dumps(
+        {
+            "zarr_format": 2,
+            "shape": shape,
+            "chunks": chunks,
+            "dtype": layout["dtype"].str,
+            "compressor": compressors[layout["compression"]],
+            "fill_value": None,
+            "filters": None,
+            "order": "C",
+        }
+    )
+    refs["%s/.zattrs" % name] = json.dumps({"_ARRAY_DIMENSIONS": dims})
+    return refs
@@ -0,0 +1,206 @@
+"""
+zipped SAFE access, without extraction
+"""
+import collections
+import functools
+import io
+import posixpath
+import struct
+import threading
+import zipfile
+
+import fsspec
+import fsspec.implementations.zip
+import fsspec.utils
+
+cache_size = 32
+"""number of zip filesystems kept by `zip_filesystem`"""
+# fsspec doesn't cache zip filesystems instances (and closes the zip when they are deleted)
+_filesystems = collections.OrderedDict()
+_filesystems_lock = threading.Lock()
+
+local_header = struct.Struct("<4s22xHH")
+"""zip local file header (APPNOTE.TXT 4.3.7): signature, then file name and extra field lengths"""
+local_header_signature = b"PK\x03\x04"
+
+
+def is_zip(path):
+    """True if `path` is a zipped SAFE (like 'S1A_IW_GRDH_..._ABCD.SAFE.zip' or '..._ABCD.zip')"""
+    return str(path).lower().endswith(".zip")
+
+
+def zip_filesystem(path, storage_options=None, open_kwargs=None):
+    """
+    fsspec zip filesystem of the zip file `path` (local path or url).
+
+    The central directory is read once, when the filesystem is created, and indexes all members.
+    Filesystems are cached (the `cache_size` most recently used), so they are shared by all readers
+    of the same zip.
+
+    Parameters
+    ----------
+    path: str
+    storage_options: dict, optional
+        options of the filesystem of path (like `Sentinel1Reader` storage_options)
+    open_kwargs: dict, optional
+        passed to the `open` method of the filesystem of path (block cache configuration)
+
+    Returns
+    -------
+    fsspec.implementations.zip.ZipFileSystem
+    """
+    storage_options = storage_options or {}
+    open_kwargs = open_kwargs or {}
+    key = (path, fsspec.utils.tokenize(storage_options, open_kwargs))
+    with _filesystems_lock:
+        if key in _filesystems:
+            _filesystems.move_to_end(key)
+        else:
+            fs, fs_path = fsspec.core.url_to_fs(path, **storage_options)
+            _filesystems[key] = fsspec.implementations.zip.ZipFileSystem(
+                fo=fs.open(fs_path, "rb", **open_kwargs)
+            )
+            while len(_filesystems) > cache_size:
+                _filesystems.popitem(last=False)
+        return _filesystems[key]
+
+
+def open_vsizip(path):
+    """
+    open the member of a gdal '/vsizip/' path (like '/vsizip//path/file.zip/member'), as a python
+    file object (see `MemberOpener`).
+    """
+    path = path[len("/vsizip/") :]
+    end = path.lower().find(".zip/") + len(".zip")
+    if end < len(".zip"):
+        raise ValueError("not a /vsizip/ path: %s" % path)
+    zip_path = path[:end]
+    opener = MemberOpener(zip_filesystem(zip_path), functools.partial(open, zip_path))
+    return opener(path[end + 1 :])
+
+
+def safe_root(fs):
+    """
+    SAFE directory in the zip filesystem `fs` (the directory of 'manifest.safe').
+
+    Raises
+    ------
+    ValueError
+        if the zip has no manifest.safe
+    """
+    manifests = [
+        path for path in fs.find("") if posixpath.basename(path) == "manifest.safe"
+    ]
+    if not manifests:
+        raise ValueError("no manifest.safe in %s" % fs.fo)
+    return posixpath.dirname(min(manifests, key=len))
+
+
+def stored_offset(fs, member, open_zip):
+    """
+    offset of the data of `member` in the zip file, if it's stored without compression. Stored
+    members are a contiguous part of the zip file, so they can be read (or memory mapped) directly.
+
+    Parameters
+    ----------
+    fs: fsspec.implementations.zip.ZipFileSystem
+    member: str
+        path of the member in the zip
+    open_zip: callable
+        `open_zip(mode)` opens a new file object of the zip file (see `MemberOpener`), to read the
+        local file header of `member`
+
+    Returns
+    -------
+    None or int
+        None if the member is compressed
+    """
+    info = fs.info(member)
+    if info["compress_type"] != zipfile.ZIP_STORED:
+        return None
+    # the local header extra field may differ from the central directory one
+    with open_zip("rb") as f:
+        f.seek(info["header_offset"])
+        header = f.read(local_header.size)
+    signature, name_length, extra_length = local_header.unpack(header)
+    if signature != local_header_signature:
+        raise ValueError("bad local file header for %s" % member)
+    return info["header_offset"] + local_header.size + name_length + extra_length
+
+
+class StoredMember(io.RawIOBase):
+    """
+    read only file object of a member stored without compression, as a window of the zip file
+    object `f` (with random access, unlike `zipfile.ZipFile.open`, that emulates backward seeks by
+    reading again from the member start).
+    """
+
+    def __init__(self, f, offset, size):
+        super().__init__()
+        self._f = f
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}
+        self._pos = max(start[whence] + pos, 0)
+        return self._pos
+
+    def read(self, size=-1):
+        stop = self._size if size is None or size < 0 else self._pos + size
+        stop = min(stop, self._size)
+        if stop <= self._pos:
+            return b""
+        self._f.seek(self._offset + self._pos)
+        data = self._f.read(stop - self._pos)
+        self._pos += len(data)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+class MemberOpener:
+    """
+    opener of zip members (like for `safe_s1.handles.open_dataset`). Members stored without
+    compression are read directly in the zip file (see `StoredMember`), and others through the zip
+    filesystem.
+
+    Parameters
+    ----------
+    fs: fsspec.implementations.zip.ZipFileSystem
+    open_zip: callable
+        `open_zip(mode)` opens a new file object of the zip file (like
+        `functools.partial(open, path)`)
+    """
+
+    def __init__(self, fs, open_zip):
+        self.fs = fs
+        self.open_zip = open_zip
+        self._offsets = {}
+
+    def __call__(self, member, mode="rb"):
+        if member not in self._offsets:
+            self._offsets[member] = stored_offset(self.fs, member, self.open_zip)
+        if self._offsets[member] is None:
+            return self.fs.open(member, mode)
+        return StoredMember(
+            self.open_zip(mode), self._offsets[member], self.fs.size(member)
+        )
@@ -0,0 +1,222 @@
+"""
+consolidated metadata sidecar (zarr or netCDF) of `safe_s1.Sentinel1Reader`, to reopen a reader
+without parsing the SAFE xml files.
+
+lxml values (like xsd definitions) are stored, and restored, as their text.
+"""
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+import shapely
+import xarray as xr
+
+version = 1
+"""sidecar format version (sidecars of other versions are rejected)"""
+
+state_attr = "safe_s1_reader"
+"""root attribute of the sidecar, with the json reader state"""
+
+netcdf_suffixes = (".nc", ".nc4", ".h5", ".hdf5")
+"""sidecar paths with these suffixes are netCDF, others are zarr"""
+
+time_offset_attrs = ("units", "calendar")
+"""CF attributes of time offsets, renamed in sidecars"""
+
+
+def encode_value(value):
+    """
+    json serializable version of `value`, from manifest attributes or xsd definitions
+    (datetime, categorical, shapely geometries and numpy scalars are tagged, see `decode_value`)
+    """
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, pd.Categorical):
+        return {
+            "categorical": list(value),
+            "categories": list(value.categories),
+            "ordered": bool(value.ordered),
+        }
+    if isinstance(value, shapely.Geometry):
+        return {"wkb": shapely.to_wkb(value, hex=True)}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: encode_value(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if _is_text(value):
+        return str(value)
+    return value
+
+
+def decode_value(value):
+    """inverse of `encode_value`"""
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "datetime" in value:
+        return datetime.datetime.fromisoformat(value["datetime"])
+    if "categorical" in value:
+        return pd.Categorical(
+            value["categorical"],
+            categories=value["categories"],
+            ordered=value["ordered"],
+        )
+    if "wkb" in value:
+        return shapely.from_wkb(value["wkb"])
+    return {k: decode_value(v) for k, v in value.items()}
+
+
+def _is_text(value):
+    # str, or lxml results and elements (like xsd definitions)
+    return isinstance(value, str) or hasattr(value, "text")
+
+
+def _encode_attrs(attrs):
+    return {k: str(v) if _is_text(v) else v for k, v in attrs.items()}
+
+
+def _encode_polynomials(da):
+    """(..., degree) float coefficients of the object DataArray of `numpy.polynomial.Polynomial`"""
+    polynomials = da.values.ravel()
+    domain, window = polynomials[0].domain, polynomials[0].window
+    if any(
+        not np.array_equal(p.domain, domain) or not np.array_equal(p.window, window)
+        for p in polynomials
+    ):
+        raise ValueError("polynomials of %s have different domains" % da.name)
+    size = max(p.coef.size for p in polynomials)
+    # shorter polynomials are padded with nan
+    coefs = np.full((polynomials.size, size), np.nan)
+    for i, p in enumerate(polynomials):
+        coefs[i, : p.coef.size] = p.coef
+    encoded = xr.DataArray(
+        coefs.reshape(da.shape + (size,)),
+        dims=da.dims + ("%s_degree" % da.name,),
+        coords=da.coords,
+        attrs=_encode_attrs(da.attrs),
+    )
+    encoded.attrs.update(
+        sidecar_type="polynomial",
+        polynomial_domain=list(domain),
+        polynomial_window=list(window),
+    )
+    return encoded
+
+
+def _decode_polynomials(da):
+    attrs = dict(da.attrs)
+    del attrs["sidecar_type"]
+    domain = attrs.pop("polynomial_domain")
+    window = attrs.pop("polynomial_window")
+    coefs = da.values.reshape(-1, da.shape[-1])
+    polynomials = np.empty(len(coefs), dtype=object)
+    for i, coef in enumerate(coefs):
+        polynomials[i] = np.polynomial.Polynomial(
+            coef[~np.isnan(coef)], domain=domain, window=window
+        )
+    return xr.DataArray(
+        polynomials.reshape(da.shape[:-1]),
+        dims=da.dims[:-1],
+        coords={k: v for k, v in da.coords.items() if da.dims[-1] not in v.dims},
+        attrs=attrs,
+    )
+
+
+def encode_datatree(dt):
+    """
+    serializable copy of the reader datatree `dt`: object variables (polynomials) are replaced
+    by float coefficients, and attributes (like lxml xsd definitions) by strings.
+
+    CF attributes of time offsets (see `safe_s1.metadata_dtype.compact_dataset`) are renamed, so
+    they are not decoded to datetime64 when the sidecar is read.
+    """
+    nodes = {}
+    for node in dt.subtree:
+        ds = node.to_dataset(inherit=False).copy()
+        for name, da in ds.variables.items():
+            if da.dtype == object and isinstance(
+                da.values.flat[0], np.polynomial.Polynomial
+            ):
+                ds[name] = _encode_polynomials(ds[name])
+                continue
+            attrs = _encode_attrs(da.attrs)
+            if da.dtype.kind in "iu" and " since " in attrs.get("units", ""):
+                for attr in time_offset_attrs:
+                    if attr in attrs:
+                        attrs["time_offset_%s" % attr] = attrs.pop(attr)
+            ds[name].attrs = attrs
+        ds.attrs = _encode_attrs(ds.attrs)
+        nodes[node.path] = ds
+    return xr.DataTree.from_dict(nodes)
+
+
+def decode_datatree(dt):
+    """inverse of `encode_datatree`"""
+    nodes = {}
+    for node in dt.subtree:
+        ds = node.to_dataset(inherit=False).copy()
+        for name in list(ds.variables):
+            attrs = ds[name].attrs
+            if attrs.get("sidecar_type") == "polynomial":
+                ds[name] = _decode_polynomials(ds[name])
+            elif "time_offset_units" in attrs:
+                # restored in attrs order
+                ds[name].attrs = {
+                    k.replace("time_offset_", "", 1): v for k, v in attrs.items()
+                }
+        nodes[node.path] = ds
+    return xr.DataTree.from_dict(nodes)
+
+
+def _is_netcdf(path):
+    return str(path).lower().endswith(netcdf_suffixes)
+
+
+def write(dt, state, path, **kwargs):
+    """
+    write the reader datatree `dt` and `state` (json serializable dict, see `encode_value`) to
+    the sidecar `path` (consolidated zarr store, or netCDF file, see `netcdf_suffixes`).
+    kwargs are passed to `xarray.DataTree.to_zarr` or `xarray.DataTree.to_netcdf`.
+    """
+    dt = encode_datatree(dt)
+    dt.attrs[state_attr] = json.dumps(dict(state, version=version))
+    if _is_netcdf(path):
+        dt.to_netcdf(path, **kwargs)
+    else:
+        # consolidated metadata and string arrays are not in zarr v3 specification
+        kwargs.setdefault("zarr_format", 2)
+        dt.to_zarr(path, mode="w", consolidated=True, **kwargs)
+
+
+def read(path, **kwargs):
+    """
+    read the sidecar `path`, written by `write`.
+    kwargs are passed to `xarray.open_datatree`.
+
+    Returns
+    -------
+    tuple
+        (datatree, state), with datatree loaded in memory
+
+    Raises
+    ------
+    ValueError
+        if path is not a sidecar of the current `version`
+    """
+    if not _is_netcdf(path):
+        kwargs.setdefault("engine", "zarr")
+        kwargs.setdefault("consolidated", True)
+    with xr.open_datatree(path, **kwargs) as dt:
+        dt = dt.load()
+    attrs = dict(dt.attrs)
+    if state_attr not in attrs:
+        raise ValueError("%s is not a safe_s1 sidecar" % path)
+    state = json.loads(attrs.pop(state_attr))
+    if state.pop("version") != version:
+        raise ValueError("%s is a sidecar of another version" % path)
+    dt.attrs = attrs
+    return decode_datatree(dt), state
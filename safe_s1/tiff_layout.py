@@ -0,0 +1,215 @@
+"""
+layout of measurement tiffs, to read native samples without gdal decoding
+"""
+import os
+
+import numpy as np
+
+from safe_s1 import safezip
+from safe_s1.handles import open_dataset
+
+# numpy dtype of one component, and number of components, for gdal dtypes
+native_dtypes = {
+    "complex_int16": ("i2", 2),
+    "int16": ("i2", 1),
+    "uint16": ("u2", 1),
+}
+
+
+def read_layout(filename, opener=None, pool=None, compressed=False):
+    """
+    get the blocks layout of a measurement tiff.
+
+    Parameters
+    ----------
+    filename: str
+    opener: None or callable
+        see `safe_s1.handles.open_dataset`
+    pool: None or safe_s1.handles.HandlePool
+        see `safe_s1.handles.open_dataset`
+    compressed: bool
+        if True, compressed files are accepted too, and blocks sizes and compression are returned.
+
+    Returns
+    -------
+    None or dict
+        None if the file is compressed (and `compressed` is False), has an unsupported dtype, or if
+        blocks are shorter than the image part they hold (truncated file, to be decoded by gdal).
+        Otherwise, dict with keys
+
+        * shape: (lines, samples) image shape
+        * block_shape: (lines, samples) shape of tiff blocks (strips or tiles)
+        * offsets: 2D array of blocks offsets in the file, in bytes (block rows, block columns)
+        * dtype: numpy dtype of one sample component (with file byte order)
+        * components: number of components by sample (2 for complex)
+
+        and, if `compressed` is True
+
+        * sizes: 2D array of blocks sizes in the file, in bytes
+        * compression: None, or gdal compression name (like 'DEFLATE')
+        * predictor: tiff predictor (1 if none)
+    """
+    tags = ["OFFSET", "SIZE"]
+    with open_dataset(filename, opener=opener, pool=pool) as rio:
+        if rio.dtypes[0] not in native_dtypes or (
+            rio.compression is not None and not compressed
+        ):
+            return None
+        block_shape = rio.block_shapes[0]
+        n_blocks = (
+            -(-rio.height // block_shape[0]),
+            -(-rio.width // block_shape[1]),
+        )
+        blocks = {tag: np.empty(n_blocks, dtype=np.int64) for tag in tags}
+        for row in range(n_blocks[0]):
+            for col in range(n_blocks[1]):
+                for tag in tags:
+                    value = rio.get_tag_item(
+                        "BLOCK_%s_%d_%d" % (tag, col, row), "TIFF", bidx=1
+                    )
+                    if value is None:
+                        # sparse file, or gdal without tiff metadata domain
+                        return None
+                    blocks[tag][row, col] = int(value)
+        shape = (rio.height, rio.width)
+        dtype, components = native_dtypes[rio.dtypes[0]]
+        structure = rio.tags(ns="IMAGE_STRUCTURE")
+    with _open_file(filename, opener) as f:
+        byteorder = {b"II": "<", b"MM": ">"}[f.read(2)]
+        file_size = f.seek(0, os.SEEK_END)
+    if np.any(blocks["OFFSET"] + blocks["SIZE"] > file_size):
+        return None
+    dtype = np.dtype(byteorder + dtype)
+    if structure.get("COMPRESSION") is None:
+        # only the last strip may be shorter than a block, holding the last image lines
+        lines = np.full(n_blocks[0], block_shape[0])
+        if block_shape[1] == shape[1]:
+            lines[-1] = shape[0] - (n_blocks[0] - 1) * block_shape[0]
+        line_bytes = block_shape[1] * components * dtype.itemsize
+        if np.any(blocks["SIZE"] < lines[:, np.newaxis] * line_bytes):
+            return None
+    layout = dict(
+        shape=shape,
+        block_shape=block_shape,
+        offsets=blocks["OFFSET"],
+        dtype=dtype,
+        components=components,
+    )
+    if compressed:
+        layout.update(
+            sizes=blocks["SIZE"],
+            compression=structure.get("COMPRESSION"),
+            predictor=int(structure.get("PREDICTOR", 1)),
+        )
+    return layout
+
+
+def _open_file(filename, opener=None):
+    if opener is None:
+        if str(filename).startswith("/vsizip/"):
+            return safezip.open_vsizip(filename)
+        return open(os.fspath(filename), "rb")
+    return opener(filename)
+
+
+def read_native(filename, lines, samples, layout, opener=None):
+    """
+    read native samples of `filename` at (full resolution) indexes `lines` and `samples`,
+    from the raw tiff blocks.
+
+    If blocks are full width strips, contiguous in the file, the result is a view of the read buffer
+    (no copy).
+
+    Parameters
+    ----------
+    filename: str
+    lines: numpy.ndarray
+        1D contiguous line indexes
+    samples: numpy.ndarray
+        1D contiguous sample indexes
+    layout: dict
+        from `read_layout`
+    opener: None or callable
+        see `safe_s1.handles.open_dataset`
+
+    Returns
+    -------
+    numpy.ndarray
+        array of shape (lines.size, samples.size, components), with layout['dtype']
+    """
+    block_lines, block_samples = layout["block_shape"]
+    offsets = layout["offsets"]
+    width = block_samples * layout["components"]
+    block_bytes = block_lines * width * layout["dtype"].itemsize
+    rows = slice(lines[0] // block_lines, lines[-1] // block_lines + 1)
+    cols = slice(samples[0] // block_samples, samples[-1] // block_samples + 1)
+    first_line = rows.start * block_lines
+    first_sample = cols.start * block_samples
+    strips = offsets[rows, cols]
+    with _open_file(filename, opener) as f:
+        if strips.shape[1] == 1 and np.all(np.diff(strips[:, 0]) == block_bytes):
+            # contiguous strips: a single read of the lines, viewed without copy
+            f.seek(int(strips[0, 0]))
+            buf = f.read(
+                (lines[-1] + 1 - first_line) * width * layout["dtype"].itemsize
+            )
+            blocks = np.frombuffer(buf, dtype=layout["dtype"]).reshape(
+                -1, block_samples, layout["components"]
+            )
+        else:
+            blocks = np.empty(
+                (
+                    strips.shape[0] * block_lines,
+                    strips.shape[1] * block_samples,
+                    layout["components"],
+                ),
+                dtype=layout["dtype"],
+            )
+            for row in range(strips.shape[0]):
+                for col in range(strips.shape[1]):
+                    f.seek(int(strips[row, col]))
+                    # last blocks may be truncated
+                    block = np.frombuffer(f.read(block_bytes), dtype=layout["dtype"])
+                    block = np.resize(block, block_bytes // layout["dtype"].itemsize)
+                    blocks[
+                        row * block_lines : (row + 1) * block_lines,
+                        col * block_samples : (col + 1) * block_samples,
+                    ] = block.reshape(block_lines, block_samples, layout["components"])
+    return blocks[
+        lines[0] - first_line : lines[-1] + 1 - first_line,
+        samples[0] - first_sample : samples[-1] + 1 - first_sample,
+    ]
+
+
+def memmap(filename, layout):
+    """
+    memory map the image of the local file `filename`, if it's stored in contiguous full width strips.
+
+    Parameters
+    ----------
+    filename: str
+    layout: dict
+        from `read_layout`
+
+    Returns
+    -------
+    None or numpy.memmap
+        read only array of shape (lines, samples, components), with layout['dtype'].
+        None if the image is not contiguous in the file.
+    """
+    block_lines, block_samples = layout["block_shape"]
+    offsets = layout["offsets"]
+    shape = layout["shape"] + (layout["components"],)
+    block_bytes = block_lines * block_samples * shape[2] * layout["dtype"].itemsize
+    if block_samples != shape[1] or np.any(np.diff(offsets[:, 0]) != block_bytes):
+        return None
+    nbytes = int(np.prod(shape)) * layout["dtype"].itemsize
+    if os.path.getsize(filename) < offsets[0, 0] + nbytes:
+        return None
+    return np.memmap(
+        filename,
+        dtype=layout["dtype"],
+        mode="r",
+        offset=int(offsets[0, 0]),
+        shape=shape,
+    )
@@ -0,0 +1,146 @@
+"""
+spatial subsetting of a product, by pixel window or lon/lat bounding box
+"""
+import logging
+
+import numpy as np
+import shapely
+
+logger = logging.getLogger("xsar.window")
+logger.addHandler(logging.NullHandler())
+
+# datatree groups with (line, sample) grids, cropped to the window
+cropped_groups = [
+    "geolocationGrid",
+    "calibration_luts",
+    "noise_azimuth_raw",
+    "noise_range_raw",
+]
+
+
+def check_window(window, shape):
+    """
+    Parameters
+    ----------
+    window: dict
+        with 'line' and 'sample' keys, and slices or (start, stop) tuples as values.
+        missing keys (or None values) select the whole dimension.
+    shape: tuple of int
+        (line, sample) image shape
+
+    Returns
+    -------
+    dict
+        'line' and 'sample' slices, with integer start and stop inside the image
+    """
+    if not isinstance(window, dict) or not set(window) <= {"line", "sample"}:
+        raise ValueError(
+            f"window must be a dict with 'line' and 'sample' keys: {window}"
+        )
+    checked = {}
+    for dim, size in zip(["line", "sample"], shape):
+        sl = window.get(dim)
+        if sl is None:
+            sl = slice(None)
+        elif not isinstance(sl, slice):
+            sl = slice(*sl)
+        if sl.step not in [None, 1]:
+            raise ValueError(f"window step must be 1: {window}")
+        start, stop, _ = sl.indices(size)
+        if start >= stop:
+            raise ValueError(f"empty window for {dim}: {window}")
+        checked[dim] = slice(start, stop)
+    return checked
+
+
+def bbox_to_window(geoloc, bbox, shape):
+    """
+    pixel window of the geolocation grid cells intersecting a lon/lat bounding box.
+
+    Parameters
+    ----------
+    geoloc: xarray.Dataset
+        geolocation grid, with 'longitude' and 'latitude' variables, and 'line', 'sample' coordinates
+    bbox: tuple of float
+        (lon_min, lat_min, lon_max, lat_max), in degrees. If lon_min > lon_max, the box crosses the
+        antimeridian (like (170, -10, -170, 10)).
+    shape: tuple of int
+        (line, sample) image shape
+
+    Returns
+    -------
+    dict
+        'line' and 'sample' slices
+
+    Notes
+    -----
+    Longitudes of the grid are unwrapped around its first point, so footprints crossing the
+    antimeridian are supported, and the bbox is tested 360 degrees apart too.
+    """
+    lon = geoloc["longitude"].values
+    lat = geoloc["latitude"].values
+    # continuous longitudes around the first grid point, and bbox in the same range
+    ref = lon[0, 0]
+    lon = ref + (lon - ref + 180) % 360 - 180
+    lon_min = ref + (bbox[0] - ref + 180) % 360 - 180
+    lon_max = lon_min + (bbox[2] - bbox[0]) % 360
+    if bbox[2] - bbox[0] >= 360:
+        lon_min, lon_max = ref - 180, ref + 180
+    boxes = [
+        shapely.box(lon_min + shift, bbox[1], lon_max + shift, bbox[3])
+        for shift in [-360, 0, 360]
+    ]
+    # grid cells polygons (corners are grid points)
+    corners = [(slice(None, -1), slice(None, -1)), (slice(None, -1), slice(1, None))]
+    corners += [(slice(1, None), slice(1, None)), (slice(1, None), slice(None, -1))]
+    rings = np.stack(
+        [np.stack([lon[c], lat[c]], axis=-1) for c in corners], axis=-2
+    ).reshape(-1, 4, 2)
+    cells = shapely.polygons(rings)
+    hits = np.any([shapely.intersects(cells, box) for box in boxes], axis=0).reshape(
+        lon.shape[0] - 1, lon.shape[1] - 1
+    )
+    if not hits.any():
+        raise ValueError(f"bbox {bbox} doesn't intersect the product")
+    rows = np.flatnonzero(hits.any(axis=1))
+    cols = np.flatnonzero(hits.any(axis=0))
+    lines = geoloc["line"].values
+    samples = geoloc["sample"].values
+    return check_window(
+        dict(
+            line=(int(lines[rows[0]]), int(lines[rows[-1] + 1]) + 1),
+            sample=(int(samples[cols[0]]), int(samples[cols[-1] + 1]) + 1),
+        ),
+        shape,
+    )
+
+
+def crop_dataset(ds, window):
+    """
+    crop (line, sample) dimensions of `ds` to the window, keeping one grid point outside the window
+    on each side, so interpolations inside the window are unchanged.
+
+    Dimensions without a monotonic coordinate are not cropped.
+
+    Parameters
+    ----------
+    ds: xarray.Dataset
+    window: dict
+        from `check_window`
+
+    Returns
+    -------
+    xarray.Dataset
+    """
+    indexers = {}
+    for dim, sl in window.items():
+        if dim not in ds.dims or dim not in ds.coords:
+            continue
+        coord = ds[dim].values
+        if coord.ndim != 1 or np.any(np.diff(coord) <= 0):
+            logger.debug("%s not cropped (not monotonic)", dim)
+            continue
+        first = max(np.searchsorted(coord, sl.start, side="right") - 1, 0)
+        last = min(np.searchsorted(coord, sl.stop - 1, side="left"), coord.size - 1)
+        indexers[dim] = slice(first, last + 1)
+    return ds.isel(indexers)
@@ -0,0 +1,330 @@
+"""
+xarray backend (engine 'safe_s1'), for `xarray.open_datatree` and `xarray.open_dataset`
+"""
+import functools
+import os
+import posixpath
+import re
+
+import numpy as np
+import xarray as xr
+from xarray.backends import BackendArray, BackendEntrypoint
+from xarray.core import indexing
+
+from safe_s1.handles import open_dataset
+from safe_s1.multilook import to_intensity
+from safe_s1.reader import (
+    Sentinel1Reader,
+    _auto_chunks,
+    _backscatter_block,
+    _rio_dtype,
+    _rio_shape,
+)
+
+measurement_group = "measurement"
+"""group of the lazy image variables (other groups are `safe_s1.Sentinel1Reader.datatree` ones)"""
+
+backscatter_kinds = ["sigma0", "gamma0"]
+"""denoised backscatter variables of the measurement group"""
+
+reader_options = [
+    "storage_options",
+    "open_kwargs",
+    "overview_cache",
+    "memmap",
+    "handles",
+    "remote_cache",
+]
+"""open keywords passed to `safe_s1.Sentinel1Reader` backend_kwargs"""
+
+
+class BlockBackendArray(BackendArray):
+    """
+    lazy (pol, line, sample) or (line, sample) array, read by blocks: only the indexed part of the
+    image is read (or computed). Slices and 1D integer arrays (outer indexing) are supported.
+
+    Parameters
+    ----------
+    blocks: callable or list of callable
+        `block(lines, samples)` is the 2D block at 1D contiguous full resolution indexes. A list
+        (one block by polarization) adds a leading pol dim.
+    lines: numpy.ndarray
+        1D contiguous full resolution lines of the array
+    samples: numpy.ndarray
+        1D contiguous full resolution samples of the array
+    dtype: numpy.dtype
+    tiles: tuple of int, optional
+        (line, sample) size of the tiles read for strided indexes: only the part of the tiles
+        holding indexes is read, tile by tile (with strided slices or integer arrays). Default to the
+        array shape (a single read).
+    """
+
+    def __init__(self, blocks, lines, samples, dtype, tiles=None):
+        self.has_pol = isinstance(blocks, list)
+        self.blocks = blocks if self.has_pol else [blocks]
+        self.lines = np.asarray(lines)
+        self.samples = np.asarray(samples)
+        self.dtype = np.dtype(dtype)
+        self.shape = (len(self.blocks),) if self.has_pol else ()
+        self.shape += (self.lines.size, self.samples.size)
+        self.tiles = tiles or (max(self.lines.size, 1), max(self.samples.size, 1))
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(
+            key, self.shape, indexing.IndexingSupport.OUTER, self._raw_indexing_method
+        )
+
+    @staticmethod
+    def _groups(index, tile):
+        """
+        positions of `index` values read together: all of them if they are contiguous, else by tile
+        """
+        if index.size < 2 or np.all(np.diff(index) == 1):
+            return [np.arange(index.size)]
+        tiles = index // tile
+        return [np.flatnonzero(tiles == t) for t in np.unique(tiles)]
+
+    def _raw_indexing_method(self, key):
+        key = tuple(key) if self.has_pol else (0,) + tuple(key)
+        sizes = (len(self.blocks), self.lines.size, self.samples.size)
+        indexes = [np.arange(size)[k] for k, size in zip(key, sizes)]
+        pols, lines, samples = [np.atleast_1d(index) for index in indexes]
+        out = np.empty((pols.size, lines.size, samples.size), dtype=self.dtype)
+        if out.size:
+            # strided indexes are read tile by tile, each from the smallest contiguous block
+            # covering its indexes
+            for line_pos in self._groups(lines, self.tiles[0]):
+                line_index = lines[line_pos]
+                line0 = line_index.min()
+                for sample_pos in self._groups(samples, self.tiles[1]):
+                    sample_index = samples[sample_pos]
+                    sample0 = sample_index.min()
+                    for i, pol in enumerate(pols):
+                        block = self.blocks[pol](
+                            self.lines[line0 : line_index.max() + 1],
+                            self.samples[sample0 : sample_index.max() + 1],
+                        )
+                        out[i][np.ix_(line_pos, sample_pos)] = block[
+                            np.ix_(line_index - line0, sample_index - sample0)
+                        ]
+        # integer keys remove their axis
+        return out[
+            tuple(0 if np.ndim(index) == 0 else slice(None) for index in indexes)
+        ]
+
+
+def _backscatter(lines, samples, read, block_kwargs):
+    """calibrated backscatter block, from the digital number block reader `read`"""
+    intensity = to_intensity(read(lines, samples))[np.newaxis]
+    return _backscatter_block(intensity, lines, samples, **block_kwargs)[0]
+
+
+def measurement_dataset(reader):
+    """
+    lazy dataset of the full resolution image of `reader`, with ('pol', 'line', 'sample') dims
+    (cropped to the reader window).
+
+    Variables are `xarray.core.indexing.LazilyIndexedArray` of `BlockBackendArray`:
+
+    * digital_number: like `safe_s1.Sentinel1Reader.load_digital_number`
+    * sigma0, gamma0: like `safe_s1.Sentinel1Reader.load_backscatter` (denoised)
+    * geolocation variables (like longitude, latitude or incidenceAngle): like
+      `safe_s1.Sentinel1Reader.load_geolocation`, without pol dim
+
+    Parameters
+    ----------
+    reader: safe_s1.Sentinel1Reader
+
+    Returns
+    -------
+    xarray.Dataset
+    """
+    _, dn = reader.load_digital_number()
+    dn = dn.digital_number
+    pols = [str(pol) for pol in dn["pol"].values]
+    lines, samples = dn["line"].values, dn["sample"].values
+    with open_dataset(
+        reader._measurement_files(pols)[0], opener=reader._opener, pool=reader._handles
+    ) as rio:
+        rio = _rio_shape(rio)
+    dtype = _rio_dtype(rio)
+    # xarray chunks={} uses preferred chunks (multiples of the tiff blocks)
+    chunks = dict(_auto_chunks(rio), pol=1)
+    reads = []
+    for f in reader._measurement_files(pols):
+        read = reader._full_resolution_read(f, dtype)
+        reads.append(functools.partial(read.pop("func"), **read))
+
+    def variable(blocks, dims, dtype, attrs):
+        array = BlockBackendArray(
+            blocks, lines, samples, dtype, tiles=(chunks["line"], chunks["sample"])
+        )
+        return xr.Variable(
+            dims,
+            indexing.LazilyIndexedArray(array),
+            attrs=attrs,
+            encoding={
+                "preferred_chunks": {dim: chunks[dim] for dim in dims},
+            },
+        )
+
+    ds = xr.Dataset(coords=dn.coords)
+    ds["digital_number"] = variable(reads, dn.dims, dtype, dn.attrs)
+    comment = re.sub(r"^.*digital number, ", "", dn.attrs["comment"])
+    for kind in backscatter_kinds:
+        blocks = [
+            functools.partial(_backscatter, read=read, block_kwargs=block_kwargs)
+            for read, block_kwargs in zip(
+                reads, reader._backscatter_kwargs(kind, pols, True)
+            )
+        ]
+        ds[kind] = variable(
+            blocks,
+            dn.dims,
+            np.float32,
+            {
+                "comment": "%s, from digital number %s" % (kind, comment),
+                "history": dn.attrs["history"],
+            },
+        )
+    geoloc = reader.geoloc
+    for name in geoloc.data_vars:
+        interpolator = reader._geolocation_interpolator(name, np.float32)
+        ds[name] = variable(
+            interpolator,
+            ("line", "sample"),
+            interpolator.dtype,
+            {
+                k: v
+                for k, v in geoloc[name].attrs.items()
+                if k not in ["units", "calendar"]
+            },
+        )
+    return ds
+
+
+class SafeS1BackendEntrypoint(BackendEntrypoint):
+    """
+    xarray backend of Sentinel-1 SAFE (engine 'safe_s1'), backed by `safe_s1.Sentinel1Reader`.
+
+    `xarray.open_datatree` returns the reader datatree, with a `measurement` group of lazy image
+    variables (see `measurement_dataset`). `xarray.open_dataset` returns one group (default to
+    `measurement`).
+
+    Open keywords are `safe_s1.Sentinel1Reader` ones (`pols`, `metadata_dtype`, `window`, `bbox`),
+    and its backend_kwargs keys (see `reader_options`). If `sidecar` is set, metadata are read from
+    this sidecar (see `safe_s1.Sentinel1Reader.from_sidecar`), instead of the SAFE xml files, and
+    `Sentinel1Reader` keywords are the ones of the exported reader (setting them raises ValueError).
+
+    Examples
+    --------
+    >>> dt = xr.open_datatree(path, engine="safe_s1", chunks={})
+    >>> ds = xr.open_dataset(path, engine="safe_s1", group="geolocationGrid")
+    """
+
+    description = "Open Sentinel-1 SAFE (and zipped SAFE) with safe_s1"
+    url = "https://github.com/umr-lops/xarray-safe-s1"
+    open_dataset_parameters = (
+        "filename_or_obj",
+        "drop_variables",
+        "group",
+        "pols",
+        "metadata_dtype",
+        "window",
+        "bbox",
+        "sidecar",
+        *reader_options,
+    )
+
+    def guess_can_open(self, filename_or_obj):
+        if not isinstance(filename_or_obj, (str, os.PathLike)):
+            return False
+        path = os.fspath(filename_or_obj)
+        if path.startswith("SENTINEL1_DS:"):
+            return True
+        name = posixpath.basename(path.rstrip("/").replace(os.sep, "/"))
+        return name.upper().endswith((".SAFE", ".SAFE.ZIP")) or bool(
+            re.match(r"S1[A-D]_.*\.zip$", name, re.IGNORECASE)
+        )
+
+    def _reader(self, filename_or_obj, sidecar=None, **kwargs):
+        backend_kwargs = {key: kwargs.pop(key, None) for key in reader_options}
+        backend_kwargs = {k: v for k, v in backend_kwargs.items() if v is not None}
+        if sidecar is not None:
+            # the sidecar reader has its own pols, metadata_dtype and window
+            given = [key for key, value in kwargs.items() if value is not None]
+            if given:
+                raise ValueError("%s can't be set with sidecar" % ", ".join(given))
+            reader = Sentinel1Reader.from_sidecar(
+                sidecar, name=filename_or_obj, backend_kwargs=backend_kwargs
+            )
+        else:
+            reader = Sentinel1Reader(
+                os.fspath(filename_or_obj), backend_kwargs=backend_kwargs, **kwargs
+            )
+        if reader.multidataset:
+            raise ValueError(
+                "%s is a multidataset: open one of %s"
+                % (filename_or_obj, reader.datasets_names)
+            )
+        return reader
+
+    def open_groups_as_dict(
+        self, filename_or_obj, *, drop_variables=None, sidecar=None, **kwargs
+    ):
+        reader = self._reader(filename_or_obj, sidecar=sidecar, **kwargs)
+        groups = {"/": xr.Dataset()}
+        for node in reader.datatree.children.values():
+            groups[node.path] = node.to_dataset()
+        groups["/" + measurement_group] = measurement_dataset(reader)
+        for path, ds in groups.items():
+            if drop_variables is not None:
+                ds = ds.drop_vars(drop_variables, errors="ignore")
+            ds.set_close(reader.close)
+            groups[path] = ds
+        return groups
+
+    def open_datatree(self, filename_or_obj, *, drop_variables=None, **kwargs):
+        return xr.DataTree.from_dict(
+            self.open_groups_as_dict(
+                filename_or_obj, drop_variables=drop_variables, **kwargs
+            )
+        )
+
+    def open_dataset(
+        self,
+        filename_or_obj,
+        *,
+        drop_variables=None,
+        group=None,
+        pols=None,
+        metadata_dtype=None,
+        window=None,
+        bbox=None,
+        sidecar=None,
+        **kwargs,
+    ):
+        group = (group or measurement_group).strip("/")
+        reader = self._reader(
+            filename_or_obj,
+            sidecar=sidecar,
+            pols=pols,
+            metadata_dtype=metadata_dtype,
+            window=window,
+            bbox=bbox,
+            **kwargs,
+        )
+        if group == measurement_group:
+            ds = measurement_dataset(reader)
+        elif group in reader.datatree.children:
+            ds = reader.datatree[group].to_dataset()
+        else:
+            reader.close()
+            raise ValueError(
+                "group must be in %s, not %r"
+                % ([measurement_group] + list(reader.datatree.children), group)
+            )
+        if drop_variables is not None:
+            ds = ds.drop_vars(drop_variables, errors="ignore")
+        ds.set_close(reader.close)
+        return ds
@@ -1,15 +1,52 @@
-from safe_s1 import sentinel1_xml_mappings, Sentinel1Reader, getconfig
+import functools
+import importlib
 import logging
+import os
+import zipfile
 
+import dask
+import fsspec
+import lxml.objectify
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+import xarray as xr
+import yaml
+
+from safe_s1 import (
+    Sentinel1Reader,
+    cache,
+    getconfig,
+    metadata_dtype,
+    multilook,
+    noise,
+    overviews,
+    safezip,
+    sentinel1_xml_mappings,
+    tiff_layout,
+    xarray_backend,
+)
+from safe_s1.reader import (
+    _read_intensity_block,
+    _read_memmap_block,
+    _read_native_block,
+    _read_resampled_block,
+)
+from safe_s1.window import bbox_to_window
+from safe_s1.xml_parser import XmlParser
 
 logging.basicConfig()
 logging.captureWarnings(True)
 
-logger = logging.getLogger('s1_reader_test')
+logger = logging.getLogger("s1_reader_test")
 logger.setLevel(logging.DEBUG)
 
 conf = getconfig.get_config()
-products = [sentinel1_xml_mappings.get_test_file(filename) for filename in conf['product_paths']]
+products = [
+    sentinel1_xml_mappings.get_test_file(filename) for filename in conf["product_paths"]
+]
+
 
 # Try to apply the reader on different products
 def test_reader():
@@ -27,7 +64,947 @@ def test_reader():
         assert False
 
 
+def test_metadata_dtype():
+    product = products[0]
+    reader = Sentinel1Reader(product)
+    sub_reader = Sentinel1Reader(reader.datasets_names[0], metadata_dtype="float32")
+    full_reader = Sentinel1Reader(reader.datasets_names[0])
+    for group in metadata_dtype.compact_groups:
+        compact = sub_reader.datatree[group].to_dataset()
+        full = full_reader.datatree[group].to_dataset()
+        assert compact.nbytes <= full.nbytes
+        for var in compact.data_vars:
+            assert compact[var].dtype != np.float64
+    geoloc = xr.decode_cf(sub_reader.datatree["geolocationGrid"].to_dataset())
+    assert (
+        geoloc["azimuthTime"] == full_reader.datatree["geolocationGrid"]["azimuthTime"]
+    ).all()
+    # float coordinates are not compacted
+    ds = xr.Dataset({"values": ("x", np.arange(3.0))}, coords={"x": [0.5, 1.5, 2.5]})
+    compact = metadata_dtype.compact_dataset(ds, np.dtype("float32"), "2021-04-01")
+    assert compact["values"].dtype == np.float32
+    assert compact["x"].dtype == np.float64
+
+
+@pytest.mark.parametrize("resolution", ["400m", dict(line=37, sample=37)])
+def test_resampled(resolution):
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    _, dn = reader.load_digital_number(resolution=resolution, chunks={"line": 100})
+    dn = dn.digital_number
+    assert len(dn.chunks[1]) > 1
+    # same values and coordinates as an eager read of the whole resampled image
+    f = reader._measurement_files()[0]
+    with rasterio.open(f) as rio:
+        if resolution == "400m":
+            resolution = dict(
+                line=400 / float(reader.pixel_line_m),
+                sample=400 / float(reader.pixel_sample_m),
+            )
+            window = None
+        else:
+            window = rasterio.windows.Window(
+                0,
+                0,
+                rio.width // resolution["sample"] * resolution["sample"],
+                rio.height // resolution["line"] * resolution["line"],
+            )
+        out_shape = (
+            int(rio.height / resolution["line"]),
+            int(rio.width / resolution["sample"]),
+        )
+        expected = rio.read(
+            1,
+            out_shape=out_shape,
+            resampling=rasterio.enums.Resampling.rms,
+            window=window,
+        )
+        shape = (rio.height, rio.width)
+    np.testing.assert_array_equal(dn.isel(pol=0).values, expected)
+    # box centers
+    line = (
+        np.arange(out_shape[0])
+        * (shape[0] // resolution["line"] * resolution["line"] / out_shape[0])
+        + (resolution["line"] - 1) / 2
+    )
+    sample = (
+        np.arange(out_shape[1])
+        * (shape[1] // resolution["sample"] * resolution["sample"] / out_shape[1])
+        + (resolution["sample"] - 1) / 2
+    )
+    np.testing.assert_array_equal(dn.line.values, line)
+    np.testing.assert_array_equal(dn.sample.values, sample)
+
+
+def write_tiff(path, data, **profile):
+    profile = {
+        **dict(
+            driver="GTiff",
+            height=data.shape[0],
+            width=data.shape[1],
+            count=1,
+            dtype=data.dtype,
+        ),
+        **profile,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+    return str(path)
+
+
+def test_overview_cache(tmp_path):
+    rng = np.random.default_rng(0)
+    # speckled image, whose shape is not a multiple of the level factors
+    data = rng.gamma(1, 1e4, size=(1000, 1500)).astype(np.uint16)
+    f = write_tiff(tmp_path / "a.tiff", data)
+    rms = rasterio.enums.Resampling.rms
+    levels = overviews.OverviewCache(tmp_path / "levels")
+    # largest power of two dividing the scale (output boxes are whole level pixels)
+    assert levels.level(f, (32, 24), rms)[1] == 8
+    assert levels.level(f, (40.01, 40.01), rms) is None
+    assert levels.level(f, (5, 6), rms) is None
+    assert levels.level(f, (32, 32), rasterio.enums.Resampling.nearest) is None
+    # complex data and files with internal overviews are read at full resolution
+    cplx = write_tiff(tmp_path / "c.tiff", data.astype(np.complex64))
+    assert levels.level(cplx, (32, 32), rms) is None
+    ovr = write_tiff(tmp_path / "o.tiff", data)
+    with rasterio.open(ovr, "r+") as dst:
+        dst.build_overviews([2, 4], rasterio.enums.Resampling.average)
+    assert levels.level(ovr, (32, 32), rms) is None
+    # levels are built by the first read, and give the exact box rms
+    path, factor, _ = levels.level(f, (24, 40), rms)
+    assert not os.path.exists(path)
+    lines, samples = np.arange(10, 30), np.arange(5, 25)
+    block = _read_resampled_block(
+        lines,
+        samples,
+        f,
+        (24, 40),
+        rms,
+        np.dtype("f4"),
+        level=(functools.partial(levels.get, f, factor, rms), factor),
+    )
+    assert os.path.exists(path)
+    boxes = data[240:720, 200:1000].astype(np.float64) ** 2
+    expected = np.sqrt(boxes.reshape(20, 24, 20, 40).mean(axis=(1, 3)))
+    np.testing.assert_allclose(block, expected, rtol=1e-6)
+    # levels that don't fit with the levels in use are not built
+    size = overviews.level_size(data.shape, 8)
+    levels = overviews.OverviewCache(tmp_path / "small", max_size=int(1.5 * size))
+    g = write_tiff(tmp_path / "b.tiff", data)
+    level = levels.level(f, (8, 8), rms)
+    assert levels.level(g, (8, 8), rms, keep=[level]) is None
+    assert levels.level(f, (2, 2), rms) is None
+    # least recently used levels are evicted
+    path_f = levels.get(f, 8, rms)
+    path_g = levels.get(g, 8, rms)
+    assert os.path.exists(path_g) and not os.path.exists(path_f)
+
+
+def test_overview_reader(tmp_path):
+    product = products[0]
+    name = Sentinel1Reader(product).datasets_names[0]
+    pol = Sentinel1Reader(name).manifest_attrs["polarizations"][0]
+    cache_dir = tmp_path / "levels"
+    cached = Sentinel1Reader(
+        name, pols=pol, backend_kwargs={"overview_cache": {"cache_dir": cache_dir}}
+    )
+    resolution = dict(line=32, sample=32)
+    _, dn = cached.load_digital_number(resolution=resolution)
+    # levels are built at compute time
+    assert not os.path.exists(cache_dir) or not os.listdir(cache_dir)
+    values = dn.digital_number.values
+    assert os.listdir(cache_dir)
+    _, expected = Sentinel1Reader(name, pols=pol).load_digital_number(
+        resolution=resolution
+    )
+    np.testing.assert_allclose(values, expected.digital_number.values, atol=1)
+
+
+def test_chunks():
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    with rasterio.open(reader._measurement_files()[0]) as rio:
+        block_lines, block_samples = rio.block_shapes[0]
+    with dask.config.set({"array.chunk-size": "4MiB"}):
+        _, dn = reader.load_digital_number(chunks="auto")
+        dn = dn.digital_number
+        # multiples of the tiff blocks, that fit in array.chunk-size
+        assert all(c % block_lines == 0 for c in dn.chunks[1][:-1])
+        assert all(c % block_samples == 0 for c in dn.chunks[2][:-1])
+        assert len(dn.chunks[1]) > 1
+        assert np.prod(dn.data.chunksize) * dn.dtype.itemsize <= 2**22
+        _, none = reader.load_digital_number(chunks=None)
+        assert none.digital_number.chunks == dn.chunks
+        # missing keys are 'auto'
+        _, partial = reader.load_digital_number(chunks={"line": 100})
+        assert set(partial.digital_number.chunks[1][:-1]) == {100}
+        assert partial.digital_number.chunks[2] == dn.chunks[2]
+        # resampled chunks are sized in the output dtype
+        _, resampled = reader.load_digital_number(resolution="100m")
+        resampled = resampled.digital_number
+        nbytes = np.prod(resampled.data.chunksize) * resampled.dtype.itemsize
+        assert 2**20 < nbytes <= 2**22
+    with pytest.raises(ValueError):
+        reader.load_digital_number(chunks=100)
+
+
+def test_output_intensity():
+    for product in products:
+        reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+        _, raw = reader.load_digital_number()
+        _, intensity = reader.load_digital_number(output="intensity")
+        window = dict(line=slice(0, 100), sample=slice(0, 100))
+        raw = raw.digital_number.isel(window).values
+        intensity = intensity.digital_number.isel(window)
+        assert intensity.dtype == np.float32
+        np.testing.assert_allclose(
+            intensity.values, np.abs(raw.astype(np.complex128)) ** 2, rtol=1e-6
+        )
+
+
+def test_output_intensity_resampled(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.integers(-500, 500, size=(2, 120, 150)).astype(np.float32)
+    data = data[0] + 1j * data[1]
+    f = write_tiff(tmp_path / "slc.tiff", data, dtype="complex_int16")
+    intensity = np.abs(data.astype(np.complex128)) ** 2
+    lines, samples = np.arange(2, 10), np.arange(3, 12)
+    # whole boxes
+    block = _read_intensity_block(
+        lines, samples, f, (4, 6), "intensity", np.dtype("f4")
+    )
+    expected = intensity[8:40, 18:72].reshape(8, 4, 9, 6).mean(axis=(1, 3))
+    np.testing.assert_allclose(block, expected, rtol=1e-6)
+    block = _read_intensity_block(
+        lines, samples, f, (4, 6), "amplitude", np.dtype("f4")
+    )
+    np.testing.assert_allclose(block, np.sqrt(expected), rtol=1e-6)
+    # fractional boxes: (2.5, 1.5) boxes are (5, 3) boxes of the image upsampled by 2
+    block = _read_intensity_block(
+        lines, samples, f, (2.5, 1.5), "intensity", np.dtype("f4")
+    )
+    upsampled = intensity.repeat(2, axis=0).repeat(2, axis=1)
+    expected = upsampled[10:50, 9:36].reshape(8, 5, 9, 3).mean(axis=(1, 3))
+    np.testing.assert_allclose(block, expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize("output", ["intensity", "amplitude"])
+def test_output_intensity_resampled_grd(output):
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    _, full = reader.load_digital_number()
+    full = full.digital_number.isel(line=slice(0, 200), sample=slice(0, 300))
+    expected = multilook.multilook(full, dict(line=4, sample=6), output=output)
+    # real digital numbers are averaged in intensity domain, whatever the resampling
+    for resampling in [
+        rasterio.enums.Resampling.rms,
+        rasterio.enums.Resampling.average,
+    ]:
+        _, dn = reader.load_digital_number(
+            resolution=dict(line=4, sample=6), resampling=resampling, output=output
+        )
+        dn = dn.digital_number.isel(line=slice(0, 50), sample=slice(0, 50))
+        np.testing.assert_allclose(dn.values, expected.values, rtol=1e-5)
+        np.testing.assert_allclose(dn.line, expected.line)
+
+
+def test_output_native():
+    for product in products:
+        reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+        _, raw = reader.load_digital_number()
+        if not np.iscomplexobj(raw.digital_number):
+            continue
+        _, native = reader.load_digital_number(output="native")
+        native = native.digital_number
+        assert native.dtype == np.int16
+        window = dict(line=slice(0, 100), sample=slice(0, 100))
+        complex_dn = native.sel(ri="real") + 1j * native.sel(ri="imag")
+        np.testing.assert_array_equal(
+            complex_dn.isel(window).values, raw.digital_number.isel(window).values
+        )
+
+
+def test_native_layout(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.integers(-500, 500, size=(2, 101, 150)).astype(np.float32)
+    data = data[0] + 1j * data[1]
+    lines, samples = np.arange(85, 101), np.arange(20, 150)
+    expected = np.stack([data.real, data.imag], axis=-1)[85:, 20:]
+    strips = write_tiff(
+        tmp_path / "strips.tiff", data, dtype="complex_int16", blockysize=10
+    )
+    tiles = write_tiff(
+        tmp_path / "tiles.tiff",
+        data,
+        dtype="complex_int16",
+        tiled=True,
+        blockxsize=32,
+        blockysize=32,
+    )
+    for f in [strips, tiles]:
+        layout = tiff_layout.read_layout(f)
+        assert layout is not None
+        native = _read_native_block(lines, samples, f, layout)
+        np.testing.assert_array_equal(native, expected)
+    # the last strip holds the last lines only, and may be followed by other data
+    with open(strips, "ab") as f:
+        f.write(b"\0" * 7)
+    native = _read_native_block(lines, samples, strips, tiff_layout.read_layout(strips))
+    np.testing.assert_array_equal(native, expected)
+    # truncated files are decoded by gdal
+    with open(strips, "r+b") as f:
+        f.truncate(os.path.getsize(strips) - 1000)
+    assert tiff_layout.read_layout(strips) is None
+
+
+def test_multilook():
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    _, dn = reader.load_digital_number()
+    dn = dn.digital_number.isel(line=slice(0, 200), sample=slice(0, 300))
+    ml = multilook.multilook(dn, dict(line=4, sample=6))
+    intensity = np.abs(dn.values.astype(np.complex128)) ** 2
+    expected = intensity.reshape(dn.sizes["pol"], 50, 4, 50, 6).mean(axis=(2, 4))
+    np.testing.assert_allclose(ml.values, expected, rtol=1e-5)
+    np.testing.assert_allclose(ml.line[:2], [1.5, 5.5])
+    np.testing.assert_allclose(ml.sample[:2], [2.5, 8.5])
+    # output chunks start at the boxes nearest to irregular input chunks starts
+    chunked = multilook.multilook(
+        dn.chunk(line=(70, 130), sample=(100, 200)), dict(line=4, sample=6)
+    )
+    assert chunked.chunks[-2:] == ((18, 32), (17, 33))
+    np.testing.assert_allclose(chunked.values, expected, rtol=1e-5)
+    # the reader multilooks full resolution chunks holding the requested output chunks
+    _, ml = reader.load_digital_number(
+        resolution=dict(line=4.5, sample=6),
+        resampling="multilook",
+        chunks={"line": 100, "sample": 300},
+    )
+    lines, samples = ml.digital_number.chunks[-2:]
+    assert set(lines[:-1]) == {100} and lines[-1] <= 100
+    assert set(samples[:-1]) == {300} and samples[-1] <= 300
+
+
+def test_window():
+    product = products[0]
+    name = Sentinel1Reader(product).datasets_names[0]
+    window = dict(line=(100, 300), sample=(200, 500))
+    reader = Sentinel1Reader(name, window=window)
+    _, dn = reader.load_digital_number()
+    _, full = Sentinel1Reader(name).load_digital_number()
+    expected = full.digital_number.isel(line=slice(100, 300), sample=slice(200, 500))
+    np.testing.assert_array_equal(dn.digital_number.values, expected.values)
+    geoloc = reader.datatree["geolocationGrid"]
+    assert geoloc.line[0] <= 100 and geoloc.line[-1] >= 299
+    assert geoloc.sample[0] <= 200 and geoloc.sample[-1] >= 499
+
+
+def test_bbox_antimeridian():
+    # footprint from 178 to -178 (182) degrees of longitude
+    line, sample = np.arange(0, 1001, 100), np.arange(0, 2001, 200)
+    lon = (178 + sample / 500 + 0 * line[:, np.newaxis] + 180) % 360 - 180
+    lat = np.broadcast_to(10 + line[:, np.newaxis] / 1000, lon.shape)
+    geoloc = xr.Dataset(
+        {
+            "longitude": (("line", "sample"), lon),
+            "latitude": (("line", "sample"), lat),
+        },
+        coords={"line": line, "sample": sample},
+    )
+    shape = (1001, 2001)
+    east = bbox_to_window(geoloc, (178.5, 0, 179.5, 20), shape)
+    assert east["sample"] == slice(200, 801)
+    west = bbox_to_window(geoloc, (-179.5, 0, -178.5, 20), shape)
+    assert west["sample"] == slice(1200, 1801)
+    # bbox crossing the antimeridian
+    crossing = bbox_to_window(geoloc, (179.5, 0, -179.5, 20), shape)
+    assert crossing["sample"] == slice(600, 1401)
+    with pytest.raises(ValueError):
+        bbox_to_window(geoloc, (0, 0, 10, 20), shape)
+
+
+def test_pols():
+    product = products[0]
+    name = Sentinel1Reader(product).datasets_names[0]
+    full = Sentinel1Reader(name)
+    pol = full.manifest_attrs["polarizations"][-1]
+    reader = Sentinel1Reader(name, pols=pol)
+    assert list(reader.files["polarization"]) == [pol]
+    assert list(reader.datatree["calibration_luts"].pol.values) == [pol]
+    _, dn = reader.load_digital_number(resolution="400m")
+    _, expected = full.load_digital_number(resolution="400m", pols=[pol])
+    assert list(dn.pol.values) == [pol]
+    np.testing.assert_array_equal(
+        dn.digital_number.values, expected.digital_number.values
+    )
+    with pytest.raises(ValueError):
+        Sentinel1Reader(name, pols="XX")
+
+
+def test_close():
+    product = products[0]
+    name = Sentinel1Reader(product).datasets_names[0]
+    with Sentinel1Reader(name) as reader:
+        _, dn = reader.load_digital_number(resolution="1000m")
+        values = dn.digital_number.values
+        assert sum(reader._handles._opened.values()) > 0
+        # remote files are read in parallel too
+        assert reader._handles.opener_size == reader._handles.size
+    assert sum(reader._handles._opened.values()) == 0
+    # files are reopened by the next reads
+    np.testing.assert_array_equal(dn.digital_number.values, values)
+    reader.close()
+
+
+def test_measurement_references():
+    pytest.importorskip("zarr")
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    try:
+        refs = reader.measurement_references()
+    except ValueError:
+        pytest.skip("measurement files can't be referenced")
+    ds = xr.open_zarr(
+        "reference://",
+        storage_options={"fo": refs},
+        zarr_format=2,
+        consolidated=False,
+    )
+    _, dn = reader.load_digital_number()
+    window = dict(line=slice(100, 200), sample=slice(300, 400))
+    for pol in dn.pol.values:
+        values = ds[str(pol)].isel(window).values
+        if values.ndim == 3:
+            values = values[..., 0] + 1j * values[..., 1]
+        np.testing.assert_array_equal(
+            values, dn.digital_number.sel(pol=pol).isel(window).values
+        )
+
+
+def test_memmap(tmp_path):
+    for product in products:
+        name = Sentinel1Reader(product).datasets_names[0]
+        window = dict(line=slice(100, 300), sample=slice(200, 500))
+        _, mm = Sentinel1Reader(name).load_digital_number()
+        _, gdal = Sentinel1Reader(
+            name, backend_kwargs={"memmap": False}
+        ).load_digital_number()
+        assert mm.digital_number.dtype == gdal.digital_number.dtype
+        np.testing.assert_array_equal(
+            mm.digital_number.isel(window).values,
+            gdal.digital_number.isel(window).values,
+        )
+    # fixtures are compressed: uncompressed strips are written to test the memory maps
+    reader = Sentinel1Reader(Sentinel1Reader(products[0]).datasets_names[0])
+    rng = np.random.default_rng(0)
+    grd = rng.integers(0, 1000, size=(101, 150)).astype(np.uint16)
+    slc = rng.integers(-500, 500, size=(2, 101, 150)).astype(np.float32)
+    slc = slc[0] + 1j * slc[1]
+    lines, samples = np.arange(35, 101), np.arange(20, 120)
+    for data, dtype in [(grd, "uint16"), (slc, "complex_int16")]:
+        f = write_tiff(tmp_path / ("%s.tiff" % dtype), data, dtype=dtype, blockysize=10)
+        mapped = reader._memmap_file(f)
+        assert mapped is not None
+        read = reader._full_resolution_read(f, data.dtype)
+        assert read.pop("func") is _read_memmap_block
+        with rasterio.open(f) as rio:
+            expected = rio.read(1, window=rasterio.windows.Window(20, 35, 100, 66))
+        block = _read_memmap_block(lines, samples, **read)
+        assert block.dtype == expected.dtype
+        np.testing.assert_array_equal(block, expected)
+    # tiles are not memory mapped
+    tiles = write_tiff(tmp_path / "tiles.tiff", grd, tiled=True, blockxsize=32)
+    assert reader._memmap_file(tiles) is None
+
+
+def test_bursts():
+    product = products[1]
+    name = Sentinel1Reader(product).datasets_names[0]
+    reader = Sentinel1Reader(name)
+    lines_per_burst = int(reader.bursts["linesPerBurst"])
+    bursts = reader.load_bursts().digital_number
+    assert bursts.sizes["burst"] == reader.bursts.sizes["burst"]
+    # valid burst samples are the full image lines of the burst
+    _, dn = reader.load_digital_number()
+    burst = bursts.isel(pol=0, burst=1, sample=slice(0, 3000)).values
+    full = dn.digital_number.isel(
+        pol=0,
+        line=slice(lines_per_burst, 2 * lines_per_burst),
+        sample=slice(0, 3000),
+    ).values
+    valid = np.isfinite(burst.real)
+    assert valid.any()
+    np.testing.assert_array_equal(burst[valid], full[valid])
+    # with a window, bursts are clipped to the window
+    pol = reader.manifest_attrs["polarizations"][-1]
+    window = dict(
+        line=(lines_per_burst + 100, 2 * lines_per_burst + 50), sample=(500, 800)
+    )
+    windowed = Sentinel1Reader(name, window=window).load_bursts(pols=pol)
+    windowed = windowed.digital_number
+    assert list(windowed.burst.values) == [1, 2]
+    np.testing.assert_array_equal(windowed.sample.values, np.arange(500, 800))
+    expected = bursts.sel(pol=pol, burst=[1, 2], sample=slice(500, 799)).values
+    lines = (
+        windowed.burst.values[:, np.newaxis] * lines_per_burst + windowed.line.values
+    )
+    inside = (lines >= window["line"][0]) & (lines < window["line"][1])
+    np.testing.assert_array_equal(
+        windowed.sel(pol=pol).values[inside], expected[inside]
+    )
+    assert np.isnan(windowed.sel(pol=pol).values[~inside]).all()
+    assert pol.lower() in windowed.attrs["history"]
+    assert len(yaml.safe_load(windowed.attrs["history"])["digital_number"]) == 1
+
+
+def test_calibration_luts():
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    _, dn = reader.load_digital_number(resolution="400m")
+    cal = reader.load_calibration_luts(like=dn)
+    assert cal.sigma0_lut.chunks[1:] == dn.digital_number.chunks[1:]
+    luts = reader.datatree["calibration_luts"].to_dataset()
+    lut = luts.sigma0_lut.isel(pol=0)
+    line, sample = dn.line.values[5], dn.sample.values[7]
+    # bilinear interpolation, along samples then along lines
+    expected = np.interp(
+        line,
+        luts.line.values,
+        [np.interp(sample, luts.sample.values, row) for row in lut.values],
+    )
+    np.testing.assert_allclose(
+        cal.sigma0_lut.isel(pol=0, line=5, sample=7).values, expected
+    )
+
+
+def test_noise(tmp_path):
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    _, dn = reader.load_digital_number(resolution="400m")
+    field = reader.load_noise(like=dn)
+    assert field.noise_lut.chunks[1:] == dn.digital_number.chunks[1:]
+    vectors = noise.noise_vectors(reader.xml_parser, reader.files["noise"].iloc[0])
+    lines, samples = dn.line.values[:50], dn.sample.values[:60]
+    range_only = noise.range_noise(lines, samples, vectors["range"])
+    expected = noise.apply_azimuth_noise(
+        range_only.copy(), lines, samples, vectors["azimuth"]
+    )
+    np.testing.assert_allclose(
+        field.noise_lut.isel(pol=0, line=slice(0, 50), sample=slice(0, 60)).values,
+        expected,
+    )
+    # pixels outside all azimuth blocks have the range noise only
+    block = dict(vectors["azimuth"][0], line_stop=int(np.ceil(lines[20])))
+    partial = noise.apply_azimuth_noise(range_only.copy(), lines, samples, [block])
+    np.testing.assert_allclose(partial[:21], expected[:21])
+    np.testing.assert_allclose(partial[21:], range_only[21:])
+    # IPF < 2.9 noise files have range vectors only, in noiseVectorList
+    with open(os.path.join(product, reader.files["noise"].iloc[0])) as f:
+        xml = f.read()
+    start = xml.index("<noiseAzimuthVectorList")
+    stop = xml.index("</noiseAzimuthVectorList>") + len("</noiseAzimuthVectorList>")
+    xml = (xml[:start] + xml[stop:]).replace("noiseRange", "noise")
+    assert "noiseAzimuth" not in xml and "noiseRange" not in xml
+    (tmp_path / "noise-ipf27.xml").write_text(xml)
+    xml_parser = XmlParser(
+        xpath_mappings=sentinel1_xml_mappings.xpath_mappings,
+        compounds_vars=sentinel1_xml_mappings.compounds_vars,
+        namespaces=sentinel1_xml_mappings.namespaces,
+        mapper=fsspec.get_mapper(str(tmp_path)),
+    )
+    old_vectors = noise.noise_vectors(xml_parser, "noise-ipf27.xml")
+    assert old_vectors["azimuth"] == []
+    np.testing.assert_array_equal(
+        old_vectors["range"]["line"], vectors["range"]["line"]
+    )
+    np.testing.assert_allclose(
+        noise.noise_block(lines, samples, old_vectors, np.float64), range_only
+    )
+
+
+def test_backscatter():
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    sigma0 = reader.load_backscatter(resolution="400m").sigma0
+    _, dn = reader.load_digital_number(resolution="400m", output="intensity")
+    lut = reader.load_calibration_luts(like=dn).sigma0_lut
+    noise = reader.load_noise(like=dn).noise_lut
+    expected = dn.digital_number.copy()
+    for pol in expected.pol.values:
+        if not reader.denoised[str(pol)]:
+            expected.loc[dict(pol=pol)] = expected.sel(pol=pol) - noise.sel(pol=pol)
+    expected = expected / lut**2
+    assert sigma0.dtype == np.float32
+    assert sigma0.chunks == dn.digital_number.chunks
+    np.testing.assert_allclose(sigma0.values, expected.values, rtol=1e-4)
+
+
+def test_geolocation():
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    geoloc = reader.geoloc
+    # on grid nodes, interpolation gives the annotated values
+    nodes = reader.load_geolocation(like=geoloc).compute()
+    np.testing.assert_array_equal(nodes.azimuthTime.values, geoloc.azimuthTime.values)
+    assert nodes.latitude.dtype == np.float32
+    np.testing.assert_allclose(nodes.latitude.values, geoloc.latitude.values, rtol=1e-6)
+    _, dn = reader.load_digital_number(resolution="400m")
+    geo = reader.load_geolocation(["longitude", "azimuthTime"], like=dn)
+    assert geo.longitude.chunks == dn.digital_number.chunks[1:]
+    assert set(geo.data_vars) == {"longitude", "azimuthTime"}
+
+
+def test_interpolate_orbit():
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    orbit = reader.orbit
+    # state vectors are interpolated exactly
+    nodes = reader.interpolate_orbit(orbit.time)
+    for var in orbit.data_vars:
+        np.testing.assert_allclose(nodes[var].values, orbit[var].values)
+    # velocities are the derivative of positions
+    times = orbit.time.values[0] + np.arange(0, 10**10, 10**7).astype("m8[ns]")
+    ds = reader.interpolate_orbit(times)
+    np.testing.assert_allclose(
+        np.gradient(ds.position_x.values, 0.01)[1:-1],
+        ds.velocity_x.values[1:-1],
+        atol=1e-3,
+    )
+    _, dn = reader.load_digital_number(resolution="400m")
+    azimuth_time = reader.load_geolocation("azimuthTime", like=dn).azimuthTime
+    lazy = reader.interpolate_orbit(azimuth_time)
+    assert lazy.position_z.chunks == azimuth_time.chunks
+    assert np.isfinite(lazy.velocity_y.values).all()
+
+
+def test_masks():
+    for product in products:
+        reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+        _, dn = reader.load_digital_number(resolution="400m")
+        masks = reader.load_masks(like=dn)
+        assert masks.swath.dtype == np.int8 and masks.valid.dtype == bool
+        assert masks.swath.chunks == dn.digital_number.chunks[1:]
+        swath = masks.swath.values
+        assert (swath > 0).any()
+        bursts = reader.bursts
+        if bursts.sizes.get("burst", 0) == 0:
+            np.testing.assert_array_equal(masks.valid.values, swath > 0)
+            continue
+        # valid samples of a burst are the non nan samples of `load_bursts`
+        lines_per_burst = int(bursts["linesPerBurst"])
+        window = dict(
+            line=slice(lines_per_burst, 2 * lines_per_burst), sample=slice(0, 2000)
+        )
+        valid = reader.load_masks().valid.isel(window).values
+        burst = reader.load_bursts().digital_number.isel(pol=0, burst=1)
+        expected = np.isfinite(burst.isel(sample=window["sample"]).values.real)
+        np.testing.assert_array_equal(valid, expected)
+
+
+def test_antenna_pattern():
+    product = products[0]
+    reader = Sentinel1Reader(Sentinel1Reader(product).datasets_names[0])
+    _, dn = reader.load_digital_number(resolution="1000m")
+    pattern = reader.load_antenna_pattern(like=dn).compute()
+    swath = reader.load_masks(like=dn).swath.values
+    np.testing.assert_array_equal(np.isfinite(pattern.antenna_gain.values), swath > 0)
+    # nearest record in azimuth time, interpolated at the pixel slant range time
+    geo = reader.load_geolocation(
+        ["azimuthTime", "slantRangeTime"], like=dn, dtype="float64"
+    ).compute()
+    records = reader._interpolators["antenna"]
+    for line, sample in [(3, 4), (10, 20)]:
+        record = records[swath[line, sample]]
+        time = geo.azimuthTime.values[line, sample].astype("datetime64[ns]")
+        i = np.abs(record["azimuth_time"] - time.astype(np.int64)).argmin()
+        x = geo.slantRangeTime.values[line, sample]
+        np.testing.assert_allclose(
+            pattern.antenna_gain.values[line, sample],
+            np.interp(x, record["slant_range_time"][i], record["gain"][i]),
+        )
+        np.testing.assert_allclose(
+            pattern.elevation_angle.values[line, sample],
+            np.interp(x, record["slant_range_time"][i], record["elevation_angle"][i])
+            - record["roll"][i],
+        )
+
+
+def test_zip(tmp_path):
+    product = products[0]
+    # metadata only zip (measurement files are not needed to read metadata)
+    zip_path = tmp_path / (os.path.basename(product) + ".zip")
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for root, _, files in os.walk(product):
+            for f in files:
+                path = os.path.join(root, f)
+                member = os.path.relpath(path, os.path.dirname(product))
+                if not path.endswith(".tiff"):
+                    zf.write(path, member)
+    name = Sentinel1Reader(product).datasets_names[0]
+    zipped = Sentinel1Reader(name.replace(product, str(zip_path)))
+    assert zipped.safe == os.path.basename(product)
+    assert zipped.datatree.identical(Sentinel1Reader(name).datatree)
+    # stored members are read in the zip file, with random access
+    data = np.arange(1000, dtype="u1").tobytes()
+    stored = tmp_path / "stored.zip"
+    with zipfile.ZipFile(stored, "w", compression=zipfile.ZIP_STORED) as zf:
+        zf.writestr("a.SAFE/manifest.safe", b"")
+        zf.writestr("a.SAFE/measurement/data.bin", data)
+    fs = safezip.zip_filesystem(str(stored))
+    assert safezip.safe_root(fs) == "a.SAFE"
+    opener = safezip.MemberOpener(fs, functools.partial(open, stored))
+    with opener("a.SAFE/measurement/data.bin") as f:
+        assert isinstance(f, safezip.StoredMember)
+        f.seek(900)
+        assert f.read(50) == data[900:950]
+        f.seek(10)
+        assert f.read() == data[10:]
+    # measurement files are read through /vsizip/, and stored uncompressed strips are memory mapped
+    product = products[1]
+    zip_path = tmp_path / (os.path.basename(product) + ".zip")
+    rng = np.random.default_rng(0)
+    grd = rng.integers(0, 1000, size=(101, 150)).astype(np.uint16)
+    strips = write_tiff(tmp_path / "strips.tiff", grd, blockysize=10)
+    strips_member = os.path.basename(product) + "/measurement/strips.tiff"
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for root, _, files in os.walk(product):
+            for f in files:
+                path = os.path.join(root, f)
+                member = os.path.relpath(path, os.path.dirname(product))
+                compression = zipfile.ZIP_STORED if f.endswith(".tiff") else None
+                zf.write(path, member, compress_type=compression)
+        zf.write(strips, strips_member, compress_type=zipfile.ZIP_STORED)
+    name = Sentinel1Reader(product).datasets_names[0]
+    zipped = Sentinel1Reader(name.replace(product, str(zip_path)))
+    window = dict(line=slice(0, 300), sample=slice(0, 400))
+    _, dn = zipped.load_digital_number(chunks={"line": 200, "sample": 300})
+    _, expected = Sentinel1Reader(name).load_digital_number()
+    np.testing.assert_array_equal(
+        dn.digital_number.isel(window).values,
+        expected.digital_number.isel(window).values,
+    )
+    mapped = zipped._memmap_file("/vsizip/%s/%s" % (zip_path, strips_member))
+    assert mapped is not None and mapped[0] == str(zip_path)
+    block = _read_memmap_block(
+        np.arange(5, 101), np.arange(150), *mapped, out_dtype=grd.dtype
+    )
+    np.testing.assert_array_equal(block, grd[5:])
+
+
+def test_remote_cache(tmp_path):
+    product = products[0]
+    # metadata only remote SAFE
+    fs = fsspec.filesystem("memory")
+    url = "memory://remote/" + os.path.basename(product)
+    for root, _, files in os.walk(product):
+        for f in files:
+            path = os.path.join(root, f)
+            if not path.endswith(".tiff"):
+                fs.pipe(
+                    url + "/" + os.path.relpath(path, product), open(path, "rb").read()
+                )
+    name = Sentinel1Reader(product).datasets_names[0]
+    remote_cache = dict(cache_dir=str(tmp_path))
+    remote = Sentinel1Reader(
+        name.replace(product, url), backend_kwargs=dict(remote_cache=remote_cache)
+    )
+    expected = Sentinel1Reader(name).datatree
+    assert remote.datatree.identical(expected)
+    # xml files are read from the cache once the remote SAFE is gone
+    fs.rm(url, recursive=True)
+    remote = Sentinel1Reader(
+        name.replace(product, url), backend_kwargs=dict(remote_cache=remote_cache)
+    )
+    assert remote.datatree.identical(expected)
+    # measurement files are cached by blocks, and least recently used blocks are removed
+    data = np.arange(1000, dtype="u1").tobytes()
+    fs.pipe("memory://remote/data.bin", data)
+    tiff_cache = cache.DiskCache(tmp_path / "tiff", max_size=480)
+    with cache.open_cached(fs, tiff_cache, "/remote/data.bin", block_size=100) as f:
+        f.seek(250)
+        assert f.read(500) == data[250:750]
+        f.seek(-10, os.SEEK_END)
+        assert f.read() == data[-10:]
+    assert sum(f[1] for f in cache.cache_files(tiff_cache.cache_dir)) <= 480
+    fs.rm("memory://remote/data.bin")
+    with cache.open_cached(fs, tiff_cache, "/remote/data.bin", block_size=100) as f:
+        f.seek(995)
+        assert f.read() == data[995:]
+    # files being written by other processes are not removed
+    tmp_file = tmp_path / "tiff" / (cache.tmp_prefix + "partial")
+    tmp_file.write_bytes(b"\0" * 1000)
+    cache.evict_lru(tiff_cache.cache_dir, 0)
+    assert tmp_file.exists()
+    # keys of cached mappers are cached too
+    fs.pipe({"memory://remote/map/a.xml": b"a", "memory://remote/map/b/c.xml": b"c"})
+    mapper = cache.CachedMapper(
+        fs.get_mapper("memory://remote/map"),
+        cache.DiskCache(tmp_path / "map"),
+        "memory://remote/map",
+    )
+    assert sorted(mapper) == ["a.xml", "b/c.xml"] and mapper["a.xml"] == b"a"
+    fs.rm("memory://remote/map", recursive=True)
+    assert "b/c.xml" in mapper and "d.xml" not in mapper and len(mapper) == 2
+
+
+def test_remote_measurement():
+    product = products[0]
+    name = Sentinel1Reader(product).datasets_names[0]
+    pol = Sentinel1Reader(name).manifest_attrs["polarizations"][0]
+    fs = fsspec.filesystem("memory")
+    url = "memory://remote_measurement/" + os.path.basename(product)
+    for root, _, files in os.walk(product):
+        for f in files:
+            path = os.path.join(root, f)
+            if not path.endswith(".tiff") or "-%s-" % pol.lower() in f:
+                fs.pipe(
+                    url + "/" + os.path.relpath(path, product), open(path, "rb").read()
+                )
+    window = dict(line=(0, 1000), sample=(0, 2000))
+    # memory files are the same object at each open: they can't be read concurrently
+    remote = Sentinel1Reader(
+        name.replace(product, url),
+        pols=pol,
+        window=window,
+        backend_kwargs=dict(handles=dict(opener_size=1)),
+    )
+    local = Sentinel1Reader(name, pols=pol, window=window)
+    try:
+        for kwargs in [
+            dict(chunks={"line": 400, "sample": 800}),
+            dict(resolution="400m"),
+            dict(resolution=dict(line=4, sample=6), resampling="multilook"),
+        ]:
+            _, dn = remote.load_digital_number(**kwargs)
+            _, expected = local.load_digital_number(**kwargs)
+            xr.testing.assert_identical(
+                dn.digital_number.compute(), expected.digital_number.compute()
+            )
+    finally:
+        remote.close()
+        fs.rm(url, recursive=True)
+
+
+@pytest.mark.parametrize("suffix", [".zarr", ".nc"])
+@pytest.mark.parametrize("metadata_dtype", [None, "float32"])
+def test_sidecar(tmp_path, metadata_dtype, suffix):
+    if suffix == ".nc" and importlib.util.find_spec("netCDF4") is None:
+        pytest.importorskip("h5py")
+    product = products[0]
+    name = Sentinel1Reader(product).datasets_names[0]
+    reader = Sentinel1Reader(name, metadata_dtype=metadata_dtype)
+    # the fixtures have no xsd files: xsd definitions are lxml elements in products
+    reader.xsd_definitions = dict(
+        reader.xsd_definitions,
+        azimuthTime=lxml.objectify.fromstring(
+            "<annotation><documentation>time</documentation></annotation>"
+        ).documentation,
+    )
+    path = tmp_path / ("sidecar" + suffix)
+    reader.to_sidecar(path)
+    reopened = Sentinel1Reader.from_sidecar(path)
+    assert reopened.datatree.identical(reader.datatree)
+    assert reopened.name == reader.name
+    assert reopened.xsd_definitions == reader.xsd_definitions
+    assert reopened.xsd_definitions["azimuthTime"] == "time"
+    for key, value in reader.manifest_attrs.items():
+        assert np.all(reopened.manifest_attrs[key] == value)
+    pd.testing.assert_frame_equal(reopened.safe_files, reader.safe_files)
+    # polynomials are restored as objects
+    polynomial = reopened.datatree["azimuth_fmrate"]["azimuthFmRatePolynomial"]
+    assert isinstance(polynomial.values[0], np.polynomial.Polynomial)
+
+
+def test_sidecar_without_xml(tmp_path):
+    product = products[0]
+    name = Sentinel1Reader(product).datasets_names[0]
+    reader = Sentinel1Reader(name)
+    reader.to_sidecar(tmp_path / "sidecar.zarr")
+    # copy of the SAFE without xml files, measurement files are linked
+    safe = tmp_path / os.path.basename(product)
+    for root, _, files in os.walk(product):
+        for file in files:
+            if file.endswith(".xml"):
+                continue
+            src = os.path.join(root, file)
+            dst = safe / os.path.relpath(src, product)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            dst.symlink_to(os.path.abspath(src))
+    reopened = Sentinel1Reader.from_sidecar(tmp_path / "sidecar.zarr", name=safe)
+    assert reopened.denoised == reader.denoised
+    assert reopened.pixel_line_m == reader.pixel_line_m
+    assert reopened.orbit.identical(reader.orbit)
+    assert reopened.bursts.identical(reader.bursts)
+    _, dn = reader.load_digital_number(resolution="400m")
+    _, reopened_dn = reopened.load_digital_number(resolution="400m")
+    np.testing.assert_array_equal(
+        reopened_dn.digital_number.values, dn.digital_number.values
+    )
+    # the xarray backend reads the sidecar, with the keywords of the exported reader
+    ds = xr.open_dataset(
+        safe, engine="safe_s1", sidecar=tmp_path / "sidecar.zarr", group="image"
+    )
+    assert ds.identical(reader.datatree["image"].to_dataset())
+    with pytest.raises(ValueError, match="pols can't be set with sidecar"):
+        xr.open_dataset(
+            safe, engine="safe_s1", sidecar=tmp_path / "sidecar.zarr", pols="VV"
+        )
 
 
+def test_xarray_backend():
+    product = products[0]
+    name = Sentinel1Reader(product).datasets_names[0]
+    reader = Sentinel1Reader(name)
+    dt = xr.open_datatree(name, engine="safe_s1", chunks={})
+    for group in reader.datatree.children:
+        assert dt[group].to_dataset().identical(reader.datatree[group].to_dataset())
+    # image variables are lazy, and only indexed slices are read
+    ds = xr.open_dataset(name, engine="safe_s1")
+    sel = dict(pol=0, line=slice(100, 400, 3), sample=slice(200, 260))
+    _, dn = reader.load_digital_number()
+    np.testing.assert_array_equal(
+        ds.digital_number.isel(sel).values, dn.digital_number.isel(sel).values
+    )
+    np.testing.assert_allclose(
+        ds.sigma0.isel(sel).values,
+        reader.load_backscatter().sigma0.isel(sel).values,
+        rtol=1e-6,
+    )
+    np.testing.assert_array_equal(
+        ds.longitude.isel(line=sel["line"], sample=sel["sample"]).values,
+        reader.load_geolocation("longitude", like=dn)
+        .longitude.isel(line=sel["line"], sample=sel["sample"])
+        .values,
+    )
+    # strided indexes are read tile by tile, without reading the tiles between them
+    image = np.arange(1000 * 1200).reshape(1000, 1200)
+    reads = []
 
+    def block(lines, samples):
+        reads.append((lines.size, samples.size))
+        return image[np.ix_(lines, samples)]
 
+    array = xarray_backend.BlockBackendArray(
+        block, np.arange(1000), np.arange(1200), image.dtype, tiles=(100, 100)
+    )
+    key = (slice(10, 1000, 300), slice(5, 1200, 400))
+    values = array[xr.core.indexing.BasicIndexer(key)]
+    np.testing.assert_array_equal(values, image[key])
+    assert reads == [(1, 1)] * 12
+    reads.clear()
+    key = (slice(10, 300), slice(150, 450, 2))
+    np.testing.assert_array_equal(array[xr.core.indexing.BasicIndexer(key)], image[key])
+    # contiguous lines are read at once, strided samples by tile
+    assert reads == [(290, 49), (290, 99), (290, 99), (290, 49)]
+    reads.clear()
+    key = (np.array([900, 20, 25]), np.array([3, 1100]))
+    np.testing.assert_array_equal(
+        array[xr.core.indexing.OuterIndexer(key)], image[np.ix_(*key)]
+    )
+    assert sorted(reads) == [(1, 1), (1, 1), (6, 1), (6, 1)]
+    assert (
+        xr.open_dataset(name, engine="safe_s1", group="orbit")
+        .load()
+        .identical(reader.datatree["orbit"].to_dataset())
+    )